@@ -0,0 +1,3 @@
+# Names the cogs are registered under (discord.py registers a cog under its class name), for bot.get_cog()
+NOTIFICATOR_COG = "COG_Notificator"
+COMMANDS_COG = "COG_Commands"
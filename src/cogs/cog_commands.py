@@ -1,28 +1,32 @@
 import datetime
-import platform
 import re
 from typing import Any
 
-import cpuinfo
 import discord
-import distro
-import psutil
-import requests
 from discord import app_commands
 from discord.ext import commands
 
 import db_access as db_access
-from utils.alert_reqs import AlertReqs
+from cogs import COMMANDS_COG
+from utils.alert_archive import ArchivedAlert, alert_archive
+from utils.alert_history import HistoryRecord, history_cache
+from utils.alert_reqs import CONNECTION_ERRORS
 from log_utils import loggers
 from botinfo import botinfo
 from db_access import *
 from utils.markdown import md
+from utils.district_source import district_source
+from utils.host_info import host_info
+from utils.subscriptions import channel_index
 from botinfo import dir_utils, get_botinfo_data
 
 load_dotenv()
 AUTHOR_ID = int(os.getenv('AUTHOR_ID'))
 
-COG_CLASS = "COG_Commands"
+COG_CLASS = COMMANDS_COG
+
+# Discord messages are limited to 2000 characters, leaving some room for the rest of the reply
+ARCHIVE_PAGE_CHARS = 1900
 
 cog: Any
 
@@ -34,7 +38,10 @@ class COG_Commands(commands.Cog):
     """
     location_group = app_commands.Group(name='locations',
                                         description='Commands related to adding, removing, or setting locations.')
-    districts: list[dict] = json.loads(requests.get('https://www.oref.org.il/districts/districts_heb.json').text)
+    @property
+    def districts(self) -> list[dict]:
+        # Served from the botdata snapshot, see utils.district_source
+        return district_source.districts
 
     def __init__(self, bot: commands.Bot):
         """
@@ -44,18 +51,15 @@ class COG_Commands(commands.Cog):
         """
 
         # Set up log_utils
-        self.log = logging.Logger(COG_CLASS)
-
-        handler = logging.StreamHandler()
-        handler.setFormatter(loggers.ColorFormatter())
-        self.log.addHandler(handler)
-        self.log.addHandler(loggers.DefaultFileHandler("LOG_ALL.log"))
+        self.log = loggers.get_logger(COG_CLASS)
 
         self.log.info(f"Initializing {COG_CLASS}...")
 
         # Set up client and db
         self.bot = bot
-        self.db = DBAccess()
+        self.db = get_shared_db()
+        # Shared, and kept across reloads along with its pooled session
+        self.history_cache = history_cache
 
         self.start_time = time.time()
 
@@ -78,7 +82,19 @@ class COG_Commands(commands.Cog):
         await bot.add_cog(_cog)
         return _cog
 
-    def in_registered_channel(self, intr: discord.Interaction) -> bool | None:
+    async def cog_load(self):
+        """
+        Start gathering host info in the background, so /info can answer from memory
+        """
+        host_info.start()
+
+    async def cog_unload(self):
+        """
+        Close the alert history's HFC session, so it isn't left open if the cog isn't loaded again
+        """
+        await self.history_cache.close()
+
+    async def in_registered_channel(self, intr: discord.Interaction) -> bool | None:
         """
         an info about current channel
         :param intr: Command interaction from discord
@@ -98,24 +114,24 @@ class COG_Commands(commands.Cog):
         # 17:42 update: Turns out I am very dumb and if the channel is not registered I don't return None but rather keep going
         # Thanks yrrad8! (/srs)
 
-        if self.db.is_registered_channel(intr.channel_id):
+        if await self.db.is_registered_channel(intr.channel_id):
             return True
 
-        if self.db.is_registered_channel(intr.user.id):
+        if await self.db.is_registered_channel(intr.user.id):
             return False
 
         return None
 
-    def get_matching_channel(self, intr: discord.Interaction) -> db_access.Channel:
+    async def get_matching_channel(self, intr: discord.Interaction) -> db_access.Channel:
         """
         Gets the matching Channel ID for Server Channel or DM. Returns None if UNREGISTERED or not found
         :param intr: Command interaction from discord
         :return:  registered channel ID
         """
 
-        channel = self.db.get_channel(intr.channel_id)
+        channel = await self.db.get_channel(intr.channel_id)
         if channel is None:
-            channel = self.db.get_channel(intr.user.id)
+            channel = await self.db.get_channel(intr.user.id)
         return channel
 
     @staticmethod
@@ -162,17 +178,18 @@ class COG_Commands(commands.Cog):
         await self.attempt_registration(intr, channel_id, server_id)
 
     async def attempt_registration(self, intr, channel_id, server_id):
-        if self.db.get_channel(channel_id) is not None:
+        if await self.db.get_channel(channel_id) is not None:
             try:
                 await intr.response.send_message(f'Channel #{intr.channel.name} is already receiving HFC alerts.')
             except AttributeError:
                 await intr.response.send_message(f'This channel is already receiving HFC alerts.')
             return
 
-        if server_id is not None and self.db.get_server(server_id) is None:
-            self.db.add_server(server_id, 'he')
+        if server_id is not None and await self.db.get_server(server_id) is None:
+            await self.db.add_server(server_id, 'he')
 
-        self.db.add_channel(channel_id, server_id, 'he')
+        await self.db.add_channel(channel_id, server_id, 'he')
+        channel_index.add_channel(db_access.Channel(channel_id, server_id, 'he', ()))
         try:
             await intr.response.send_message(f'Channel #{intr.channel.name} will now receive HFC alerts.')
         except AttributeError:
@@ -200,7 +217,7 @@ class COG_Commands(commands.Cog):
             await intr.response.send_message('Error: You are missing the Manage Channels permission.')
             return
 
-        channel = self.get_matching_channel(intr)
+        channel = await self.get_matching_channel(intr)
 
         if channel is None:
             try:
@@ -223,7 +240,8 @@ class COG_Commands(commands.Cog):
 
     async def attempt_unregistration(self, intr, channel: db_access.Channel):
 
-        self.db.remove_channel(channel.id)
+        await self.db.remove_channel(channel.id)
+        channel_index.remove_channel(channel.id)
 
         try:
             await intr.response.send_message(f'Channel #{intr.channel.name} will no longer receive HFC alerts')
@@ -234,14 +252,19 @@ class COG_Commands(commands.Cog):
                           description='Get all alerts up to a certain time back (may be slightly outdated)')
     @app_commands.describe(time='Amount of time back',
                            unit="The unit of time, can be 'h' (hors), 'm' (minutes), or 's' (seconds)",
-                           page='Results page')
-    async def latest_alerts(self, intr: discord.Interaction, time: int, unit: str, page: int = 1):
+                           page='Results page',
+                           district='Only show alerts for this district',
+                           area='Only show alerts for districts in this area')
+    async def latest_alerts(self, intr: discord.Interaction, time: int, unit: str, page: int = 1,
+                            district: str | None = None, area: str | None = None):
         """
         Get all alerts up to a certain time back (this may be slightly outdated)
         :param intr: command
         :param time: Amount of time back
         :param unit: The unit of time, can be 'h' (hors), 'm' (minutes), or 's' (seconds)
         :param page: Results page
+        :param district: Only show alerts for this district
+        :param area: Only show alerts for districts in this area
         :return:
         """
         units = ['h', 'hours', 'm', 'minutes', 's', 'seconds']
@@ -255,19 +278,21 @@ class COG_Commands(commands.Cog):
         elif unit in ['m', 'minutes']:
             time_s *= 60
 
-        if time_s > 86400:
-            await intr.response.send_message('You can currently only view history up to 1 day back.\n'
-                                             f'Please use the {md.u(md.hl("Home Front Command Website", "https://www.oref.org.il/"))} to view alerts further back')
-            return
-
         page_number = page - 1
         alert_count = 20
 
         try:
-            history_page = COG_Commands.get_alert_history_page(time_s, page_number, alert_count)
-        except requests.exceptions.Timeout:
+            if time_s > 86400 or district is not None or area is not None:
+                # HFC's history only goes a day back, and can't be filtered, so these are served from the local archive
+                history_page = await self.get_archive_page(time_s, page_number, alert_count, district, area)
+            else:
+                history_page = await self.get_alert_history_page(time_s, page_number, alert_count)
+        except asyncio.TimeoutError:
             await intr.response.send_message('Request timed out.')
             return
+        except CONNECTION_ERRORS:
+            await intr.response.send_message('Could not reach the HFC website.')
+            return
         except ValueError as e:
             await intr.response.send_message(e.__str__())
             return
@@ -279,99 +304,158 @@ class COG_Commands(commands.Cog):
         await intr.response.send_message(history_page,
                                          view=view)
 
-    @staticmethod
-    def get_alert_history_page(time_back_amount: int, page_number: int, alerts_in_page: int) -> str:
+    async def get_alert_history_page(self, time_back_amount: int, page_number: int, alerts_in_page: int) -> str:
         """
-        max_page is EXCLUSIVE!
         :param time_back_amount: amount of time back
         :param page_number: the page number (starting at 0)
         :param alerts_in_page: The number of alerts in one page
         :return: page as str
         """
 
-        alert_history = AlertReqs().request_history_json()
+        # Served from the shared cache while it's fresh, and parsed once per refresh
+        store = await self.history_cache.get_store()
+        return store.render_page(time_back_amount, page_number, alerts_in_page, self.render_history_page)
 
-        current_time = datetime.datetime.now()
-        time_back = datetime.timedelta(seconds=time_back_amount)
-
-        alert_counter = 0
-
-        for alert in alert_history:
-            # This can be merged with the other loop to optimize performance.
-            # Especially considering Python is a slow language.
-            # Too bad!
-            alert_date = datetime.datetime.strptime(alert["alertDate"], "%Y-%m-%d %H:%M:%S")
-
-            if abs(current_time - alert_date) > time_back:
-                break
-
-            alert_counter += 1
+    async def get_archive_page(self, time_back_amount: int, page_number: int, alerts_in_page: int,
+                               district: str | None, area: str | None) -> str:
+        """
+        :param time_back_amount: amount of time back
+        :param page_number: the page number (starting at 0)
+        :param alerts_in_page: The number of alerts in one page
+        :param district: District name to filter by (or None)
+        :param area: Area name to filter by (or None)
+        :return: page as str
+        """
+        if time_back_amount <= 0:
+            raise ValueError("Time can't be lower than 1.")
 
-        max_page = alert_counter // alerts_in_page
+        await alert_archive.load()
+        cutoff = time.time() - time_back_amount
+        records = alert_archive.query(cutoff, districts=self.resolve_district_filter(district, area))
 
-        if alert_counter % alerts_in_page != 0:
-            max_page += 1
+        note = ''
+        first = alert_archive.first_timestamp
+        if first is not None and first > cutoff:
+            note = f'{md.i("Alerts are only archived since " + datetime.datetime.fromtimestamp(first).strftime("%Y-%m-%d %H:%M:%S"))}\n'
 
-        if time_back_amount <= 0:
-            raise ValueError("Time can't be lower than 1.")
+        # Archived alerts may list many districts, so pages are also limited by Discord's message length
+        header_size = len(f'Page {len(records)}/{len(records)}\n\n')
+        pages = self.paginate_entries([self.render_archive_record(record) for record in records],
+                                      alerts_in_page, ARCHIVE_PAGE_CHARS - len(note) - header_size)
 
+        max_page = len(pages)
         if max_page == 0:
             raise ValueError("No results found.")
-
         if page_number >= max_page:
             raise ValueError("Page number is too high.")
         if page_number < 0:
             raise ValueError("Page number is too low.")
 
-        page_info = f'Page {page_number + 1}/{alert_counter // alerts_in_page + 1}\n\n'
+        return f'{note}Page {page_number + 1}/{max_page}\n\n{"".join(pages[page_number])}'
 
-        ret_str = ''
+    def resolve_district_filter(self, district: str | None, area: str | None) -> set[str] | None:
+        """
+        Get the names of all districts matching a district and/or area filter
+        :return: Set of district names, or None if there's no filter
+        :raises ValueError: If the district or area does not exist
+        """
+        if district is None and area is None:
+            return None
 
-        for alert in alert_history[(page_number * alerts_in_page):((page_number + 1) * alerts_in_page)]:
-            alert_date = datetime.datetime.strptime(alert["alertDate"], "%Y-%m-%d %H:%M:%S")
+        catalog = self.db.catalog
+        if not catalog.loaded:
+            raise ValueError('The district list is still loading, please try again in a few seconds.')
 
-            if abs(current_time - alert_date) > time_back:
-                break
+        names: set[str] = set()
+        if district is not None:
+            if catalog.get_district_by_name(district) is None:
+                raise ValueError(f'District "{district}" does not exist.')
+            names.add(district)
 
-            ret_str += f'התראה ב{md.b(alert["data"])}\n' \
-                       f'{md.u(alert["title"])}\n' \
-                       f'בשעה {alert["alertDate"]}\n\n'
+        if area is not None:
+            area_ids = [area_obj.id for area_obj in catalog.areas.values() if area_obj.name == area]
+            if len(area_ids) == 0:
+                raise ValueError(f'Area "{area}" does not exist.')
+            area_names = {dist.name for area_id in area_ids for dist in catalog.get_districts_in_area(area_id)}
+            # Both filters narrow down the results
+            names = names & area_names if district is not None else area_names
 
-        if ret_str == '':
-            ret_str = 'No results found'
-        else:
-            ret_str = page_info + ret_str
+        return names
+
+    @staticmethod
+    def render_archive_record(record: ArchivedAlert, district_limit: int = 10) -> str:
+        # Nationwide alerts may have over a thousand districts, which won't fit in a message
+        districts = ', '.join(record.districts[:district_limit])
+        if len(record.districts) > district_limit:
+            districts = f'{districts} ועוד {len(record.districts) - district_limit}'
 
-        return ret_str
+        return (f'התראה ב{md.b(districts)}\n'
+                f'{md.u(record.title)}\n'
+                f'בשעה {datetime.datetime.fromtimestamp(record.timestamp).strftime("%Y-%m-%d %H:%M:%S")}\n\n')
+
+    @staticmethod
+    def paginate_entries(entries: list[str], max_entries: int, max_chars: int) -> list[list[str]]:
+        """
+        Split rendered entries into pages, in order
+        :param entries: Rendered entries
+        :param max_entries: Maximum amount of entries in a page
+        :param max_chars: Maximum length of a page (an entry longer than that gets a page of its own)
+        :return: List of pages, each a list of entries
+        """
+        pages: list[list[str]] = []
+        page: list[str] = []
+        size = 0
+        for entry in entries:
+            if len(page) > 0 and (len(page) >= max_entries or size + len(entry) > max_chars):
+                pages.append(page)
+                page, size = [], 0
+            page.append(entry)
+            size += len(entry)
+
+        if len(page) > 0:
+            pages.append(page)
+        return pages
+
+    @staticmethod
+    def render_history_page(records: list[HistoryRecord], page_number: int, max_page: int) -> str:
+        lines = [f'Page {page_number + 1}/{max_page}\n\n']
+        for record in records:
+            lines.append(f'התראה ב{md.b(record.data)}\n'
+                         f'{md.u(record.title)}\n'
+                         f'בשעה {record.date}\n\n')
+        return ''.join(lines)
 
     @app_commands.command(name='info', description='Get client and system info')
     async def info_bot(self, intr: discord.Interaction):
         await intr.response.defer()
-        # Apparently this is a fairly massive command
-        # I am trying to prevent major slowdowns by creating a new task
-        # This is futile
-        asyncio.create_task(self.execute_bot_info(intr))
+        await self.execute_bot_info(intr)
 
     async def execute_bot_info(self, intr):
         def format_timedelta(timedelta: datetime.timedelta):
             return f'{timedelta.days} days, {((timedelta.seconds // 3600) % 24):02}:{((timedelta.seconds // 60) % 60):02}:{(timedelta.seconds % 60):02}'
 
-        # Gather all relevant data
+        def format_trend(seconds: float) -> str:
+            trend = host_info.trend(seconds)
+            return 'N/A' if trend is None else f'{trend[0]:.1f}% avg, {trend[1]:.1f}% peak'
+
+        # Everything here is served from memory: host facts are gathered once,
+        # metrics are sampled in the background, and channels are counted by the routing index
+        facts = await host_info.get_facts()
+        sample = host_info.latest
+
         curtime = time.time()
         client_uptime = datetime.timedelta(seconds=int(round(curtime - self.start_time)))
         client_uptime_format = format_timedelta(client_uptime)
-        system_uptime = datetime.timedelta(seconds=int(round(curtime - psutil.boot_time())))
+        system_uptime = datetime.timedelta(seconds=int(round(curtime - facts.boot_time)))
         system_uptime_format = format_timedelta(system_uptime)
-        uname = platform.uname()
-        if uname.system != "Linux":
-            system_name = f'{uname.system} {uname.release}'
-        else:
-            # Goddamnit Linux too many distros
-            system_name = f'{distro.name()} {distro.version_parts()[0]}.{distro.version_parts()[1]} ({distro.codename()})'
         b_to_mb = 1000000
 
-        pid = os.getpid()
-        process = psutil.Process(pid)
+        if sample is not None:
+            cpu_usage = f'{sample.cpu_percent}%'
+            ram_usage = f'{(sample.ram_used / b_to_mb):.2f} MB / {(facts.ram_total / b_to_mb):.2f} MB ({sample.ram_percent}%)'
+            process_ram = f'{(sample.process_rss / b_to_mb):.2f} MB'
+        else:
+            cpu_usage = ram_usage = process_ram = 'N/A'
 
         e = discord.Embed(color=discord.Color.orange())
         e.title = 'Home Front Command Notificator'
@@ -383,17 +467,20 @@ Client Uptime          :: {client_uptime_format}
 Instance Maintainer(s) :: {botinfo.maintainer}
 
 Guilds Joined          :: {len(self.bot.guilds)}
-Registered channels    :: {len(self.db.get_all_channels())}
+Registered channels    :: {len(channel_index)}
 
 ==== System Information ====
-OS            :: {system_name}
+OS            :: {facts.system_name}
 System Uptime :: {system_uptime_format}
 
-CPU           :: {cpuinfo.get_cpu_info()["brand_raw"]}
-CPU Usage     :: {psutil.cpu_percent()}%
-Cores         :: {psutil.cpu_count(logical=False)} ({psutil.cpu_count(logical=True)} Threads)
+CPU           :: {facts.cpu_name}
+CPU Usage     :: {cpu_usage}
+CPU (5 min)   :: {format_trend(5 * 60)}
+CPU (1 hour)  :: {format_trend(60 * 60)}
+Cores         :: {facts.physical_cores} ({facts.logical_cores} Threads)
 
-RAM Usage     :: {(psutil.virtual_memory().used / b_to_mb):.2f} MB / {(psutil.virtual_memory().total / b_to_mb):.2f} MB ({psutil.virtual_memory().percent}%)
+RAM Usage     :: {ram_usage}
+Bot RAM Usage :: {process_ram}
 ```''', inline=False)
         await intr.followup.send(embed=e)
 
@@ -476,9 +563,9 @@ RAM Usage     :: {(psutil.virtual_memory().used / b_to_mb):.2f} MB / {(psutil.vi
     async def locations_list(self, intr: discord.Interaction, search: str | None = None, page: int = 1):
         # decide the search_results
         if search is not None:
-            search_results = self.db.search_districts(*re.split(r"\s+", search))
+            search_results = await self.db.search_districts(*re.split(r"\s+", search))
         else:
-            search_results = self.db.get_all_districts()
+            search_results = await self.db.get_all_districts()
 
         try:
             # Turn into a display-able page
@@ -502,7 +589,7 @@ RAM Usage     :: {(psutil.virtual_memory().used / b_to_mb):.2f} MB / {(psutil.vi
             await intr.response.send_message('Error: You are missing the Manage Channels permission.')
             return
 
-        channel = self.get_matching_channel(intr)
+        channel = await self.get_matching_channel(intr)
         if channel.id is None:
             await intr.response.send_message('Could not find this channel. Are you sure it is registered?')
             return
@@ -517,11 +604,13 @@ RAM Usage     :: {(psutil.virtual_memory().used / b_to_mb):.2f} MB / {(psutil.vi
                 return
 
         try:
-            self.db.add_channel_districts(channel.id, location_ids)
+            await self.db.add_channel_districts(channel.id, location_ids)
         except ValueError as e:
             await intr.response.send_message(e.__str__())
             return
 
+        channel_index.add_locations(channel.id, location_ids)
+
         await intr.response.send_message('Successfully added all IDs')
 
     @location_group.command(name='remove', description='Remove a location(s) to the location list')
@@ -532,7 +621,7 @@ RAM Usage     :: {(psutil.virtual_memory().used / b_to_mb):.2f} MB / {(psutil.vi
             await intr.response.send_message('Error: You are missing the Manage Channels permission.')
             return
 
-        channel = self.get_matching_channel(intr)
+        channel = await self.get_matching_channel(intr)
         if channel is None:
             await intr.response.send_message('Could not find this channel. Are you sure it is registered?')
             return
@@ -546,7 +635,8 @@ RAM Usage     :: {(psutil.virtual_memory().used / b_to_mb):.2f} MB / {(psutil.vi
                 await intr.response.send_message(f'District ID {md.b(f"{location}")} is not a valid district ID.')
                 return
 
-        self.db.remove_channel_districts(channel.id, location_ids)
+        await self.db.remove_channel_districts(channel.id, location_ids)
+        channel_index.remove_locations(channel.id, location_ids)
         await intr.response.send_message('Successfully removed all IDs')
 
     @location_group.command(name='clear', description='Clear all registered locations (get alerts on all locations)')
@@ -556,7 +646,7 @@ RAM Usage     :: {(psutil.virtual_memory().used / b_to_mb):.2f} MB / {(psutil.vi
             await intr.response.send_message('Error: You are missing the Manage Channels permission.')
             return
 
-        channel = self.get_matching_channel(intr)
+        channel = await self.get_matching_channel(intr)
         if channel is None:
             await intr.response.send_message('Could not find this channel. Are you sure it is registered?')
             return
@@ -571,7 +661,8 @@ RAM Usage     :: {(psutil.virtual_memory().used / b_to_mb):.2f} MB / {(psutil.vi
             await intr.response.send_message(f'Invalid confirmation string!')
             return
 
-        self.db.clear_channel_districts(channel.id)
+        await self.db.clear_channel_districts(channel.id)
+        channel_index.clear_locations(channel.id)
         await intr.response.send_message(
             f'Cleared all registered locations.\nChannel will now receive alerts from every location.')
 
@@ -580,17 +671,18 @@ RAM Usage     :: {(psutil.virtual_memory().used / b_to_mb):.2f} MB / {(psutil.vi
     @app_commands.describe(search='Search tokens, separated by spaces')
     async def location_registered(self, intr: discord.Interaction, search: str | None = None, page: int = 1):
 
-        channel = self.get_matching_channel(intr)
+        channel = await self.get_matching_channel(intr)
         if channel is None:
             await intr.response.send_message('Could not find this channel. Are you sure it is registered?')
             return
 
         if search is None:
+            channel_district_ids = await self.db.get_channel_district_ids(channel.id)
             search_results = [dist.to_tuple() for dist in
-                              self.db.district_ids_to_districts(*self.db.get_channel_district_ids(channel.id))]
+                              await self.db.district_ids_to_districts(*channel_district_ids)]
         else:
             search_results = [dist.to_tuple() for dist in
-                              self.db.search_channel_districts(channel.id, *re.split(r"\s+", search))]
+                              await self.db.search_channel_districts(channel.id, *re.split(r"\s+", search))]
 
         districts = sorted(search_results, key=lambda tup: tup[1])
 
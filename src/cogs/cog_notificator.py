@@ -1,38 +1,68 @@
 import asyncio
+import math
 import sys
 from typing import Any
 
+import aiohttp
 import db_access as db_access
 import discord
-import requests
 from db_access import *
 from discord import app_commands, VoiceChannel, StageChannel, ForumChannel, CategoryChannel
 from discord.abc import PrivateChannel
 from discord.ext import commands, tasks
+from cogs import NOTIFICATOR_COG
 from log_utils import errlogging, loggers
-from utils.alert_maker import AlertEmbed, AlertEmbedFactory, DistrictsEmbed, Alert
-from utils.alert_reqs import AlertReqs
+from utils.alert_archive import alert_archive
+from utils.alert_maker import AlertEmbed, AlertEmbedFactory, DistrictsEmbed, DistrictsMessage, Alert
+from utils.alert_reqs import AsyncAlertReqs, CONNECTION_ERRORS
+from utils.cooldowns import DistrictCooldowns
+from utils.dispatcher import AlertDispatcher, DispatchJob
+from utils.district_source import district_source
+from utils.handoff import handoff
+from utils.latency import AlertTimeline, latency_tracker
+from utils.startup_timer import startup_timer
+from utils.subscriptions import channel_index
 
 load_dotenv()
 AUTHOR_ID = int(os.getenv('AUTHOR_ID'))
 EXPECTED_LOOP_DELTA_MIN = 0.8
 EXPECTED_LOOP_DELTA_MAX = 1.2
+DISTRICT_COOLDOWN = 60  # seconds
+# Send to channels with the least time to reach shelter first
+URGENCY_FIRST = os.getenv('URGENCY_FIRST', 'true').lower() != 'false'
+# Seconds to let an in-progress poll finish when the cog is unloaded
+UNLOAD_POLL_TIMEOUT = 5
 
-COG_CLASS = "COG_Notificator"
+COG_CLASS = NOTIFICATOR_COG
 
 cog: Any
 
 # 2023-10-26 I have decided to start documenting the project.
 
 
-class AlertEmbeds:
+class DispatchGroup:
     """
-    This is a container class for all embeds that need to be sent in an alert
+    A group of channels which share the same filtered locations, and thus receive the exact same alert messages.
+
+    The group's messages are rendered once, and reused for every channel in it.
     """
-    def __init__(self, start_embed: discord.Embed, district_embeds: list[DistrictsEmbed], end_embed: discord.Embed):
-        self.start_embed = start_embed
-        self.district_embeds = district_embeds
-        self.end_embed = end_embed
+    def __init__(self, locations: list[AreaDistrict | str]):
+        self.locations = locations
+        self.channels: list[Channel] = []
+
+        # Filled in by COG_Notificator._render_group()
+        self.unified_embed: DistrictsEmbed | None = None
+        self.messages: list[DistrictsMessage] = []
+        self.contents: list[str | None] = []
+
+    @property
+    def min_migun_time(self) -> float:
+        """
+        The shortest time to reach shelter among the group's locations (infinity if none is known)
+        """
+        migun_times = [dist.migun_time for dist in self.locations
+                       if isinstance(dist, AreaDistrict) and dist.migun_time is not None]
+        return min(migun_times, default=math.inf)
 
 
 # noinspection PyUnresolvedReferences
@@ -42,7 +72,10 @@ class COG_Notificator(commands.Cog):
     monitoring new alerts
     """
 
-    districts: list[dict] = json.loads(requests.get('https://www.oref.org.il/districts/districts_heb.json').text)
+    @property
+    def districts(self) -> list[dict]:
+        # Served from the botdata snapshot, see utils.district_source
+        return district_source.districts
 
     def __init__(self, bot: commands.Bot):
         """
@@ -52,31 +85,44 @@ class COG_Notificator(commands.Cog):
         """
 
         # Set up log_utils
-        self.log = logging.Logger(COG_CLASS)
-
-        handler = logging.StreamHandler()
-        handler.setFormatter(loggers.ColorFormatter())
-        self.log.addHandler(handler)
-        self.log.addHandler(loggers.DefaultFileHandler("LOG_ALL.log"))
+        self.log = loggers.get_logger(COG_CLASS)
 
         self.log.info(f'Initializing {COG_CLASS}...')
 
         # Set up client and db
         self.bot = bot
-        self.db = DBAccess()
-        self.alert_reqs = AlertReqs()
-
-        # set up internal vars
-        self.district_timeouts: dict[str, dict[int, int]] = {}
+        self.db = get_shared_db()
 
         self.loop_count_checker = 0
         self.last_loop_run_time = time.time() - 1  # Verify first iteration goes by smoothly
+        self.last_loop_delta = 0.0
+
+        self._polling = False
+        self._unloaded = False
+
+        # On reload, take over the previous instance's warm session, running workers and cooldowns
+        state = handoff.claim(COG_CLASS)
+        if state is not None:
+            self.alert_reqs: AsyncAlertReqs = state['alert_reqs']
+            self.dispatcher: AlertDispatcher = state['dispatcher']
+            self.district_cooldowns: DistrictCooldowns = state['district_cooldowns']
+            self.last_alert: dict | None = state['last_alert']
+            self.has_connection: bool = state['has_connection']
+            self.log.info(f'Took over the runtime state of the previous {COG_CLASS}')
+        else:
+            self.alert_reqs = AsyncAlertReqs()
 
-        # begin check task
-        if not self.check_for_updates.is_running():
-            self.check_for_updates.start()
+            # Set up the alert sending workers
+            self.dispatcher = AlertDispatcher(urgency_first=URGENCY_FIRST, log=self.log)
+
+            # set up internal vars
+            self.district_cooldowns = DistrictCooldowns(DISTRICT_COOLDOWN)
+            # The last non-empty alert received, kept alive while polls come back unchanged
+            self.last_alert = None
+
+            self.has_connection = True
 
-        self.has_connection = True
+        self.dispatcher.start()
 
         self.start_time = time.time()
 
@@ -97,6 +143,52 @@ class COG_Notificator(commands.Cog):
         await bot.add_cog(_cog)
         return _cog
 
+    async def cog_load(self):
+        """
+        Load the district catalog, the alert archive and the channel routing index,
+        and only then start checking for alerts
+        """
+        if not self.db.catalog.loaded:
+            await self.db.refresh_catalog()
+        await alert_archive.load()
+        district_source.start()
+        channel_index.load(await self.db.get_all_channels())
+
+        # begin check task. When loaded before the bot is ready, it is started by on_ready instead,
+        # as alerts can't be sent until then
+        if self.bot.is_ready() and not self.check_for_updates.is_running():
+            self.check_for_updates.start()
+
+    async def cog_unload(self):
+        """
+        Stop checking for alerts, and hand the runtime state off to the next instance (in case this is a reload).
+        The alert sending workers keep running meanwhile, so queued alerts are still delivered.
+        """
+        self._unloaded = True
+
+        # Let a running poll finish handling its alert, instead of cutting it off halfway
+        task = self.check_for_updates.get_task()
+        if self._polling and task is not None:
+            self.check_for_updates.stop()
+            await asyncio.wait([task], timeout=UNLOAD_POLL_TIMEOUT)
+        self.check_for_updates.cancel()
+
+        handoff.deposit(COG_CLASS, {
+            'alert_reqs': self.alert_reqs,
+            'dispatcher': self.dispatcher,
+            'district_cooldowns': self.district_cooldowns,
+            'last_alert': self.last_alert,
+            'has_connection': self.has_connection
+        }, on_expire=self._release_state)
+
+    @staticmethod
+    async def _release_state(state: dict):
+        """
+        Stop the alert sending workers and close the HFC session, once no new instance took them over
+        """
+        await state['dispatcher'].stop()
+        await state['alert_reqs'].close()
+
     @commands.Cog.listener()
     async def on_ready(self):
         """
@@ -106,7 +198,7 @@ class COG_Notificator(commands.Cog):
             return
         self.check_for_updates.start()
 
-    def in_registered_channel(self, intr: discord.Interaction) -> bool | None:
+    async def in_registered_channel(self, intr: discord.Interaction) -> bool | None:
         """
         an info about current channel
         :param intr: Command interaction from discord
@@ -126,24 +218,24 @@ class COG_Notificator(commands.Cog):
         # 17:42 update: Turns out I am very dumb and if the channel is not registered I don't return None but rather keep going
         # Thanks yrrad8! (/srs)
 
-        if self.db.is_registered_channel(intr.channel_id):
+        if await self.db.is_registered_channel(intr.channel_id):
             return True
 
-        if self.db.is_registered_channel(intr.user.id):
+        if await self.db.is_registered_channel(intr.user.id):
             return False
 
         return None
 
-    def get_matching_channel(self, intr: discord.Interaction) -> db_access.Channel:
+    async def get_matching_channel(self, intr: discord.Interaction) -> db_access.Channel:
         """
         Gets the matching Channel ID for Server Channel or DM. Returns None if UNREGISTERED or not found
         :param intr: Command interaction from discord
         :return:  registered channel ID
         """
 
-        channel = self.db.get_channel(intr.channel_id)
+        channel = await self.db.get_channel(intr.channel_id)
         if channel is None:
-            channel = self.db.get_channel(intr.user.id)
+            channel = await self.db.get_channel(intr.user.id)
         return channel
 
     @staticmethod
@@ -157,32 +249,39 @@ class COG_Notificator(commands.Cog):
             return False
         return True
 
-    async def _decrement_districts_timeouts(self):
-        for dist_name in self.district_timeouts.copy().keys():
-            for cat in self.district_timeouts[dist_name].copy().keys():
-                self.district_timeouts[dist_name][cat] -= 1
-                if self.district_timeouts[dist_name][cat] <= 0:
-                    self.district_timeouts[dist_name].pop(cat, None)
-                    self.log.debug(f'Popped district category {dist_name}:{cat}')
+    async def _expire_districts_timeouts(self):
+        for dist_name, cat in self.district_cooldowns.expire():
+            self.log.debug('Popped district category %s:%s', dist_name, cat)
 
-            # I like <= over ==, due to a (probably unreasonable) fear that something might go wrong, and it would get decremented twice
-            if len(self.district_timeouts[dist_name]) == 0:
-                self.district_timeouts.pop(dist_name, None)
-                self.log.debug(f'Popped district {dist_name}')
+    def _refresh_districts_timeouts(self, alert_data: dict):
+        """
+        Reset the cooldowns of all of an alert's districts, without checking which of them are new
+        """
+        alert_cat = alert_data.get("cat")
+        for district_name in alert_data["data"]:
+            self.district_cooldowns.touch(district_name, alert_cat)
 
     @tasks.loop(seconds=1, reconnect=False)
     async def check_for_updates(self):
+        self._polling = True
+        try:
+            await self._check_for_updates()
+        finally:
+            self._polling = False
+
+    async def _check_for_updates(self):
         # Check if the loop is running multiple too fast or too slow
         current_time = time.time()
         delta = round(current_time - self.last_loop_run_time, 3)
+        self.last_loop_delta = delta
 
         if delta < EXPECTED_LOOP_DELTA_MIN:
-            self.log.warning(f'Loop is running too quickly! Expected delta > {EXPECTED_LOOP_DELTA_MIN}s, but got {delta}s. Restarting...')
+            self.log.warning('Loop is running too quickly! Expected delta > %ss, but got %ss. Restarting...', EXPECTED_LOOP_DELTA_MIN, delta)
             self.check_for_updates.stop()
             return
 
         if delta > EXPECTED_LOOP_DELTA_MAX:
-            self.log.warning(f'Loop is running too slowly! Expected delta < {EXPECTED_LOOP_DELTA_MAX}s, but got {delta}s instead. Do you have enough resources?')
+            self.log.warning('Loop is running too slowly! Expected delta < %ss, but got %ss instead. Do you have enough resources?', EXPECTED_LOOP_DELTA_MAX, delta)
 
         self.last_loop_run_time = current_time
 
@@ -199,16 +298,28 @@ class COG_Notificator(commands.Cog):
 
         try:
             # Get the newest alert
-            current_alert: dict | None = self.alert_reqs.request_alert_json()
-        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            changed, current_alert = await self.alert_reqs.poll_alert_json()
+            received, received_at = time.perf_counter(), time.time()
+            if startup_timer.finish('first alert poll'):
+                self.log.info(startup_timer.report())
+        except CONNECTION_ERRORS:
             # handle connection issues
             self.log.warning("Lost connection!")
-            current_alert = await self.handle_connection_failure()
+            changed, current_alert = True, await self.handle_connection_failure()
+            received, received_at = time.perf_counter(), time.time()
 
-        self.log.debug(f'Alert response: {current_alert}')
+        # Expire all districts' cooldowns that are over.
+        await self._expire_districts_timeouts()
 
-        # Decrement all districts' cooldowns.
-        await self._decrement_districts_timeouts()
+        if not changed:
+            # Same payload as last poll, nothing new to parse or diff.
+            # Only keep the still-running alert's districts on cooldown, like handling it again would have.
+            self.loop_count_checker -= 1
+            if self.last_alert is not None:
+                self._refresh_districts_timeouts(self.last_alert)
+            return
+
+        self.log.debug('Alert response: %s', current_alert)
 
         # If the current alert is None, it means there was an error retrieving the data
         if current_alert is None:
@@ -220,7 +331,10 @@ class COG_Notificator(commands.Cog):
 
         # We have some data! Better go handle that lol
         if len(current_alert) > 0:
-            await self.handle_alert_data(current_alert)
+            self.last_alert = current_alert
+            await self.handle_alert_data(current_alert, received, received_at)
+        else:
+            self.last_alert = None
 
     async def handle_connection_failure(self):
         """
@@ -231,23 +345,20 @@ class COG_Notificator(commands.Cog):
             await asyncio.sleep(5)
             try:
                 self.log.info("Attempting reconnection: ")
-                alert = self.alert_reqs.request_alert_json()
-            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                alert = await self.alert_reqs.request_alert_json()
+            except CONNECTION_ERRORS:
                 self.log.info("Failed to reconnect.")
             else:
                 return alert
 
     @check_for_updates.after_loop
     async def after_update_loop(self):
-        # Attempt to force stupid "Unread Result" down its own throat
-        # and just reset the connection.
-        # I'm not dealing with Unread Results
-        self.db.connection.close()
-        self.db = DBAccess()
-        self.start_loop()
+        # No need to reset the DB connection anymore,
+        # as every query checks out a pooled connection that is health-checked first
+        if not self._unloaded:
+            self.start_loop()
 
     def start_loop(self):
-        self.db = DBAccess()
         self.check_for_updates.restart()
 
     @check_for_updates.error
@@ -255,16 +366,20 @@ class COG_Notificator(commands.Cog):
         self.log.warning(f"Update loop errored: {err}")
         errlogging.new_errlog(err)
 
+        # The poll that errored may have been a new alert that was never handled,
+        # so the first poll after the restart handles the running alert again (cooldowns drop repeats)
+        self.alert_reqs.reset_change_detection()
+
         errlogging.new_errlog(sys.exc_info()[1])
-        if isinstance(err, requests.exceptions.Timeout):
+        if isinstance(err, asyncio.TimeoutError):
             while True:
                 self.log.info(f'Attempting reconnect...')
                 await asyncio.sleep(2)
                 try:
-                    self.alert_reqs.request_alert_json()
-                except requests.exceptions.Timeout as error:
+                    await self.alert_reqs.request_alert_json()
+                except asyncio.TimeoutError as error:
                     self.log.error(f'Request timed out: {error}')
-                except requests.exceptions.ConnectionError as error:
+                except aiohttp.ClientConnectionError as error:
                     self.log.error(f'Request failed: {error}')
                 else:
                     self.log.info(f'Back online!')
@@ -287,11 +402,21 @@ class COG_Notificator(commands.Cog):
         view.add_item(button)
         return view
 
-    async def handle_alert_data(self, current_alert: dict):
+    async def handle_alert_data(self, current_alert: dict, received: float | None = None,
+                                received_at: float | None = None):
+        """
+        Send out an alert to its new districts (the districts that are not on cooldown),
+        and archive it with all of its districts
+        :param current_alert: Alert data dict, as received from HFC
+        :param received: When the alert was received (time.perf_counter()), default is now
+        :param received_at: When the alert was received (epoch seconds), default is now
+        """
+        if received_at is None:
+            received_at = time.time()
 
         # Code for testing nationwide alert
         if current_alert["data"][0] == '*':
-            current_alert["data"] = [tup[1] for tup in self.db.get_all_districts()]
+            current_alert["data"] = [tup[1] for tup in await self.db.get_all_districts()]
 
         active_districts: list[str] = current_alert["data"]
         new_districts: list[str] = []
@@ -300,43 +425,44 @@ class COG_Notificator(commands.Cog):
 
         # Gather only the new districts, and reset all district cooldowns
         for district_name in active_districts:
-
-            # Gather new district to new_districts list
-            if district_name not in self.district_timeouts.keys():
-                new_districts.append(district_name)
-            elif alert_cat not in self.district_timeouts.get(district_name):
+            # Set district cooldown to 60s, whether new or not,
+            # and gather it to the new_districts list if it was not on cooldown
+            if self.district_cooldowns.touch(district_name, alert_cat):
                 new_districts.append(district_name)
 
-            # Set district timeout to 60s, whether new or not
-            if self.district_timeouts.get(district_name, None) is None:
-                self.district_timeouts[district_name] = {}
-
-            self.district_timeouts[district_name][alert_cat] = 60
-
-        if len(new_districts) == 0:
-            return
+        if len(new_districts) > 0:
+            timeline = latency_tracker.begin(current_alert, received)
+            timeline.mark('dedup')
 
-        new_districts_tup = tuple(new_districts)
+            try:
+                # We have picked out the new districts. Send out alerts.
+                await self.send_new_alert(current_alert, tuple(new_districts), timeline)
+            except Exception as e:
+                self.log.error('Could not send message!\nError info: %s', e)
 
+        # Every observed alert is archived with all of its districts, even if they were all on cooldown.
+        # Written after sending, so archiving never delays an alert.
         try:
-            # We have picked out the new districts. Send out alerts.
-            await self.send_new_alert(current_alert, new_districts_tup)
-        except Exception as e:
-            self.log.error(f'Could not send message!\nError info: {e.__str__()}')
+            await alert_archive.record(current_alert, active_districts, received_at)
+        except OSError as e:
+            self.log.error('Could not archive alert!\nError info: %s', e)
 
     @errlogging.async_errlog
-    async def send_new_alert(self, alert_data: dict, new_districts: tuple[str, ...]):
+    async def send_new_alert(self, alert_data: dict, new_districts: tuple[str, ...], timeline: AlertTimeline | None = None):
         """
         Push an alert to all registered channels
         :param alert_data: Alert data dict (see test_alert for format)
         :param new_districts: Currently active districts (districts that were not already active)
+        :param timeline: The alert's latency timeline (a new one, starting now, by default)
         :return:
         """
+        if timeline is None:
+            timeline = latency_tracker.begin(alert_data)
 
         if new_districts[0] == '*':
-            new_districts = tuple(dist[1] for dist in self.db.get_all_districts())
+            new_districts = tuple(dist[1] for dist in await self.db.get_all_districts())
 
-        self.log.info(f'Sending alerts to channels')
+        self.log.info('Sending alerts to channels')
 
         alert = Alert.from_dict(alert_data)
 
@@ -345,56 +471,128 @@ class COG_Notificator(commands.Cog):
         end_alert_embed = AlertEmbedFactory.make_alert_embed(alert)
         end_alert_embed.description = "סוף רשימת מקומות להתראה.\n**הערה:** הטמעה זו נשלחת רק כאשר נשלחו לפחות 2 הטמעות של \"מקומות התתראה\"."
 
-        # get all new districts' data
-        # TODO: This can probably even be done as an external cache, reducing load whenever an alert is sent
-        dists = self.db.get_area_districts_by_name(new_districts)
+        # get all new districts' data (served from the in-memory district catalog)
+        dists = await self.db.get_area_districts_by_name(new_districts)
 
         # Make districts gettable by ID instead of by name for quick lookup
-        # TODO: This can probably even be done as an external cache, reducing load whenever an alert is sent
         dists_by_id = {}
         for dist_name, dist in dists.items():
             # prepare dists by ID
             dists_by_id[dist.district_id] = dist
 
-        # Get all registered channels and prep them for sending
-        for channel_tup in self.db.get_all_channels():
-            # Convert from DB channel to sendable channel
-            channel = Channel.from_tuple(channel_tup)
-            dc_ch = self.get_sendable_channel(channel)
+        # Get only the channels subscribed to the alert's districts (or to all districts)
+        matches = channel_index.match(dists[name].district_id for name in new_districts if name in dists)
+        timeline.mark('lookup')
+
+        # Group the channels by their filtered locations, and render each group only once
+        plan = await self._make_dispatch_plan(new_districts, dists, dists_by_id, matches)
+        for group in plan:
+            self._render_group(alert, group, alert_embed, end_alert_embed)
+        timeline.mark('render')
 
-            # Filter the channel's locations
-            filtered_locations = await self._filter_channel_locations(new_districts, dists, dists_by_id, channel)
+        self.log.info('Rendered %d distinct location sets for %d channels', len(plan), sum(len(group.channels) for group in plan))
 
-            # No alerts shall be sent in this channel
-            if len(filtered_locations) == 0:
-                continue
+        for group in plan:
+            migun_time = group.min_migun_time
+            for channel in group.channels:
+                # relay to the dispatcher and start prepping the next channel
+                self.dispatcher.submit(self._make_dispatch_job(alert, group, channel, migun_time, timeline))
+        timeline.expect(sum(len(group.channels) for group in plan))
 
-            # Send alert embed to minimize messages even more
-            # and to allow for mobile/overlay notifs
-            if len(filtered_locations) <= 8:
-                result_embed = AlertEmbedFactory.make_unified_embed(alert, filtered_locations)
+        # Clean up after channels that have not been sent to in a while
+        self.dispatcher.prune_routes()
 
-                # relay to a secondary thread and start prepping the next channel
-                asyncio.create_task(self.send_unified_embed_to_channel(alert, dc_ch, result_embed))
+    def _make_dispatch_job(self, alert: Alert, group: DispatchGroup, channel: Channel, migun_time: float,
+                           timeline: AlertTimeline) -> DispatchJob:
+        """
+        Make a job that sends a group's rendered alert to one of its channels
 
-                # prep next channel
-                continue
+        Jobs are as urgent as the channel's shortest migun time, and ties go to channels with more subscribers
+        """
+        # Convert from DB channel to sendable channel
+        dc_ch = self.get_sendable_channel(channel)
 
-            # Make all districts' embeds, now that we know we're going to have to send a locations embed
-            district_embeds: list[DistrictsEmbed] = AlertEmbedFactory.make_districts_embed(alert, filtered_locations)
+        # Guild channels are scheduled fairly by guild, while every DM stands on its own
+        if channel.server_id is not None:
+            fair_key = channel.server_id
+            guild = getattr(dc_ch, 'guild', None)
+            subscribers = guild.member_count or 0 if guild is not None else 0
+        else:
+            fair_key = ('dm', channel.id)
+            subscribers = 1
+
+        kind = 'guild' if channel.server_id is not None else 'dm'
+
+        async def run():
+            timeline.channel_started(channel.id, kind)
+            ok = False
+            try:
+                if group.unified_embed is not None:
+                    ok = await self.send_unified_embed_to_channel(alert, dc_ch, group.unified_embed, group.contents[0],
+                                                                  timeline)
+                else:
+                    ok = await self.send_to_one_channel(alert, dc_ch, group.messages, group.contents, timeline)
+            finally:
+                timeline.channel_done(channel.id, ok)
 
-            # place in container object
-            embeds = AlertEmbeds(alert_embed, district_embeds, end_alert_embed)
+        return DispatchJob(fair_key, channel.id, run, urgency=(migun_time, -subscribers))
 
-            # relay to a secondary thread and start prepping the next channel
-            asyncio.create_task(self.send_to_one_channel(alert, dc_ch, embeds))
+    async def _make_dispatch_plan(
+            self,
+            new_districts: tuple[str, ...],
+            dists: dict[str, AreaDistrict],
+            dists_by_id: dict[int, AreaDistrict],
+            matches: dict[int, list[int] | None]
+    ) -> list[DispatchGroup]:
+        """
+        Group all matched channels by their filtered locations
+
+        :param new_districts: A tuple of strings representing all new districts.
+        :param dists: A mapping of district names to AreaDistrict objects.
+        :param dists_by_id: A mapping of district IDs to AreaDistrict objects.
+        :param matches: The matched channels, as given by SubscriptionIndex.match()
+
+        :returns: A list of all groups that have locations to send
+        """
+        groups: dict[tuple[int, ...] | None, DispatchGroup] = {}
+
+        for channel_id, matched_ids in matches.items():
+            key = None if matched_ids is None else tuple(matched_ids)
+
+            group = groups.get(key)
+            if group is None:
+                # Filter the group's locations
+                filtered_locations = await self._filter_channel_locations(new_districts, dists, dists_by_id, matched_ids)
+                group = DispatchGroup(filtered_locations)
+                groups[key] = group
+
+            group.channels.append(channel_index.channels[channel_id])
+
+        # No alerts shall be sent in channels without locations
+        return [group for group in groups.values() if len(group.locations) > 0]
+
+    def _render_group(self, alert: Alert, group: DispatchGroup, alert_embed: discord.Embed, end_alert_embed: discord.Embed):
+        """
+        Render the messages of a dispatch group
+        """
+        # Send alert embed to minimize messages even more
+        # and to allow for mobile/overlay notifs
+        if len(group.locations) <= 8:
+            group.unified_embed = AlertEmbedFactory.make_unified_embed(alert, group.locations)
+            group.contents = [self.format_districts_content(alert, group.unified_embed)]
+            return
+
+        # Make all districts' embeds, now that we know we're going to have to send a locations embed,
+        # and pack them along with the start and end embeds into as few messages as possible
+        group.messages = AlertEmbedFactory.make_districts_messages(alert, group.locations, alert_embed, end_alert_embed)
+        group.contents = [self.format_districts_content(alert, message) for message in group.messages]
 
     @staticmethod
     async def _filter_channel_locations(
             new_districts: tuple[str, ...],
             dists: dict[str, AreaDistrict],
             dists_by_id: dict[int, AreaDistrict],
-            channel: Channel
+            matched_ids: list[int] | None
     ) -> list[AreaDistrict | str]:
         """
         Filters the locations associated with a given channel based on the provided districts.
@@ -402,12 +600,12 @@ class COG_Notificator(commands.Cog):
         :param new_districts: A tuple of strings representing all new districts.
         :param dists: A mapping of district names to AreaDistrict objects.
         :param dists_by_id: A mapping of district IDs to AreaDistrict objects.
-        :param channel: The channel to filter for
+        :param matched_ids: The channel's matched district IDs, as given by SubscriptionIndex.match()
 
         :returns: A list of filtered locations with either the AreaDistrict objects or strings.
         """
         # Check if the channel has a locations filter
-        if len(channel.locations) == 0:
+        if matched_ids is None:
             # Filtered locations is basically all active locations
             filtered_locations: list[AreaDistrict | str] = []
             for dist in new_districts:
@@ -415,12 +613,8 @@ class COG_Notificator(commands.Cog):
                 filtered_locations.append(dist)
         else:
             # prepare only registered locations
-            # (while minimizing queries to the DB)
-            filtered_locations = []
-            for loc in channel.locations:
-                dist = dists_by_id.get(loc)
-                if dist is not None:  # Because if the dist is not in the new dists, it'll be None
-                    filtered_locations.append(dist)
+            # (the index only matches districts that are in the new dists)
+            filtered_locations = [dists_by_id[loc] for loc in matched_ids]
         return filtered_locations
 
     def get_sendable_channel(self, channel: Channel):
@@ -435,46 +629,75 @@ class COG_Notificator(commands.Cog):
             dc_ch = self.bot.get_user(channel.id)
         return dc_ch
 
-    async def send_unified_embed_to_channel(self, alert: Alert, dc_ch, embed: DistrictsEmbed):
+    def _count_failed_send(self, err: Exception):
+        self.dispatcher.stats.failed += 1
+        if isinstance(err, discord.HTTPException) and err.status == 429:
+            self.dispatcher.stats.rate_limited += 1
+
+    async def send_unified_embed_to_channel(self, alert: Alert, dc_ch, embed: DistrictsEmbed, content: str | None = None,
+                                            timeline: AlertTimeline | None = None) -> bool:
+        """
+        :return: Whether the alert was sent
+        """
         try:
-            content = self.format_districts_content(alert, embed)
+            if content is None:
+                content = self.format_districts_content(alert, embed)
+            await self.dispatcher.throttle(dc_ch.id)
             await dc_ch.send(content=content, embed=embed.embed)
+            self.dispatcher.stats.sent += 1
+            if timeline is not None:
+                timeline.sent(dc_ch.id)
         except Exception as e:
+            self._count_failed_send(e)
             if isinstance(dc_ch, discord.User):
-                self.log.warning(f'Could not send (unified) alert to user @{dc_ch.name}.\nError info: {e}')
+                self.log.warning('Could not send (unified) alert to user @%s.\nError info: %s', dc_ch.name, e)
             else:
-                self.log.warning(f'Could not send alert to channel #{dc_ch.name}@{dc_ch.guild}.\nError info: {e}')
+                self.log.warning('Could not send alert to channel #%s@%s.\nError info: %s', dc_ch.name, dc_ch.guild, e)
             errlogging.new_errlog(e)
+            return False
         else:
-            self.log.info(f"Finished channel {dc_ch.name}")
+            self.log.debug('Finished channel %s', dc_ch.name)
+            return True
 
-    async def send_to_one_channel(self, alert: Alert, dc_ch, embeds: AlertEmbeds):
-        alert_embed = embeds.start_embed
-        district_embeds = embeds.district_embeds
-        end_alert_embed = embeds.end_embed
+    async def send_to_one_channel(self,
+                                  alert: Alert,
+                                  dc_ch,
+                                  messages: list[DistrictsMessage],
+                                  contents: list[str | None] | None = None,
+                                  timeline: AlertTimeline | None = None) -> bool:
+        """
+        :return: Whether all messages were sent
+        """
+        if contents is None:
+            contents = [self.format_districts_content(alert, message) for message in messages]
 
         try:
-            await dc_ch.send(embed=alert_embed)
-            for dists_emb in district_embeds:
-                content = self.format_districts_content(alert, dists_emb)
-                await dc_ch.send(content=content, embed=dists_emb.embed)
-                await asyncio.sleep(0.02)
-            if len(district_embeds) >= 2:
-                await dc_ch.send(embed=end_alert_embed)
+            for message, content in zip(messages, contents):
+                await self.dispatcher.throttle(dc_ch.id)
+                await dc_ch.send(content=content, embeds=message.embeds)
+                self.dispatcher.stats.sent += 1
+                if timeline is not None:
+                    timeline.sent(dc_ch.id)
         except Exception as e:
+            self._count_failed_send(e)
             if isinstance(dc_ch, discord.User):
-                self.log.warning(f'Could not send alert to user @{dc_ch.name}.\nError info: {e}')
+                self.log.warning('Could not send alert to user @%s.\nError info: %s', dc_ch.name, e)
             else:
-                self.log.warning(f'Could not send alert to channel #{dc_ch.name}@{dc_ch.guild}.\nError info: {e}')
+                self.log.warning('Could not send alert to channel #%s@%s.\nError info: %s', dc_ch.name, dc_ch.guild, e)
             errlogging.new_errlog(e)
+            return False
         else:
-            self.log.info(f"Finished channel {dc_ch.name}")
+            self.log.debug('Finished channel %s', dc_ch.name)
+            return True
 
     @staticmethod
-    def format_districts_content(alert: Alert, dists_emb: DistrictsEmbed):
+    def format_districts_content(alert: Alert, dists_emb: DistrictsEmbed | DistrictsMessage) -> str | None:
         """
-        This method formats the districts content that shall be sent alongside the embed
+        This method formats the districts content that shall be sent alongside the embed(s)
         """
+        if len(dists_emb.districts) == 0:
+            return None
+
         districts_content_fmt = ", ".join(dists_emb.districts)
         content = f"**{alert.title}** | {districts_content_fmt}"
         return content
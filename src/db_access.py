@@ -1,17 +1,33 @@
 import asyncio
+import contextlib
+import functools
 import json
 import logging
 import os
+import threading
 import time
-from typing import Sequence
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Sequence
 
 from dotenv import load_dotenv
+from log_utils import loggers
 from mysql import connector as mysql
+from mysql.connector import pooling
 from mysql.connector.abstracts import MySQLCursorAbstract
+from mysql.connector.constants import ClientFlag
 
 load_dotenv()
 DB_USERNAME = os.getenv('DB_USERNAME')
 DB_PASSWORD = os.getenv('DB_PASSWORD')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+# Storage backend to use, either 'mysql' or 'sqlite'
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql')
+
+# Row counts are of matched rows rather than changed rows, so an upsert that hits an unchanged row still counts it
+CLIENT_FLAGS = [ClientFlag.FOUND_ROWS]
+# Channel locations are aggregated with GROUP_CONCAT, whose result is cut off at 1024 bytes by default
+INIT_COMMAND = 'SET SESSION group_concat_max_len = 1048576'
 
 
 class Area:
@@ -210,7 +226,183 @@ class DistrictIterator:
         return District.from_tuple(res)
 
 
-class DBAccess:
+class DBBackend(ABC):
+    """
+    The interface of a storage backend.
+
+    DBAccess implements it over MySQL, and db_sqlite.SQLiteDBAccess over an embedded SQLite database.
+    Channel records are returned as tuples of (channel_id, server_id, channel_lang, locations JSON),
+    and district records as tuples of (district_id, district_name, area_id, migun_time).
+
+    Channel locations are stored as rows of the channel_districts junction table,
+    and are only aggregated back into a JSON list when channel records are read.
+    """
+
+    @staticmethod
+    def _group_matches(rows: Sequence, district_ids: Sequence[int]) -> dict[int, list[int] | None]:
+        """
+        Group the (channel_id, district_id) rows of a match_channels() query
+        :param rows: Matched rows. Channels receiving all districts have a NULL district_id.
+        :param district_ids: The alert's district IDs, in alert order
+        """
+        order = {district_id: i for i, district_id in enumerate(district_ids)}
+
+        matches: dict[int, list[int] | None] = {}
+        for channel_id, district_id in rows:
+            if district_id is None:
+                matches[channel_id] = None
+            else:
+                matches.setdefault(channel_id, []).append(district_id)
+
+        for matched in matches.values():
+            if matched is not None:
+                matched.sort(key=order.__getitem__)
+
+        return matches
+
+    @abstractmethod
+    def add_area(self, area_id: int, area_name: str): ...
+
+    @abstractmethod
+    def add_district(self, district_id: int, district_name: str, area_id: int, area_name: str, migun_time: int): ...
+
+    @abstractmethod
+    def add_server(self, server_id: int, server_lang: str): ...
+
+    @abstractmethod
+    def add_channel(self, channel_id: int, server_id: int | None, channel_lang: str | None): ...
+
+    @abstractmethod
+    def get_area(self, id: int) -> Area | None: ...
+
+    @abstractmethod
+    def get_district(self, id: int) -> District | None: ...
+
+    @abstractmethod
+    def get_districts(self, ids: list[int]) -> list[District] | None: ...
+
+    @abstractmethod
+    def get_area_districts(self, district_ids: list[int]) -> dict[int, AreaDistrict] | None: ...
+
+    @abstractmethod
+    def get_area_districts_by_name(self, district_names: tuple[str, ...]) -> dict[str, AreaDistrict] | None: ...
+
+    def get_district_area(self, district: District) -> Area | None:
+        return self.get_area(district.area_id)
+
+    @abstractmethod
+    def get_server(self, id: int) -> Server | None: ...
+
+    @abstractmethod
+    def get_channel(self, id: int) -> Channel | None: ...
+
+    def get_channel_server(self, channel: Channel) -> Server:
+        return self.get_server(channel.server_id)
+
+    @abstractmethod
+    def get_all_channels(self) -> Sequence: ...
+
+    @abstractmethod
+    def remove_channel(self, id: int): ...
+
+    @abstractmethod
+    def remove_server(self, id: int): ...
+
+    @abstractmethod
+    def remove_district(self, id: int): ...
+
+    @abstractmethod
+    def remove_area(self, id: int): ...
+
+    @abstractmethod
+    def get_district_by_name(self, name: str) -> District | None: ...
+
+    @abstractmethod
+    def get_districts_by_names(self, names: tuple[str, ...]) -> list[District]: ...
+
+    @abstractmethod
+    def get_all_districts(self) -> Sequence: ...
+
+    @abstractmethod
+    def get_all_areas(self) -> Sequence: ...
+
+    @abstractmethod
+    def search_districts(self, *tokens: str) -> Sequence: ...
+
+    @abstractmethod
+    def add_channel_district(self, channel_id: int, district_id: int): ...
+
+    @abstractmethod
+    def add_channel_districts(self, channel_id: int, district_ids: list[int]): ...
+
+    @abstractmethod
+    def get_channel_district_ids(self, channel_id: int) -> list:
+        """
+        :return: The channel's district IDs, in the order they were added
+        """
+
+    @abstractmethod
+    def match_channels(self, district_ids: Sequence[int]) -> dict[int, list[int] | None]:
+        """
+        Get all channels that should receive an alert for the given districts, in a single query
+        :param district_ids: IDs of the alert's districts
+        :return: A dict of matched channel IDs.
+        Each value is either a list of the matched district IDs (in alert order), or None for channels receiving all districts
+        """
+
+    def district_ids_to_districts(self, *district_ids) -> list[District]:
+        return [self.get_district(district_id) for district_id in district_ids]
+
+    def search_channel_districts(self, channel_id: int, *tokens: str) -> list[District]:
+        district_ids = self.get_channel_district_ids(channel_id)
+
+        districts = [self.get_district(district_id) for district_id in district_ids]
+
+        filtered_districts = [district for district in districts if all(token in district.name for token in tokens)]
+
+        return filtered_districts
+
+    @abstractmethod
+    def remove_channel_districts(self, channel_id: int, district_ids: list[int]): ...
+
+    @abstractmethod
+    def clear_channel_districts(self, channel_id: int): ...
+
+    def is_registered_channel(self, channel_id: int) -> bool:
+        return self.get_channel(channel_id) is not None
+
+    def _plan_import(self, districts: Sequence[tuple], diff: bool) -> tuple[list[tuple], list[tuple]]:
+        """
+        Get the area and district rows a bulk import has to write
+        :param districts: Tuples of (district_id, district_name, area_id, area_name, migun_time)
+        :param diff: Whether to skip rows that are already up-to-date
+        :return: (area rows, district rows)
+        """
+        areas = {area_id: (area_id, area_name) for _, _, area_id, area_name, _ in districts}
+        area_rows = list(areas.values())
+        district_rows = [(district_id, district_name, area_id, migun_time)
+                         for district_id, district_name, area_id, _, migun_time in districts]
+
+        if diff:
+            existing_areas = {tuple(tup) for tup in self.get_all_areas()}
+            existing_districts = {tuple(tup) for tup in self.get_all_districts()}
+            area_rows = [row for row in area_rows if row not in existing_areas]
+            district_rows = [row for row in district_rows if row not in existing_districts]
+
+        return area_rows, district_rows
+
+    @abstractmethod
+    def bulk_import_districts(self, districts: Sequence[tuple], diff: bool = False) -> tuple[int, int]:
+        """
+        Upsert many districts (and their areas) in a single transaction.
+        Districts that are missing from the list are kept, as removing them would drop channels' subscriptions.
+        :param districts: Tuples of (district_id, district_name, area_id, area_name, migun_time)
+        :param diff: Only write the areas and districts that are new or changed
+        :return: (amount of areas written, amount of districts written)
+        """
+
+
+class DBAccess(DBBackend):
 
     def get_cursor(self):
         try:
@@ -223,12 +415,10 @@ class DBAccess:
 
     def __init__(self, handler: logging.Handler = None):
 
-        self.log = logging.Logger('DBAccess')
+        self.log = loggers.get_logger('DBAccess')
 
-        if handler is not None:
+        if handler is not None and handler not in self.log.handlers:
             self.log.addHandler(handler)
-        else:
-            self.log.addHandler(logging.StreamHandler())
 
         self.connection = None
         for i in range(12):
@@ -237,7 +427,9 @@ class DBAccess:
                     host='localhost',
                     user=DB_USERNAME,
                     password=DB_PASSWORD,
-                    database='hfc_db'
+                    database='hfc_db',
+                    client_flags=CLIENT_FLAGS,
+                    init_command=INIT_COMMAND
                 )
             except mysql.Error as e:
                 self.log.error(f'Failed to connect to database. This is attempt {i+1}')
@@ -246,16 +438,34 @@ class DBAccess:
             host='localhost',
             user=DB_USERNAME,
             password=DB_PASSWORD,
-            database='hfc_db'
+            database='hfc_db',
+            client_flags=CLIENT_FLAGS,
+            init_command=INIT_COMMAND
         )
 
+    @classmethod
+    def from_connection(cls, connection, log: logging.Logger):
+        """
+        Create a DBAccess over an existing connection, without connecting or setting up a new logger.
+        The connection is owned by the caller, and will not be closed by the DBAccess.
+        :param connection: An open MySQL connection (may be pooled)
+        :param log: Logger to use
+        """
+        db = cls.__new__(cls)
+        db.log = log
+        db.connection = connection
+        db._owns_connection = False
+        return db
+
     def __del__(self):
-        if self.connection is not None:
+        if getattr(self, '_owns_connection', True) and getattr(self, 'connection', None) is not None:
             self.connection.close()
 
     def add_area(self, area_id: int, area_name: str):
         with self.get_cursor() as crsr:
-            crsr.execute(f'REPLACE INTO areas (area_id, area_name) VALUES (%s, %s)', (area_id, area_name))
+            # Upserts rather than REPLACE, which would delete (and cascade from) the existing row
+            crsr.execute(f'INSERT INTO areas (area_id, area_name) VALUES (%s, %s) '
+                         f'ON DUPLICATE KEY UPDATE area_name=VALUES(area_name)', (area_id, area_name))
             self.connection.commit()
 
     def add_district(self, district_id: int, district_name: str, area_id: int, area_name: str, migun_time: int):
@@ -267,7 +477,9 @@ class DBAccess:
                 self.add_area(area_id, area_name)
 
             crsr.execute(
-                f'REPLACE INTO districts (district_id, district_name, area_id, migun_time) VALUES (%s, %s, %s, %s)',
+                f'INSERT INTO districts (district_id, district_name, area_id, migun_time) VALUES (%s, %s, %s, %s) '
+                f'ON DUPLICATE KEY UPDATE district_name=VALUES(district_name), area_id=VALUES(area_id), '
+                f'migun_time=VALUES(migun_time)',
                 (district_id, district_name, area_id, migun_time))
             self.connection.commit()
 
@@ -281,7 +493,8 @@ class DBAccess:
         with self.get_cursor() as crsr:
             if server_id is not None:
                 self.add_server(server_id, channel_lang)
-            crsr.execute(f'REPLACE INTO channels (channel_id, server_id, channel_lang) VALUES (%s, %s, %s)',
+            crsr.execute(f'INSERT INTO channels (channel_id, server_id, channel_lang) VALUES (%s, %s, %s) '
+                         f'ON DUPLICATE KEY UPDATE server_id=VALUES(server_id), channel_lang=VALUES(channel_lang)',
                          (channel_id, server_id, channel_lang))
             self.connection.commit()
 
@@ -388,9 +601,6 @@ class DBAccess:
 
         return r_dict
 
-    def get_district_area(self, district: District) -> Area | None:
-        return self.get_area(district.area_id)
-
     def get_server(self, id: int) -> Server | None:
         with self.get_cursor() as crsr:
             crsr.execute('SELECT * FROM servers WHERE server_id=%s', (id,))
@@ -402,9 +612,18 @@ class DBAccess:
         else:
             return None
 
+    # Channel records, with their locations aggregated back into a JSON list, in the order they were added.
+    # JSON_ARRAYAGG has no ORDER BY, so the list is built with GROUP_CONCAT (which is NULL with no locations)
+    CHANNELS_QUERY = '''
+        SELECT c.channel_id, c.server_id, c.channel_lang,
+               CONCAT('[', IFNULL(GROUP_CONCAT(cd.district_id ORDER BY cd.seq), ''), ']')
+        FROM channels c
+        LEFT JOIN channel_districts cd ON cd.channel_id = c.channel_id
+    '''
+
     def get_channel(self, id: int) -> Channel | None:
         with self.get_cursor() as crsr:
-            crsr.execute('SELECT * FROM channels WHERE channel_id=%s', (id,))
+            crsr.execute(f'{self.CHANNELS_QUERY} WHERE c.channel_id=%s GROUP BY c.channel_id', (id,))
             res = crsr.fetchone()
             crsr.nextset()
 
@@ -413,9 +632,6 @@ class DBAccess:
         else:
             return None
 
-    def get_channel_server(self, channel: Channel) -> Server:
-        return self.get_server(channel.server_id)
-
     def channel_iterator(self):
         """
         This function is DEPRECATED!
@@ -433,7 +649,7 @@ class DBAccess:
 
     def get_all_channels(self):
         with self.get_cursor() as crsr:
-            crsr.execute('SELECT * FROM channels')
+            crsr.execute(f'{self.CHANNELS_QUERY} GROUP BY c.channel_id')
             res = crsr.fetchall()
 
         return res
@@ -494,6 +710,12 @@ class DBAccess:
             ret = crsr.fetchall()
         return ret
 
+    def get_all_areas(self) -> Sequence:
+        with self.get_cursor() as crsr:
+            crsr.execute('SELECT * FROM areas')
+            ret = crsr.fetchall()
+        return ret
+
     def search_districts(self, *tokens: str) -> Sequence:
         with self.get_cursor() as crsr:
             query = 'SELECT * FROM districts WHERE '
@@ -519,88 +741,529 @@ class DBAccess:
             return DistrictIterator(crsr)
 
     def add_channel_district(self, channel_id: int, district_id: int):
-        with self.get_cursor() as crsr:
-            crsr.execute('SELECT * FROM districts WHERE district_id=%s', (district_id,))
-            res = crsr.fetchone()
-            crsr.nextset()
-        if res is None:
-            raise ValueError(f'Invalid District ID {district_id}')
-
-        with self.get_cursor() as crsr:
-            crsr.execute("UPDATE channels "
-                         "SET locations = JSON_ARRAY_APPEND(locations, '$', %s) "
-                         "WHERE channel_id=%s;",
-                         (district_id, channel_id))
-        self.connection.commit()
+        self.add_channel_districts(channel_id, [district_id])
 
     def add_channel_districts(self, channel_id: int, district_ids: list[int]):
-        with self.get_cursor() as crsr:
-            # Sorry for the messy statement. I'm lazy and it's 02:13 rn
-            crsr.execute(f"SELECT * FROM districts WHERE district_id IN ({','.join(['%s'] * len(district_ids))})",
-                         tuple(district_ids))
-            res = crsr.fetchall()
+        district_ids = list(dict.fromkeys(district_ids))
+        if len(district_ids) == 0:
+            return
+        fmt = ','.join(['%s'] * len(district_ids))
 
-        if len(district_ids) > len(res):
-            raise ValueError('Received invalid district IDs')
+        if self.connection.in_transaction:
+            self.connection.commit()
+        self.connection.start_transaction()
 
-        # Sorry for this way of doing things (3 DB queries omg)
-        # JSON_MERGE_PATCH kept overwriting the existing data
-        # while JSON_MERGE_PRESERVE did not remove duplicates
-        dists = self.get_channel_district_ids(channel_id)
-        updated = [district for district in district_ids if district not in dists]
+        try:
+            # Inserted in the order received, and already registered districts are matched by the no-op update
+            # (keeping their place), so matching fewer rows than received means some IDs aren't in districts
+            with self.get_cursor() as crsr:
+                crsr.execute(f'INSERT INTO channel_districts (channel_id, district_id) '
+                             f'SELECT %s, district_id FROM districts WHERE district_id IN ({fmt}) '
+                             f'ORDER BY FIELD(district_id, {fmt}) '
+                             f'ON DUPLICATE KEY UPDATE channel_districts.district_id=channel_districts.district_id',
+                             (channel_id, *district_ids, *district_ids))
+                matched = crsr.rowcount
+
+            if matched < len(district_ids):
+                raise ValueError('Received invalid district IDs' if len(district_ids) > 1
+                                 else f'Invalid District ID {district_ids[0]}')
 
-        with self.get_cursor() as crsr:
-            crsr.execute("UPDATE channels "
-                         "SET locations = JSON_MERGE_PRESERVE(locations, %s) "
-                         "WHERE channel_id=%s;",
-                         (json.dumps(updated), channel_id))
-        self.connection.commit()
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
 
     def get_channel_district_ids(self, channel_id: int) -> list:
         with self.get_cursor() as crsr:
-            crsr.nextset()
-            crsr.execute('SELECT locations '
-                         'FROM channels '
-                         'WHERE channel_id=%s;', (channel_id,))
-            dist = crsr.fetchone()
-            crsr.nextset()
+            crsr.execute('SELECT district_id '
+                         'FROM channel_districts '
+                         'WHERE channel_id=%s '
+                         'ORDER BY seq;', (channel_id,))
+            res = crsr.fetchall()
 
-        districts = json.loads(dist[0])
-        return districts
+        return [district_id for (district_id,) in res]
 
-    def district_ids_to_districts(self, *district_ids) -> list[District]:
-        return [self.get_district(district_id) for district_id in district_ids]
+    def match_channels(self, district_ids: Sequence[int]) -> dict[int, list[int] | None]:
+        district_ids = list(district_ids)
+        # Channels without any locations receive all alerts
+        query = ('SELECT c.channel_id, NULL FROM channels c '
+                 'WHERE NOT EXISTS (SELECT 1 FROM channel_districts cd WHERE cd.channel_id = c.channel_id)')
+        if len(district_ids) > 0:
+            fmt = ','.join(['%s'] * len(district_ids))
+            query = (f'SELECT channel_id, district_id FROM channel_districts WHERE district_id IN ({fmt}) '
+                     f'UNION ALL {query}')
 
-    def search_channel_districts(self, channel_id: int, *tokens: str) -> list[District]:
-        district_ids = self.get_channel_district_ids(channel_id)
+        with self.get_cursor() as crsr:
+            crsr.execute(query, district_ids)
+            res = crsr.fetchall()
 
-        districts = [self.get_district(district_id) for district_id in district_ids]
+        return self._group_matches(res, district_ids)
 
-        filtered_districts = [district for district in districts if all(token in district.name for token in tokens)]
+    def bulk_import_districts(self, districts: Sequence[tuple], diff: bool = False) -> tuple[int, int]:
+        if self.connection.in_transaction:
+            self.connection.commit()
+        self.connection.start_transaction()
 
-        return filtered_districts
+        try:
+            area_rows, district_rows = self._plan_import(districts, diff)
+
+            with self.get_cursor() as crsr:
+                # Areas first, as districts reference them
+                if len(area_rows) > 0:
+                    crsr.executemany('INSERT INTO areas (area_id, area_name) VALUES (%s, %s) '
+                                     'ON DUPLICATE KEY UPDATE area_name=VALUES(area_name)', area_rows)
+                if len(district_rows) > 0:
+                    crsr.executemany('INSERT INTO districts (district_id, district_name, area_id, migun_time) '
+                                     'VALUES (%s, %s, %s, %s) '
+                                     'ON DUPLICATE KEY UPDATE district_name=VALUES(district_name), '
+                                     'area_id=VALUES(area_id), migun_time=VALUES(migun_time)', district_rows)
 
-    def remove_channel_districts(self, channel_id: int, district_ids: list[int]):
-        with self.get_cursor() as crsr:
-            districts = self.get_channel_district_ids(channel_id)
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
 
-            updated = [district for district in districts if district not in district_ids]
+        return len(area_rows), len(district_rows)
 
-            crsr.execute('UPDATE channels '
-                         'SET locations = %s '
-                         'WHERE channel_id = %s;',
-                         (json.dumps(updated), channel_id))
+    def remove_channel_districts(self, channel_id: int, district_ids: list[int]):
+        if len(district_ids) == 0:
+            return
+
+        with self.get_cursor() as crsr:
+            crsr.execute(f"DELETE FROM channel_districts "
+                         f"WHERE channel_id = %s AND district_id IN ({','.join(['%s'] * len(district_ids))});",
+                         (channel_id, *district_ids))
 
         self.connection.commit()
 
     def clear_channel_districts(self, channel_id: int):
         with self.get_cursor() as crsr:
-            crsr.execute('UPDATE channels '
-                         'SET locations = JSON_ARRAY() '
+            crsr.execute('DELETE FROM channel_districts '
                          'WHERE channel_id = %s;',
                          (channel_id,))
 
         self.connection.commit()
 
-    def is_registered_channel(self, channel_id: int) -> bool:
-        return self.get_channel(channel_id) is not None
+
+class MySQLProvider:
+    """
+    Lends out DBAccess instances over connections from a shared MySQL connection pool
+    """
+
+    def __init__(self, pool_size: int, log: logging.Logger):
+        """
+        :param pool_size: Amount of pooled connections
+        :param log: Logger to use
+        """
+        self.pool_size = pool_size
+        self.log = log
+
+        # The pool connects on creation, so it is only created on first use, from a worker thread
+        self._pool: pooling.MySQLConnectionPool | None = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> pooling.MySQLConnectionPool:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = pooling.MySQLConnectionPool(
+                    pool_name='hfc_db_pool',
+                    pool_size=self.pool_size,
+                    pool_reset_session=False,
+                    # Every statement is its own transaction, so pooled connections never hold on to stale snapshots
+                    autocommit=True,
+                    host='localhost',
+                    user=DB_USERNAME,
+                    password=DB_PASSWORD,
+                    database='hfc_db',
+                    client_flags=CLIENT_FLAGS,
+                    init_command=INIT_COMMAND
+                )
+            return self._pool
+
+    def _checkout(self):
+        """
+        Get a healthy connection from the pool
+        """
+        connection = self._get_pool().get_connection()
+
+        # Health check, in case the server closed the connection while it was idle
+        try:
+            connection.ping(reconnect=True, attempts=3, delay=1)
+        except mysql.Error:
+            self.log.error('Pooled connection failed its health check')
+            connection.close()
+            raise
+
+        return connection
+
+    @contextlib.contextmanager
+    def borrow(self) -> Iterator[DBBackend]:
+        connection = self._checkout()
+        try:
+            yield DBAccess.from_connection(connection, self.log)
+        finally:
+            # Returns the connection to the pool
+            connection.close()
+
+    def close(self):
+        # Pooled connections are closed along with the pool
+        pass
+
+
+def make_provider(backend: str, pool_size: int, log: logging.Logger):
+    """
+    Create a provider for the given storage backend
+    :param backend: 'mysql' or 'sqlite'
+    :param pool_size: Amount of connections the provider may hand out at once
+    :param log: Logger to use
+    """
+    match backend:
+        case 'mysql':
+            return MySQLProvider(pool_size, log)
+        case 'sqlite':
+            # Imported here, as db_sqlite depends on this module
+            from db_sqlite import SQLiteProvider
+            return SQLiteProvider(log=log)
+        case _:
+            raise ValueError(f'Unknown DB backend "{backend}"')
+
+
+class DistrictCatalog:
+    """
+    An in-memory copy of the districts and areas tables.
+
+    Districts and areas only change when the DB is (re)created, so they are loaded once,
+    and all district and area reads are served from memory.
+    A catalog is never modified after it was loaded. Refreshing builds a new catalog, which then replaces the old one.
+
+    :var areas: All areas, by area ID
+    :var by_id: All districts, by district ID
+    :var by_name: All districts, by district name
+    :var by_area: IDs of every area's districts, by area ID
+    """
+
+    def __init__(self):
+        self.areas: dict[int, Area] = {}
+        self.by_id: dict[int, AreaDistrict] = {}
+        self.by_name: dict[str, AreaDistrict] = {}
+        self.by_area: dict[int, list[int]] = {}
+        self.loaded = False
+
+        # Kept in the same form the DB returns them in, sorted by district ID
+        # (the order the DB lists them in without an ORDER BY, which isn't guaranteed)
+        self._district_tups: list[tuple] = []
+
+    def __len__(self):
+        return len(self.by_id)
+
+    @classmethod
+    def from_db(cls, db: DBBackend):
+        """
+        Load a new catalog from the DB
+        :param db: Storage backend to load from
+        :return: new DistrictCatalog
+        """
+        catalog = cls()
+        catalog.load(db.get_all_areas(), db.get_all_districts())
+        return catalog
+
+    def load(self, area_tups: Sequence, district_tups: Sequence):
+        """
+        Fill the catalog from DB records
+        :param area_tups: Area tuples, as returned by DBBackend.get_all_areas()
+        :param district_tups: District tuples, as returned by DBBackend.get_all_districts()
+        """
+        self.areas = {area.id: area for area in map(Area.from_tuple, area_tups)}
+
+        self._district_tups = sorted((tuple(tup) for tup in district_tups), key=lambda tup: tup[0])
+        for tup in self._district_tups:
+            district = District.from_tuple(tup)
+            area = self.areas.get(district.area_id, Area(district.area_id, None))
+            area_district = AreaDistrict.from_district(district, area)
+
+            self.by_id[district.district_id] = area_district
+            self.by_name[district.name] = area_district
+            self.by_area.setdefault(district.area_id, []).append(district.district_id)
+
+        self.loaded = True
+
+    def get_area(self, id: int) -> Area | None:
+        return self.areas.get(id)
+
+    def get_district(self, id: int) -> AreaDistrict | None:
+        return self.by_id.get(id)
+
+    def get_districts(self, ids: list[int]) -> list[District]:
+        return [self.by_id[id] for id in ids if id in self.by_id]
+
+    def get_area_districts(self, district_ids: list[int]) -> dict[int, AreaDistrict]:
+        return {id: self.by_id[id] for id in district_ids if id in self.by_id}
+
+    def get_area_districts_by_name(self, district_names: tuple[str, ...]) -> dict[str, AreaDistrict]:
+        return {name: self.by_name[name] for name in district_names if name in self.by_name}
+
+    def get_district_by_name(self, name: str) -> AreaDistrict | None:
+        return self.by_name.get(name)
+
+    def get_districts_by_names(self, names: tuple[str, ...]) -> list[District]:
+        return [self.by_name[name] for name in names if name in self.by_name]
+
+    def get_districts_in_area(self, area_id: int) -> list[AreaDistrict]:
+        return [self.by_id[id] for id in self.by_area.get(area_id, ())]
+
+    def district_ids_to_districts(self, *district_ids) -> list[District | None]:
+        return [self.by_id.get(district_id) for district_id in district_ids]
+
+    def filter_districts(self, district_ids: Sequence[int], *tokens: str) -> list[District]:
+        """
+        Get the given districts whose names contain all tokens
+        """
+        districts = [self.by_id[id] for id in district_ids if id in self.by_id]
+        return [district for district in districts if all(token in district.name for token in tokens)]
+
+    def get_all_districts(self) -> list[tuple]:
+        return list(self._district_tups)
+
+    def search_districts(self, *tokens: str) -> list[tuple]:
+        # Same as the case-insensitive LIKE '%token%' of the DB
+        tokens = [token.casefold() for token in tokens]
+        return [tup for tup in self._district_tups if all(token in tup[1].casefold() for token in tokens)]
+
+
+class QueryStats:
+    """
+    Counters for the queries of a single DB method
+
+    :var count: Amount of calls
+    :var errors: Calls that raised
+    :var total: Total call time, including the wait for a free connection, in seconds
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+
+
+class AsyncDBAccess:
+    """
+    An asyncio-friendly version of DBAccess, providing all of its methods as coroutines.
+
+    Every call runs on a dedicated thread pool, on a backend instance borrowed from the storage backend's provider
+    (a connection checked out of a shared MySQL connection pool, or a per-thread SQLite connection),
+    so queries never block the event loop.
+    The thread pool is as big as the connection pool, so a thread can always get a connection.
+
+    Once refresh_catalog() was called, district and area reads are served from an in-memory DistrictCatalog,
+    without any queries.
+    """
+
+    def __init__(self, pool_size: int = DB_POOL_SIZE, handler: logging.Handler = None, backend: str = DB_BACKEND):
+        """
+        :param pool_size: Amount of pooled connections (and of queries that may run at once)
+        :param handler: Logging handler
+        :param backend: Storage backend to use, 'mysql' or 'sqlite'
+        """
+        self.log = loggers.get_logger('AsyncDBAccess')
+
+        if handler is not None and handler not in self.log.handlers:
+            self.log.addHandler(handler)
+
+        self.pool_size = pool_size
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='DBAccess')
+        self.provider = make_provider(backend, pool_size, self.log)
+
+        self.catalog = DistrictCatalog()
+        self.query_stats: dict[str, QueryStats] = {}
+
+    def _call(self, method_name: str, *args):
+        with self.provider.borrow() as db:
+            return getattr(db, method_name)(*args)
+
+    async def _run(self, method_name: str, *args):
+        stats = self.query_stats.get(method_name)
+        if stats is None:
+            stats = self.query_stats[method_name] = QueryStats()
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self.executor, functools.partial(self._call, method_name, *args))
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.count += 1
+            stats.total += time.perf_counter() - start
+
+    def _load_catalog(self) -> DistrictCatalog:
+        with self.provider.borrow() as db:
+            return DistrictCatalog.from_db(db)
+
+    async def refresh_catalog(self):
+        """
+        (Re)load the district catalog from the DB.
+        Should be called on startup, and whenever the districts or areas tables were changed outside the bot.
+        """
+        loop = asyncio.get_running_loop()
+        catalog = await loop.run_in_executor(self.executor, self._load_catalog)
+        # Swapped in whole, so readers never see a half-loaded catalog
+        self.catalog = catalog
+        self.log.info(f'Loaded {len(catalog)} districts and {len(catalog.areas)} areas into the district catalog')
+
+    async def _refresh_loaded_catalog(self):
+        if self.catalog.loaded:
+            await self.refresh_catalog()
+
+    def close(self):
+        """
+        Stop the worker threads, and release the provider's connections
+        """
+        self.executor.shutdown(wait=True)
+        self.provider.close()
+
+    async def add_area(self, area_id: int, area_name: str):
+        await self._run('add_area', area_id, area_name)
+        await self._refresh_loaded_catalog()
+
+    async def add_district(self, district_id: int, district_name: str, area_id: int, area_name: str, migun_time: int):
+        await self._run('add_district', district_id, district_name, area_id, area_name, migun_time)
+        await self._refresh_loaded_catalog()
+
+    async def add_server(self, server_id: int, server_lang: str):
+        return await self._run('add_server', server_id, server_lang)
+
+    async def add_channel(self, channel_id: int, server_id: int | None, channel_lang: str | None):
+        return await self._run('add_channel', channel_id, server_id, channel_lang)
+
+    async def get_area(self, id: int) -> Area | None:
+        if self.catalog.loaded:
+            return self.catalog.get_area(id)
+        return await self._run('get_area', id)
+
+    async def get_district(self, id: int) -> District | None:
+        if self.catalog.loaded:
+            return self.catalog.get_district(id)
+        return await self._run('get_district', id)
+
+    async def get_districts(self, ids: list[int]) -> list[District] | None:
+        if self.catalog.loaded:
+            return self.catalog.get_districts(ids)
+        return await self._run('get_districts', ids)
+
+    async def get_area_districts(self, district_ids: list[int]) -> dict[int, AreaDistrict] | None:
+        if self.catalog.loaded:
+            return self.catalog.get_area_districts(district_ids)
+        return await self._run('get_area_districts', district_ids)
+
+    async def get_area_districts_by_name(self, district_names: tuple[str, ...]) -> dict[str, AreaDistrict] | None:
+        if self.catalog.loaded:
+            return self.catalog.get_area_districts_by_name(district_names)
+        return await self._run('get_area_districts_by_name', district_names)
+
+    async def get_district_area(self, district: District) -> Area | None:
+        if self.catalog.loaded:
+            return self.catalog.get_area(district.area_id)
+        return await self._run('get_district_area', district)
+
+    async def get_server(self, id: int) -> Server | None:
+        return await self._run('get_server', id)
+
+    async def get_channel(self, id: int) -> Channel | None:
+        return await self._run('get_channel', id)
+
+    async def get_channel_server(self, channel: Channel) -> Server:
+        return await self._run('get_channel_server', channel)
+
+    async def get_all_channels(self):
+        return await self._run('get_all_channels')
+
+    async def remove_channel(self, id: int):
+        return await self._run('remove_channel', id)
+
+    async def remove_server(self, id: int):
+        return await self._run('remove_server', id)
+
+    async def remove_district(self, id: int):
+        await self._run('remove_district', id)
+        await self._refresh_loaded_catalog()
+
+    async def remove_area(self, id: int):
+        await self._run('remove_area', id)
+        await self._refresh_loaded_catalog()
+
+    async def get_district_by_name(self, name: str) -> District | None:
+        if self.catalog.loaded:
+            return self.catalog.get_district_by_name(name)
+        return await self._run('get_district_by_name', name)
+
+    async def get_districts_by_names(self, names: tuple[str, ...]) -> list[District]:
+        if self.catalog.loaded:
+            return self.catalog.get_districts_by_names(names)
+        return await self._run('get_districts_by_names', names)
+
+    async def get_all_districts(self) -> Sequence:
+        if self.catalog.loaded:
+            return self.catalog.get_all_districts()
+        return await self._run('get_all_districts')
+
+    async def get_all_areas(self) -> Sequence:
+        if self.catalog.loaded:
+            return [(area.id, area.name) for area in self.catalog.areas.values()]
+        return await self._run('get_all_areas')
+
+    async def search_districts(self, *tokens: str) -> Sequence:
+        if self.catalog.loaded:
+            return self.catalog.search_districts(*tokens)
+        return await self._run('search_districts', *tokens)
+
+    async def add_channel_district(self, channel_id: int, district_id: int):
+        return await self._run('add_channel_district', channel_id, district_id)
+
+    async def add_channel_districts(self, channel_id: int, district_ids: list[int]):
+        return await self._run('add_channel_districts', channel_id, district_ids)
+
+    async def get_channel_district_ids(self, channel_id: int) -> list:
+        return await self._run('get_channel_district_ids', channel_id)
+
+    async def match_channels(self, district_ids: Sequence[int]) -> dict[int, list[int] | None]:
+        return await self._run('match_channels', list(district_ids))
+
+    async def district_ids_to_districts(self, *district_ids) -> list[District]:
+        if self.catalog.loaded:
+            return self.catalog.district_ids_to_districts(*district_ids)
+        return await self._run('district_ids_to_districts', *district_ids)
+
+    async def search_channel_districts(self, channel_id: int, *tokens: str) -> list[District]:
+        if self.catalog.loaded:
+            district_ids = await self._run('get_channel_district_ids', channel_id)
+            return self.catalog.filter_districts(district_ids, *tokens)
+        return await self._run('search_channel_districts', channel_id, *tokens)
+
+    async def bulk_import_districts(self, districts: Sequence[tuple], diff: bool = False) -> tuple[int, int]:
+        res = await self._run('bulk_import_districts', districts, diff)
+        await self._refresh_loaded_catalog()
+        return res
+
+    async def remove_channel_districts(self, channel_id: int, district_ids: list[int]):
+        return await self._run('remove_channel_districts', channel_id, district_ids)
+
+    async def clear_channel_districts(self, channel_id: int):
+        return await self._run('clear_channel_districts', channel_id)
+
+    async def is_registered_channel(self, channel_id: int) -> bool:
+        return await self._run('is_registered_channel', channel_id)
+
+
+_shared_db: AsyncDBAccess | None = None
+
+
+def get_shared_db() -> AsyncDBAccess:
+    """
+    Get the AsyncDBAccess instance shared by all cogs.
+    It lives in this module, so it also survives cog reloads.
+    """
+    global _shared_db
+    if _shared_db is None:
+        _shared_db = AsyncDBAccess()
+    return _shared_db
@@ -0,0 +1,77 @@
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from db_access import DBAccess, DBBackend
+from db_sqlite import SQLiteDBAccess, connect, create_schema
+
+# Compares the MySQL and SQLite backends on the queries made for every alert.
+# The SQLite database is a temporary copy of the MySQL data, so both backends answer over the same dataset.
+
+ROUNDS = 200
+
+
+def copy_data(source: DBBackend, target: SQLiteDBAccess):
+    for district_tup in source.get_all_districts():
+        area = source.get_area(district_tup[2])
+        target.add_district(*district_tup[:3], area.name if area is not None else '', district_tup[3])
+
+    for channel_id, server_id, channel_lang, _ in source.get_all_channels():
+        target.add_channel(channel_id, server_id, channel_lang)
+        district_ids = source.get_channel_district_ids(channel_id)
+        if len(district_ids) > 0:
+            target.add_channel_districts(channel_id, district_ids)
+
+
+def measure(func: Callable[[], object], rounds: int = ROUNDS) -> list[float]:
+    """
+    :return: Run times of every round, in milliseconds
+    """
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def report(name: str, times: list[float]):
+    quantiles = statistics.quantiles(times, n=100)
+    print(f'  {name:<32} mean {statistics.fmean(times):8.3f}ms  '
+          f'p50 {quantiles[49]:8.3f}ms  p95 {quantiles[94]:8.3f}ms')
+
+
+def run(db: DBBackend, district_names: tuple[str, ...], channel_id: int | None):
+    report('get_area_districts_by_name', measure(lambda: db.get_area_districts_by_name(district_names)))
+    report('get_all_channels', measure(db.get_all_channels))
+    if channel_id is not None:
+        report('get_channel', measure(lambda: db.get_channel(channel_id)))
+    report('get_all_districts', measure(db.get_all_districts))
+
+
+def main():
+    mysql_db = DBAccess()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        connection = connect(Path(tmp).joinpath('benchmark.sqlite3'))
+        create_schema(connection)
+        sqlite_db = SQLiteDBAccess(connection)
+        copy_data(mysql_db, sqlite_db)
+
+        # A large alert, as seen during barrages
+        district_names = tuple(district_tup[1] for district_tup in mysql_db.get_all_districts()[:300])
+        channels = mysql_db.get_all_channels()
+        channel_id = channels[0][0] if len(channels) > 0 else None
+
+        for name, db in (('mysql', mysql_db), ('sqlite', sqlite_db)):
+            print(f'{name}:')
+            run(db, district_names, channel_id)
+
+        connection.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
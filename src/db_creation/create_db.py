@@ -1,11 +1,10 @@
-import json
 import os
 
 import mysql.connector as mysql
-import requests
 from dotenv import load_dotenv
 
 from db_access import DBAccess
+from db_creation.upstream import fetch_districts
 
 generate_script = """
 -- MySQL Workbench Forward Engineering
@@ -81,7 +80,6 @@ CREATE TABLE IF NOT EXISTS `hfc_db`.`channels` (
   `channel_id` BIGINT(8) UNSIGNED NOT NULL,
   `server_id` BIGINT(8) UNSIGNED NULL,
   `channel_lang` VARCHAR(15) NOT NULL,
-  `locations` JSON NOT NULL DEFAULT ('[]'),
   PRIMARY KEY (`channel_id`),
   UNIQUE INDEX `channel_id_UNIQUE` (`channel_id` ASC) VISIBLE,
   CONSTRAINT `server_id`
@@ -91,6 +89,31 @@ CREATE TABLE IF NOT EXISTS `hfc_db`.`channels` (
     ON UPDATE NO ACTION)
 ENGINE = InnoDB;
 
+
+-- -----------------------------------------------------
+-- Table `hfc_db`.`channel_districts`
+-- -----------------------------------------------------
+DROP TABLE IF EXISTS `hfc_db`.`channel_districts` ;
+
+CREATE TABLE IF NOT EXISTS `hfc_db`.`channel_districts` (
+  `channel_id` BIGINT(8) UNSIGNED NOT NULL,
+  `district_id` INT NOT NULL,
+  `seq` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  PRIMARY KEY (`channel_id`, `district_id`),
+  UNIQUE INDEX `seq_UNIQUE` (`seq` ASC) VISIBLE,
+  INDEX `district_channel_idx` (`district_id` ASC, `channel_id` ASC) VISIBLE,
+  CONSTRAINT `channel_districts_channel_id`
+    FOREIGN KEY (`channel_id`)
+    REFERENCES `hfc_db`.`channels` (`channel_id`)
+    ON DELETE CASCADE
+    ON UPDATE NO ACTION,
+  CONSTRAINT `channel_districts_district_id`
+    FOREIGN KEY (`district_id`)
+    REFERENCES `hfc_db`.`districts` (`district_id`)
+    ON DELETE CASCADE
+    ON UPDATE NO ACTION)
+ENGINE = InnoDB;
+
 USE `hfc_db`;
 
 DELIMITER $$
@@ -139,18 +162,6 @@ crsr.fetchall()
 print(crsr.warnings)
 db.close()
 
-districts: list[dict] = json.loads(requests.get('https://www.oref.org.il//Shared/Ajax/GetDistricts.aspx?lang=he').text)
-
 db = DBAccess()
-for district in districts:
-    db.add_district(
-        district["id"],
-        district["label"],
-        district["areaid"],
-        district["areaname"],
-        district["migun_time"]
-    )
-
-db.add_district(99999, 'בדיקה', 999, 'בדיקה', 600)
-
-db.connection.commit()
\ No newline at end of file
+areas_written, districts_written = db.bulk_import_districts(fetch_districts())
+print(f'Imported {districts_written} districts in {areas_written} areas')
@@ -0,0 +1,15 @@
+from db_creation.upstream import fetch_districts
+from db_sqlite import SQLITE_DB_PATH, SQLiteDBAccess, connect, create_schema
+
+# SQLite counterpart of create_db.py, creating the same tables in the file at SQLITE_DB_PATH
+
+SQLITE_DB_PATH.unlink(missing_ok=True)
+
+connection = connect(SQLITE_DB_PATH)
+create_schema(connection)
+
+db = SQLiteDBAccess(connection)
+areas_written, districts_written = db.bulk_import_districts(fetch_districts())
+print(f'Imported {districts_written} districts in {areas_written} areas')
+
+connection.close()
@@ -0,0 +1,14 @@
+from db_access import DB_BACKEND, DBAccess
+from db_creation.upstream import fetch_districts
+
+# Re-syncs the districts and areas tables with the HFC website, only writing the rows that changed.
+# Safe to run while the bot is live. Run hfc/refresh_districts afterwards, so the bot picks up the changes.
+
+if DB_BACKEND == 'sqlite':
+    from db_sqlite import SQLiteDBAccess
+    db = SQLiteDBAccess()
+else:
+    db = DBAccess()
+
+areas_written, districts_written = db.bulk_import_districts(fetch_districts(), diff=True)
+print(f'Updated {areas_written} areas and {districts_written} districts')
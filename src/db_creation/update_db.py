@@ -71,11 +71,46 @@ def updater_1_0_0(connection: mysql.connection.MySQLConnection) -> str:
     return '1.0.1'
 
 
+def updater_1_0_1(connection: mysql.connection.MySQLConnection) -> str:
+    # Move channel locations out of the JSON column, into an indexed junction table
+    with connection.cursor() as crsr:
+        crsr.execute("CREATE TABLE IF NOT EXISTS `hfc_db`.`channel_districts` ("
+                     "  `channel_id` BIGINT(8) UNSIGNED NOT NULL,"
+                     "  `district_id` INT NOT NULL,"
+                     "  `seq` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,"
+                     "  PRIMARY KEY (`channel_id`, `district_id`),"
+                     "  UNIQUE INDEX `seq_UNIQUE` (`seq` ASC) VISIBLE,"
+                     "  INDEX `district_channel_idx` (`district_id` ASC, `channel_id` ASC) VISIBLE,"
+                     "  CONSTRAINT `channel_districts_channel_id`"
+                     "    FOREIGN KEY (`channel_id`) REFERENCES `hfc_db`.`channels` (`channel_id`)"
+                     "    ON DELETE CASCADE ON UPDATE NO ACTION,"
+                     "  CONSTRAINT `channel_districts_district_id`"
+                     "    FOREIGN KEY (`district_id`) REFERENCES `hfc_db`.`districts` (`district_id`)"
+                     "    ON DELETE CASCADE ON UPDATE NO ACTION)"
+                     "ENGINE = InnoDB;")
+
+        # Rows are inserted in list order, so seq keeps each channel's locations in the order they were added.
+        # Duplicates and IDs of districts that no longer exist are dropped.
+        crsr.execute("INSERT IGNORE INTO `hfc_db`.`channel_districts` (channel_id, district_id) "
+                     "SELECT c.channel_id, jt.district_id "
+                     "FROM `hfc_db`.`channels` c "
+                     "JOIN JSON_TABLE(c.locations, '$[*]' COLUMNS (pos FOR ORDINALITY, district_id INT PATH '$')) jt "
+                     "JOIN `hfc_db`.`districts` d ON d.district_id = jt.district_id "
+                     "ORDER BY c.channel_id, jt.pos;")
+
+        crsr.execute("ALTER TABLE `hfc_db`.`channels` DROP COLUMN `locations`;")
+
+    connection.commit()
+
+    return '1.0.2'
+
+
 # Load data
 db_data = DB_data.load()
 
 updaters = {
-    '1.0.0': updater_1_0_0
+    '1.0.0': updater_1_0_0,
+    '1.0.1': updater_1_0_1
 }
 
 if db_data.local_version is None:
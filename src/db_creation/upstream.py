@@ -0,0 +1,21 @@
+import json
+
+import requests
+
+DISTRICTS_URL = 'https://www.oref.org.il//Shared/Ajax/GetDistricts.aspx?lang=he'
+
+# Used for test alerts, doesn't exist upstream
+TEST_DISTRICT = (99999, 'בדיקה', 999, 'בדיקה', 600)
+
+
+def fetch_districts() -> list[tuple]:
+    """
+    Get the current district list from the HFC website, along with the test district
+    :return: Tuples of (district_id, district_name, area_id, area_name, migun_time), ready for bulk_import_districts()
+    """
+    districts: list[dict] = json.loads(requests.get(DISTRICTS_URL).text)
+
+    res = [(district["id"], district["label"], district["areaid"], district["areaname"], district["migun_time"])
+           for district in districts]
+    res.append(TEST_DISTRICT)
+    return res
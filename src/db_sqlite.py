@@ -0,0 +1,347 @@
+import contextlib
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterator, Sequence
+
+from db_access import Area, AreaDistrict, Channel, DBBackend, District, Server
+from log_utils import loggers
+from utils.dir_utils import DirUtils
+
+SQLITE_DB_PATH = Path(os.getenv('SQLITE_DB_PATH', DirUtils().botdata_dir.joinpath('hfc_db.sqlite3')))
+
+# Mirrors the MySQL schema in db_creation/create_db.py
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS areas (
+  area_id INTEGER NOT NULL PRIMARY KEY,
+  area_name VARCHAR(64) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS districts (
+  district_id INTEGER NOT NULL PRIMARY KEY,
+  district_name VARCHAR(64) NOT NULL,
+  area_id INTEGER NOT NULL REFERENCES areas (area_id),
+  migun_time INTEGER NULL
+);
+
+CREATE INDEX IF NOT EXISTS area_id_idx ON districts (area_id);
+CREATE INDEX IF NOT EXISTS district_name_idx ON districts (district_name);
+
+CREATE TABLE IF NOT EXISTS servers (
+  server_id INTEGER NOT NULL PRIMARY KEY,
+  server_lang VARCHAR(15) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS channels (
+  channel_id INTEGER NOT NULL PRIMARY KEY,
+  server_id INTEGER NULL REFERENCES servers (server_id),
+  channel_lang VARCHAR(15) NOT NULL
+);
+
+-- seq aliases the rowid, so it keeps its values through VACUUM and orders each channel's locations
+CREATE TABLE IF NOT EXISTS channel_districts (
+  seq INTEGER PRIMARY KEY,
+  channel_id INTEGER NOT NULL REFERENCES channels (channel_id) ON DELETE CASCADE,
+  district_id INTEGER NOT NULL REFERENCES districts (district_id) ON DELETE CASCADE,
+  UNIQUE (channel_id, district_id)
+);
+
+CREATE INDEX IF NOT EXISTS district_channel_idx ON channel_districts (district_id, channel_id);
+"""
+
+
+def connect(path: Path | str = SQLITE_DB_PATH) -> sqlite3.Connection:
+    """
+    Open a connection to the SQLite database, in WAL mode
+    :param path: Database file path
+    """
+    connection = sqlite3.connect(path, check_same_thread=False)
+    # WAL lets readers run alongside a writer, and NORMAL sync is still safe under WAL
+    connection.execute('PRAGMA journal_mode=WAL;')
+    connection.execute('PRAGMA synchronous=NORMAL;')
+    connection.execute('PRAGMA foreign_keys=ON;')
+    return connection
+
+
+def create_schema(connection: sqlite3.Connection):
+    """
+    Create all tables, if they don't exist yet
+    """
+    connection.executescript(SCHEMA)
+    connection.commit()
+
+
+class SQLiteDBAccess(DBBackend):
+    """
+    A storage backend over an embedded SQLite database.
+    Behaves the same as DBAccess.
+    """
+
+    def __init__(self, connection: sqlite3.Connection | None = None, handler: logging.Handler = None):
+        """
+        :param connection: An open connection (see connect()), or None to open a new one
+        :param handler: Logging handler
+        """
+        self.log = loggers.get_logger('SQLiteDBAccess')
+
+        if handler is not None and handler not in self.log.handlers:
+            self.log.addHandler(handler)
+
+        self._owns_connection = connection is None
+        self.connection = connection if connection is not None else connect()
+
+    def __del__(self):
+        if getattr(self, '_owns_connection', False):
+            self.connection.close()
+
+    def _fetchone(self, query: str, params: Sequence = ()) -> tuple | None:
+        return self.connection.execute(query, params).fetchone()
+
+    def _fetchall(self, query: str, params: Sequence = ()) -> list[tuple]:
+        return self.connection.execute(query, params).fetchall()
+
+    @staticmethod
+    def _fmt(count: int) -> str:
+        return ','.join(['?'] * count)
+
+    def add_area(self, area_id: int, area_name: str):
+        # Upserts rather than REPLACE, which would delete (and cascade from) the existing row
+        self.connection.execute('INSERT INTO areas (area_id, area_name) VALUES (?, ?) '
+                                'ON CONFLICT (area_id) DO UPDATE SET area_name=excluded.area_name',
+                                (area_id, area_name))
+        self.connection.commit()
+
+    def add_district(self, district_id: int, district_name: str, area_id: int, area_name: str, migun_time: int):
+        if self._fetchone('SELECT * FROM areas WHERE area_id=?', (area_id,)) is None:
+            self.add_area(area_id, area_name)
+
+        self.connection.execute(
+            'INSERT INTO districts (district_id, district_name, area_id, migun_time) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (district_id) DO UPDATE SET district_name=excluded.district_name, '
+            'area_id=excluded.area_id, migun_time=excluded.migun_time',
+            (district_id, district_name, area_id, migun_time))
+        self.connection.commit()
+
+    def add_server(self, server_id: int, server_lang: str):
+        # MySQL's INSERT IGNORE turns a NULL language into the column's implicit default, SQLite would skip the row
+        self.connection.execute('INSERT OR IGNORE INTO servers (server_id, server_lang) VALUES (?, COALESCE(?, \'he\'))',
+                                (server_id, server_lang))
+        self.connection.commit()
+
+    def add_channel(self, channel_id: int, server_id: int | None, channel_lang: str | None):
+        if server_id is not None:
+            self.add_server(server_id, channel_lang)
+
+        # Same as the MySQL channels_BEFORE_INSERT trigger: fall back to the server's language, then to 'he'
+        self.connection.execute(
+            'INSERT INTO channels (channel_id, server_id, channel_lang) '
+            'VALUES (?, ?, COALESCE(?, (SELECT server_lang FROM servers WHERE server_id=?), \'he\')) '
+            'ON CONFLICT (channel_id) DO UPDATE SET server_id=excluded.server_id, channel_lang=excluded.channel_lang',
+            (channel_id, server_id, channel_lang, server_id))
+        self.connection.commit()
+
+    def get_area(self, id: int) -> Area | None:
+        res = self._fetchone('SELECT * FROM areas WHERE area_id=?', (id,))
+        return Area.from_tuple(res) if res is not None else None
+
+    def get_district(self, id: int) -> District | None:
+        res = self._fetchone('SELECT * FROM districts WHERE district_id=?', (id,))
+        return District.from_tuple(res) if res is not None else None
+
+    def get_districts(self, ids: list[int]) -> list[District] | None:
+        res = self._fetchall(f'SELECT * FROM districts WHERE district_id IN ({self._fmt(len(ids))})', ids)
+        return [District.from_tuple(cur) for cur in res]
+
+    def _get_area_districts(self, column: str, values: Sequence) -> list[AreaDistrict]:
+        res = self._fetchall(f'''
+            SELECT d.district_id, d.district_name, d.area_id, d.migun_time,
+                   a.area_name
+            FROM districts d
+            LEFT JOIN areas a ON d.area_id = a.area_id
+            WHERE d.{column} IN ({self._fmt(len(values))});
+        ''', values)
+
+        return [AreaDistrict.from_district(District(cur[0], cur[1], cur[2], cur[3]), Area(cur[2], cur[4]))
+                for cur in res]
+
+    def get_area_districts(self, district_ids: list[int]) -> dict[int, AreaDistrict] | None:
+        return {ad.district_id: ad for ad in self._get_area_districts('district_id', district_ids)}
+
+    def get_area_districts_by_name(self, district_names: tuple[str, ...]) -> dict[str, AreaDistrict] | None:
+        return {ad.name: ad for ad in self._get_area_districts('district_name', district_names)}
+
+    def get_server(self, id: int) -> Server | None:
+        res = self._fetchone('SELECT * FROM servers WHERE server_id=?', (id,))
+        return Server(res[0], res[1]) if res is not None else None
+
+    # Channel records, with their locations aggregated back into a JSON list, in the order they were added.
+    # json_group_array follows the order of its rows, and SQLite keeps the ORDER BY of an aggregated subquery
+    CHANNELS_QUERY = '''
+        SELECT c.channel_id, c.server_id, c.channel_lang,
+               (SELECT json_group_array(district_id)
+                FROM (SELECT district_id FROM channel_districts WHERE channel_id = c.channel_id ORDER BY seq))
+        FROM channels c
+    '''
+
+    def get_channel(self, id: int) -> Channel | None:
+        res = self._fetchone(f'{self.CHANNELS_QUERY} WHERE c.channel_id=? GROUP BY c.channel_id', (id,))
+        return Channel.from_tuple(res) if res is not None else None
+
+    def get_all_channels(self) -> Sequence:
+        return self._fetchall(f'{self.CHANNELS_QUERY} GROUP BY c.channel_id')
+
+    def remove_channel(self, id: int):
+        self.connection.execute('DELETE FROM channels WHERE channel_id=?', (id,))
+        self.connection.commit()
+
+    def remove_server(self, id: int):
+        self.connection.execute('DELETE FROM channels WHERE server_id=?', (id,))
+        self.connection.execute('DELETE FROM servers WHERE server_id=?', (id,))
+        self.connection.commit()
+
+    def remove_district(self, id: int):
+        self.connection.execute('DELETE FROM districts WHERE district_id=?', (id,))
+        self.connection.commit()
+
+    def remove_area(self, id: int):
+        self.connection.execute('DELETE FROM districts WHERE area_id=?', (id,))
+        self.connection.execute('DELETE FROM areas WHERE area_id=?', (id,))
+        self.connection.commit()
+
+    def get_district_by_name(self, name: str) -> District | None:
+        res = self._fetchone('SELECT * FROM districts WHERE district_name=?', (name,))
+        return District.from_tuple(res) if res is not None else None
+
+    def get_districts_by_names(self, names: tuple[str, ...]) -> list[District]:
+        res = self._fetchall(f'SELECT * FROM districts WHERE district_name IN ({self._fmt(len(names))})', names)
+        return [District.from_tuple(distup) for distup in res]
+
+    def get_all_districts(self) -> Sequence:
+        return self._fetchall('SELECT * FROM districts')
+
+    def get_all_areas(self) -> Sequence:
+        return self._fetchall('SELECT * FROM areas')
+
+    def search_districts(self, *tokens: str) -> Sequence:
+        query = 'SELECT * FROM districts WHERE '
+        query += ' AND '.join(["district_name LIKE ?" for _ in tokens])
+        return self._fetchall(query, [f'%{token}%' for token in tokens])
+
+    def add_channel_district(self, channel_id: int, district_id: int):
+        self.add_channel_districts(channel_id, [district_id])
+
+    def add_channel_districts(self, channel_id: int, district_ids: list[int]):
+        district_ids = list(dict.fromkeys(district_ids))
+        if len(district_ids) == 0:
+            return
+
+        # Inserted in the order received, and already registered districts are matched by the no-op update
+        # (keeping their place), so matching fewer rows than received means some IDs aren't in districts
+        positions = ' '.join(f'WHEN ? THEN {i}' for i in range(len(district_ids)))
+        crsr = self.connection.execute(f'INSERT INTO channel_districts (channel_id, district_id) '
+                                       f'SELECT ?, district_id FROM districts '
+                                       f'WHERE district_id IN ({self._fmt(len(district_ids))}) '
+                                       f'ORDER BY CASE district_id {positions} END '
+                                       f'ON CONFLICT (channel_id, district_id) DO UPDATE SET district_id=excluded.district_id',
+                                       (channel_id, *district_ids, *district_ids))
+
+        if crsr.rowcount < len(district_ids):
+            self.connection.rollback()
+            raise ValueError('Received invalid district IDs' if len(district_ids) > 1
+                             else f'Invalid District ID {district_ids[0]}')
+
+        self.connection.commit()
+
+    def get_channel_district_ids(self, channel_id: int) -> list:
+        res = self._fetchall('SELECT district_id FROM channel_districts WHERE channel_id=? ORDER BY seq;', (channel_id,))
+        return [district_id for (district_id,) in res]
+
+    def match_channels(self, district_ids: Sequence[int]) -> dict[int, list[int] | None]:
+        district_ids = list(district_ids)
+        # Channels without any locations receive all alerts
+        query = ('SELECT c.channel_id, NULL FROM channels c '
+                 'WHERE NOT EXISTS (SELECT 1 FROM channel_districts cd WHERE cd.channel_id = c.channel_id)')
+        if len(district_ids) > 0:
+            query = (f'SELECT channel_id, district_id FROM channel_districts '
+                     f'WHERE district_id IN ({self._fmt(len(district_ids))}) '
+                     f'UNION ALL {query}')
+
+        return self._group_matches(self._fetchall(query, district_ids), district_ids)
+
+    def bulk_import_districts(self, districts: Sequence[tuple], diff: bool = False) -> tuple[int, int]:
+        # The connection's context commits on success, and rolls back on an exception
+        with self.connection:
+            area_rows, district_rows = self._plan_import(districts, diff)
+
+            # Areas first, as districts reference them
+            self.connection.executemany('INSERT INTO areas (area_id, area_name) VALUES (?, ?) '
+                                        'ON CONFLICT (area_id) DO UPDATE SET area_name=excluded.area_name', area_rows)
+            self.connection.executemany('INSERT INTO districts (district_id, district_name, area_id, migun_time) '
+                                        'VALUES (?, ?, ?, ?) '
+                                        'ON CONFLICT (district_id) DO UPDATE SET district_name=excluded.district_name, '
+                                        'area_id=excluded.area_id, migun_time=excluded.migun_time', district_rows)
+
+        return len(area_rows), len(district_rows)
+
+    def remove_channel_districts(self, channel_id: int, district_ids: list[int]):
+        if len(district_ids) == 0:
+            return
+
+        self.connection.execute(f'DELETE FROM channel_districts '
+                                f'WHERE channel_id = ? AND district_id IN ({self._fmt(len(district_ids))});',
+                                (channel_id, *district_ids))
+        self.connection.commit()
+
+    def clear_channel_districts(self, channel_id: int):
+        self.connection.execute('DELETE FROM channel_districts WHERE channel_id = ?;', (channel_id,))
+        self.connection.commit()
+
+
+class SQLiteProvider:
+    """
+    Lends out SQLiteDBAccess instances, each worker thread reusing its own connection.
+    Under WAL, those connections can read alongside each other and alongside a writer.
+    """
+
+    def __init__(self, path: Path | str = SQLITE_DB_PATH, log: logging.Logger | None = None):
+        """
+        :param path: Database file path
+        :param log: Logger to use
+        """
+        self.path = path
+        self.log = log if log is not None else loggers.get_logger('SQLiteProvider')
+
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = connect(self.path)
+            create_schema(connection)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    @contextlib.contextmanager
+    def borrow(self) -> Iterator[DBBackend]:
+        db = SQLiteDBAccess.__new__(SQLiteDBAccess)
+        db.log = self.log
+        db.connection = self._get_connection()
+        db._owns_connection = False
+        try:
+            yield db
+        except Exception:
+            # Don't leave a failed statement's transaction open on the reused connection
+            db.connection.rollback()
+            raise
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
@@ -1,28 +1,201 @@
+import atexit
 import datetime
+import functools
+import hashlib
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
 import traceback
 
+from log_utils import loggers
 from utils.dir_utils import DirUtils
 
 dir_utils = DirUtils()
 errlog_dir = dir_utils.botdata_dir.joinpath('errlogs')
 
+ERRLOG_FILE = 'ERRLOG.txt'
+ERRLOG_MAX_BYTES = int(os.getenv('ERRLOG_MAX_BYTES', 5 * 1024 * 1024))
+ERRLOG_BACKUP_COUNT = int(os.getenv('ERRLOG_BACKUP_COUNT', 10))
+RATE_WINDOW = 60  # seconds
+
+
+class ErrorGroup:
+    """
+    All occurrences of a single error (errors with the same traceback fingerprint)
+
+    :var fingerprint: The traceback fingerprint
+    :var summary: Error type and message of the first occurrence
+    :var count: Total amount of occurrences
+    :var first_seen: Time of the first occurrence (epoch seconds)
+    :var last_seen: Time of the last occurrence (epoch seconds)
+    :var last_written: Time the error was last written out in full (epoch seconds)
+    :var suppressed: Occurrences since it was last written out
+    """
+
+    def __init__(self, fingerprint: str, summary: str, now: float):
+        self.fingerprint = fingerprint
+        self.summary = summary
+        self.count = 0
+        self.first_seen = now
+        self.last_seen = now
+        self.last_written = 0.0
+        self.suppressed = 0
+
+
+def fingerprint(err: BaseException) -> str:
+    """
+    Fingerprint an error by its type and where it was raised (ignoring its message),
+    so the same error with different details (IDs, channel names...) is grouped together
+    """
+    parts = []
+    for exc in (err, err.__context__):
+        if exc is None:
+            continue
+        parts.append(type(exc).__qualname__)
+        parts.extend(f'{frame.filename}:{frame.name}:{frame.lineno}' for frame in traceback.extract_tb(exc.__traceback__))
+    return hashlib.sha1('\n'.join(parts).encode()).hexdigest()[:12]
+
 
 class ErrLogger:
-    def __init__(self, handler: logging.Handler = None):
-        if handler is None:
-            handler = logging.StreamHandler()
+    """
+    Writes error logs from a single background thread, so logging an error never blocks the caller.
+
+    Errors are grouped by their traceback fingerprint. The first occurrence of an error is written in full,
+    and identical errors are rate-limited to one full entry per RATE_WINDOW. The occurrences in between are
+    only counted, and their count is written once the window is over.
+    All entries are appended to a single rotating file, botdata/errlogs/ERRLOG.txt.
+    """
+
+    def __init__(self, rate_window: float = RATE_WINDOW):
+        """
+        :param rate_window: Minimal time between two full entries of the same error, in seconds
+        """
+        self.rate_window = rate_window
+        self.log = loggers.get_logger('ErrLogger')
+        self.groups: dict[str, ErrorGroup] = {}
 
-        self.log = logging.Logger('ErrLogger')
-        self.log.addHandler(handler)
+        self.written = 0
+        self.suppressed = 0
+
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._file: logging.Handler | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the writer thread. Does nothing if already started.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+
+            self._thread = threading.Thread(target=self._run, name='ErrLogger', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """
+        Write everything that's still queued, and stop the writer thread
+        """
+        with self._lock:
+            if self._thread is None:
+                return
+            thread, self._thread = self._thread, None
+
+        self._queue.put(None)
+        thread.join()
 
     def new_errlog(self, err: BaseException):
-        self.log.error('An error has occurred! Check the latest ERRLOG file for more info.')
+        """
+        Queue an error to be logged
+        """
+        if err is None:
+            # e.g. sys.exc_info() outside of an except block
+            return
+
+        self.start()
+        self._queue.put((err, time.time()))
+
+    def _open_file(self) -> logging.Handler:
+        generate_errlog_folder()
+        handler = logging.handlers.RotatingFileHandler(errlog_dir.joinpath(ERRLOG_FILE), maxBytes=ERRLOG_MAX_BYTES,
+                                                       backupCount=ERRLOG_BACKUP_COUNT, encoding='utf_8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        return handler
+
+    def _write(self, data: str):
+        if self._file is None:
+            self._file = self._open_file()
+        self._file.emit(logging.makeLogRecord({'msg': data}))
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.rate_window)
+            except queue.Empty:
+                item = ()
+
+            try:
+                if item is None:
+                    self._flush_suppressed(force=True)
+                    break
+                if item:
+                    self._handle(*item)
+                self._flush_suppressed()
+            except Exception as e:
+                # Never let the writer die
+                self.log.warning('Could not write an error log: %s', e)
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _handle(self, err: BaseException, now: float):
+        key = fingerprint(err)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = ErrorGroup(key, f'{type(err).__name__}: {err}', now)
+
+        group.count += 1
+        group.last_seen = now
+
+        if now - group.last_written < self.rate_window:
+            group.suppressed += 1
+            self.suppressed += 1
+            return
+
+        self.log.error('An error has occurred! Check %s for more info (fingerprint %s, seen %d times)',
+                       ERRLOG_FILE, key, group.count)
+        self._write(self._format(err, group, now))
+        group.last_written = now
+        group.suppressed = 0
+        self.written += 1
+
+    def _flush_suppressed(self, force: bool = False):
+        """
+        Write the counts of rate-limited errors whose window is over
+        :param force: Write all counts, even if their window isn't over yet
+        """
+        now = time.time()
+        for group in self.groups.values():
+            if group.suppressed == 0 or (not force and now - group.last_written < self.rate_window):
+                continue
+
+            last_seen = datetime.datetime.fromtimestamp(group.last_seen).strftime("%Y-%m-%d %H:%M:%S")
+            self._write(f'[{group.fingerprint}] {group.summary}\n'
+                        f'Occurred {group.suppressed} more times (last at {last_seen}), {group.count} times in total\n'
+                        f'----------------------------------------------------------------------\n')
+            group.last_written = now
+            group.suppressed = 0
+
+    @staticmethod
+    def _format(err: BaseException, group: ErrorGroup, now: float) -> str:
         e: BaseException = err
-        time = datetime.datetime.now()
-        path = os.path.join(errlog_dir,
-                            f'ERRLOG_{time.strftime("%Y-%m-%d_%H-%M-%S")}.txt')
+        time = datetime.datetime.fromtimestamp(now)
 
         context_ls = list()
         context_ls.append(e)
@@ -38,9 +211,10 @@ class ErrLogger:
             ['\n'.join(traceback.format_tb(exc.__traceback__)) for exc in context_ls]
         )
 
-        data = f"""An error has occurred! Don't worry, I saved an automatic log for ya :)
+        return f"""An error has occurred! Don't worry, I saved an automatic log for ya :)
 ----------------------------------------------------------------------
 Rough DateTime: {time.strftime("%Y-%m-%d %H:%M:%S")}
+Fingerprint: {group.fingerprint} (occurrence {group.count}, first seen {datetime.datetime.fromtimestamp(group.first_seen).strftime("%Y-%m-%d %H:%M:%S")})
 
 Error Info:
 -----------
@@ -55,12 +229,11 @@ Caused by:
 Full Traceback:
 ---------------
 {tb_str}
+----------------------------------------------------------------------
 """
 
-        with open(path, 'w', encoding='utf_8') as f:
-            f.write(data)
-
     def errlog(self, func):
+        @functools.wraps(func)
         def wrapper(*args, **kwargs):
             try:
                 res = func(*args, **kwargs)
@@ -73,6 +246,7 @@ Full Traceback:
         return wrapper
 
     def async_errlog(self, func):
+        @functools.wraps(func)
         async def wrapper(*args, **kwargs):
             try:
                 res = await func(*args, **kwargs)
@@ -93,13 +267,17 @@ def generate_errlog_folder():
         errlog_dir.mkdir()
 
 
+# Shared by the whole bot, and kept across cog reloads
+err_logger = ErrLogger()
+
+
 def new_errlog(err: BaseException):
-    ErrLogger().new_errlog(err)
+    err_logger.new_errlog(err)
 
 
 def errlog(func):
-    return ErrLogger().errlog(func)
+    return err_logger.errlog(func)
 
 
 def async_errlog(func):
-    return ErrLogger().async_errlog(func)
+    return err_logger.async_errlog(func)
@@ -1,6 +1,11 @@
 import __main__
+import atexit
+import datetime
 import logging
 import logging.handlers
+import os
+import queue
+import time
 from pathlib import Path
 
 import discord
@@ -10,6 +15,10 @@ from utils.dir_utils import DirUtils
 dir_utils = DirUtils()
 LOGGING_DIR = dir_utils.botdata_dir.joinpath('logs')
 
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 10))
+
 
 class ColorFormatter(discord.utils._ColourFormatter):
     """
@@ -32,21 +41,120 @@ class ColorFormatter(discord.utils._ColourFormatter):
     }
 
 
-class DefaultFileHandler(logging.FileHandler):
-    def __init__(self, filename: str):
-        generate_logging_folder()
+class DefaultFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    A log file handler, rotating the file once it reaches LOG_MAX_BYTES, and at midnight
+    """
+
+    def __init__(self, filename: str, max_bytes: int = LOG_MAX_BYTES, backup_count: int = LOG_BACKUP_COUNT,
+                 log_dir: Path = LOGGING_DIR):
+        if log_dir == LOGGING_DIR:
+            generate_logging_folder()
+        else:
+            log_dir.mkdir(parents=True, exist_ok=True)
 
-        path = Path(LOGGING_DIR, filename)
+        path = Path(log_dir, filename)
         # Make sure the damn file exists
         if not (path.exists() or path.is_file()):
             path.touch()
 
-        super().__init__(Path(LOGGING_DIR, filename))
+        super().__init__(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
         self.setFormatter(logging.Formatter(
             "[%(asctime)s] [%(levelname)s] %(name)s: %(message)s",
             '%Y-%m-%d %H:%M:%S',
         ))
         self.setLevel(logging.INFO)
+        self.rollover_at = self._next_midnight()
+
+    @staticmethod
+    def _next_midnight() -> float:
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+        return datetime.datetime.combine(tomorrow, datetime.time()).timestamp()
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = self._next_midnight()
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    A queue handler that leaves all formatting to the listener thread.
+
+    QueueHandler formats every record before queueing it (so it can be pickled), which is wasted work
+    for an in-process queue. Records are queued as they are, and are formatted by the listener.
+    Note that the message arguments are only formatted later, so logging an object and then changing it
+    may log the changed object.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class LoggingPipeline:
+    """
+    The bot's logging setup: every logger hands its records over to a queue, without blocking,
+    and a single background listener writes them to the terminal and to one shared, rotating log file.
+    """
+
+    def __init__(self):
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.queue_handler = LazyQueueHandler(self.queue)
+        self.listener: logging.handlers.QueueListener | None = None
+
+    @property
+    def started(self) -> bool:
+        return self.listener is not None
+
+    def start(self, level: int | str = LOG_LEVEL, log_dir: Path = LOGGING_DIR):
+        """
+        Route the root logger through the queue, and start the listener. Does nothing if already started.
+        :param level: Root logging level
+        :param log_dir: Directory of the log file (default is botdata/logs)
+        """
+        if self.started:
+            return
+
+        console = logging.StreamHandler()
+        console.setFormatter(ColorFormatter())
+
+        self.listener = logging.handlers.QueueListener(self.queue, console, DefaultFileHandler('LOG_ALL.log', log_dir=log_dir),
+                                                       respect_handler_level=True)
+        self.listener.start()
+
+        root = logging.getLogger()
+        root.addHandler(self.queue_handler)
+        root.setLevel(level)
+
+        # Flush whatever is still queued on exit
+        atexit.register(self.stop)
+
+    def stop(self):
+        if not self.started:
+            return
+
+        atexit.unregister(self.stop)
+        logging.getLogger().removeHandler(self.queue_handler)
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+        self.listener = None
+
+
+pipeline = LoggingPipeline()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Get a logger, logging through the shared pipeline. The pipeline itself is started by main.py,
+    so importing a module never opens the log file.
+    :param name: Logger name
+    """
+    return logging.getLogger(name)
 
 
 def generate_logging_folder():
@@ -1,16 +1,23 @@
+# Imported first, so startup timing starts as early as possible
+from utils.startup_timer import startup_timer
+
 import asyncio
+import io
 import json
 import sys
+import time
 
 import discord
 from discord.ext import commands
 from dotenv import load_dotenv
-import logging
 import os
 
 from log_utils import errlogging, loggers
 from utils.dir_utils import DirUtils
 from botinfo import botinfo, get_botinfo_data
+from db_access import get_shared_db
+from utils.loop_watchdog import loop_watchdog
+from utils.metrics import METRICS_PORT, MetricsServer
 
 DirUtils.ensure_working_directory()
 
@@ -19,15 +26,13 @@ load_dotenv()
 TOKEN = os.getenv('TOKEN')
 AUTHOR_ID = int(os.getenv('AUTHOR_ID'))
 
-logger = logging.Logger('General Log')
-handler = logging.StreamHandler()
-handler.setFormatter(loggers.ColorFormatter())
-logger.addHandler(handler)
-logger.addHandler(loggers.DefaultFileHandler("LOG_ALL.log"))
+logger = loggers.get_logger('General Log')
 
 bot = commands.Bot('hfc/', intents=discord.Intents.all())
 tree = bot.tree
 
+startup_timer.mark('imports')
+
 cogs: dict[str, str]
 
 
@@ -44,11 +49,14 @@ async def load_all_cogs():
     # update cogs
     read_cog_data()
 
-    for cog in cogs.values():
-        await load_single_cog(cog)
-        # Give COG_Notificator's loop time to breath and do another cycle,
-        # and lower system resource usage
-        await asyncio.sleep(1)
+    # The cogs don't depend on each other, so they are loaded concurrently
+    cog_imports = list(cogs.values())
+    results = await asyncio.gather(*(load_single_cog(cog) for cog in cog_imports), return_exceptions=True)
+
+    for cog, res in zip(cog_imports, results):
+        if isinstance(res, Exception):
+            logger.error(f'Failed to load cog {cog}: {res}')
+            errlogging.new_errlog(res)
 
 
 async def load_single_cog(cog):
@@ -57,18 +65,24 @@ async def load_single_cog(cog):
 
     :param cog: The cog import to load
     """
-    if cog in bot.extensions:
-        logger.info(f'Reloading cog {cog}')
-        await bot.reload_extension(cog)
-    else:
-        logger.info(f'Loading cog {cog}')
-        await bot.load_extension(cog)
+    start = time.perf_counter()
+
+    with startup_timer.timed(f'load {cog}'):
+        if cog in bot.extensions:
+            logger.info(f'Reloading cog {cog}')
+            await bot.reload_extension(cog)
+        else:
+            logger.info(f'Loading cog {cog}')
+            await bot.load_extension(cog)
+
+    logger.info(f'Loaded cog {cog} in {time.perf_counter() - start:.3f}s')
 
 
 async def reload_bot():
     # Reload all cogs
+    start = time.perf_counter()
     await load_all_cogs()
-    logger.info("All cogs loaded")
+    logger.info(f"All cogs loaded in {time.perf_counter() - start:.3f}s")
 
     # Reload bot info
     botinfo.reload()
@@ -131,29 +145,71 @@ async def load_cog(ctx: commands.Context, cog_name: str):
     await ctx.reply('Finished!')
 
 
+@bot.command(name="refresh_districts")
+async def _refresh_districts(ctx: commands.Context):
+    if ctx.author.id != AUTHOR_ID:
+        return
+
+    # Districts and areas are kept in memory, so this has to be run after the DB was recreated
+    logger.info(f'District catalog refresh was initiated by user @{ctx.author.name} (id={ctx.author.id})')
+    await get_shared_db().refresh_catalog()
+    await ctx.reply('Refreshed the district catalog!')
+
+
+@bot.command(name="lag")
+async def _lag_report(ctx: commands.Context):
+    if ctx.author.id != AUTHOR_ID:
+        return
+
+    report = loop_watchdog.report()
+    if len(report) > 1900:
+        await ctx.reply(file=discord.File(io.BytesIO(report.encode()), filename='lag_report.txt'))
+    else:
+        await ctx.reply(f'```\n{report}\n```')
+
+
 @bot.event
-async def on_ready():
-    await bot.change_presence(activity=discord.Activity(name='for HFC alerts.', type=discord.ActivityType.watching))
+async def setup_hook():
+    # Runs once after logging in, before connecting to the gateway,
+    # so the cogs are already warm (DB, district catalog, channel index) when the bot becomes ready.
+    # COG_Notificator only starts polling once the bot is ready.
+    startup_timer.mark('login')
+    loop_watchdog.start()
 
     errlogging.generate_errlog_folder()
     loggers.generate_logging_folder()
 
-    if bot.get_cog('Notificator') is None:
-        await load_all_cogs()
+    await load_all_cogs()
+    startup_timer.mark('all cogs loaded')
+
+    if METRICS_PORT is not None:
+        try:
+            await MetricsServer(bot).start()
+        except OSError as e:
+            logger.error(f'Could not start the metrics server: {e}')
 
 
 @bot.event
-async def on_resumed():
-    if bot.get_cog('Notificator') is None:
-        await load_all_cogs()
+async def on_ready():
+    startup_timer.mark('ready')
+
+    await bot.change_presence(activity=discord.Activity(name='for HFC alerts.', type=discord.ActivityType.watching))
+
+    errlogging.generate_errlog_folder()
+    loggers.generate_logging_folder()
+    # The cogs were already loaded by setup_hook, and are kept across reconnects
+
 
 @bot.event
 async def on_error(event, *args, **kwargs):
-    logger.error('An error has occurred! Check the latest ERRLOG for more info')
     errlogging.new_errlog(sys.exc_info()[1])
 
 if __name__ == "__main__":
+    # Everything (discord.py included) logs through the pipeline from here on
+    loggers.pipeline.start()
+
     logger.info('Starting HFCNotificator...')
     logger.info(f'Working directory: {os.getcwd()}')
 
-    bot.run(token=TOKEN, log_handler=handler, log_formatter=handler.formatter)
+    # discord.py's loggers go through the logging pipeline as well, so it shouldn't set up its own handler
+    bot.run(token=TOKEN, log_handler=None)
@@ -0,0 +1,246 @@
+import asyncio
+import bisect
+import heapq
+import json
+import os
+import time
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from log_utils import loggers
+from utils.dir_utils import DirUtils
+
+# Alerts older than this are dropped from the archive
+ARCHIVE_RETENTION_DAYS = float(os.getenv('ARCHIVE_RETENTION_DAYS', 365))
+# How far past the retention period the oldest alert may get, before the archive is compacted
+COMPACT_SLACK = 86400  # seconds
+
+
+class ArchivedAlert(NamedTuple):
+    """
+    A single alert seen by the notificator
+
+    :var timestamp: Receive time (epoch seconds)
+    :var alert_id: HFC's alert ID
+    :var cat: Alert category
+    :var title: Alert title
+    :var districts: Names of all of the alert's districts
+    """
+    timestamp: float
+    alert_id: int
+    cat: int
+    title: str
+    districts: tuple[str, ...]
+
+    def to_json(self) -> str:
+        return json.dumps({
+            't': self.timestamp,
+            'id': self.alert_id,
+            'cat': self.cat,
+            'title': self.title,
+            'data': self.districts
+        }, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, line: str):
+        obj = json.loads(line)
+        return cls(obj['t'], obj['id'], obj['cat'], obj['title'], tuple(obj['data']))
+
+
+class AlertArchive:
+    """
+    A persistent, append-only archive of every alert the notificator has seen, stored as JSON lines under botdata/.
+
+    The whole archive is kept in memory in receive order, with a time index (a sorted list of timestamps)
+    and a district index (the positions of every district's alerts), so range and district queries
+    are binary searches instead of scans.
+
+    Alerts are kept for a retention period. Older alerts are skipped on load, and once the oldest alert is
+    COMPACT_SLACK past the retention period, the archive is compacted: the file is rewritten without the expired
+    alerts, and the indexes are rebuilt. This bounds the archive's memory, file size and load time.
+    """
+
+    def __init__(self, path: Path | None = None, retention_days: float = ARCHIVE_RETENTION_DAYS):
+        """
+        :param path: Archive file path (default is botdata/alert_archive.jsonl)
+        :param retention_days: Days to keep alerts for
+        """
+        self.path = path if path is not None else DirUtils().botdata_dir.joinpath('alert_archive.jsonl')
+        self.retention = retention_days * 86400
+        self.log = loggers.get_logger('AlertArchive')
+
+        self.records: list[ArchivedAlert] = []
+        self.timestamps: list[float] = []
+        self.by_district: dict[str, list[int]] = {}
+        self.loaded = False
+
+        self._write_lock = asyncio.Lock()
+        self._written = 0  # Amount of records (from the start of self.records) that are in the file
+        self._load_task: asyncio.Task | None = None
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def first_timestamp(self) -> float | None:
+        return self.timestamps[0] if len(self.timestamps) > 0 else None
+
+    def _reindex(self, records: list[ArchivedAlert]):
+        self.records, self.timestamps, self.by_district = [], [], {}
+        for record in records:
+            self._index(record)
+
+    def _index(self, record: ArchivedAlert):
+        # Keep the time index sorted, even if the clock went back
+        if len(self.timestamps) > 0 and record.timestamp < self.timestamps[-1]:
+            record = record._replace(timestamp=self.timestamps[-1])
+
+        pos = len(self.records)
+        self.records.append(record)
+        self.timestamps.append(record.timestamp)
+        for district in dict.fromkeys(record.districts):
+            self.by_district.setdefault(district, []).append(pos)
+
+    def _read_file(self, cutoff: float) -> tuple[list[ArchivedAlert], int]:
+        """
+        :param cutoff: Skip alerts from before this time (epoch seconds)
+        :return: (the file's alerts, amount of alerts skipped)
+        """
+        records = []
+        skipped = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = ArchivedAlert.from_json(line)
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        # Most likely a line cut off by a crash
+                        self.log.warning('Skipped an invalid line in the alert archive')
+                        skipped += 1
+                        continue
+
+                    if record.timestamp < cutoff:
+                        skipped += 1
+                    else:
+                        records.append(record)
+        except FileNotFoundError:
+            pass
+        return records, skipped
+
+    def _rewrite_file(self, records: list[ArchivedAlert]):
+        # Written to a temporary file first, so a crash never leaves a half-written archive behind
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(record.to_json() + '\n' for record in records)
+        os.replace(tmp_path, self.path)
+
+    async def load(self):
+        """
+        Load the archive from disk, and build its indexes. The archive is only loaded once,
+        but a failed load is tried again on the next call.
+        """
+        if self._load_task is None:
+            self._load_task = asyncio.create_task(self._load())
+            self._load_task.add_done_callback(self._load_done)
+        await asyncio.shield(self._load_task)
+
+    def _load_done(self, task: asyncio.Task):
+        if task.cancelled() or task.exception() is not None:
+            self._load_task = None
+
+    async def _load(self):
+        # Read while no record is being written, so records already written are read from the file,
+        # and only the ones still waiting to be written are kept after the loaded ones
+        async with self._write_lock:
+            records, skipped = await asyncio.to_thread(self._read_file, time.time() - self.retention)
+            if skipped > 0:
+                await asyncio.to_thread(self._rewrite_file, records)
+            recorded = self.records[self._written:]
+
+            self._reindex(records + recorded)
+            self._written = len(records)
+
+        self.loaded = True
+        self.log.info('Loaded %d archived alerts (dropped %d expired or invalid)', len(records), skipped)
+
+    async def compact(self):
+        """
+        Drop the alerts that are past the retention period, from memory and from the file
+        """
+        async with self._write_lock:
+            # Alerts that are still waiting to be written are kept, they'll expire on the next compaction
+            start = min(bisect.bisect_left(self.timestamps, time.time() - self.retention), self._written)
+            if start == 0:
+                return
+
+            await asyncio.to_thread(self._rewrite_file, self.records[start:self._written])
+            # Alerts recorded meanwhile are still waiting to be written, after the rewritten ones
+            self._reindex(self.records[start:])
+            self._written -= start
+
+        self.log.info('Dropped %d expired alerts from the archive', start)
+
+    def _append_line(self, line: str):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+    async def record(self, alert: dict, districts: Iterable[str], received: float | None = None):
+        """
+        Archive an alert
+        :param alert: Alert data dict, as received from HFC
+        :param districts: All of the alert's districts
+        :param received: Receive time (default is now)
+        """
+        record = ArchivedAlert(
+            received if received is not None else time.time(),
+            int(alert.get('id', 0)),
+            int(alert.get('cat', 0)),
+            alert.get('title', ''),
+            tuple(districts)
+        )
+        self._index(record)
+
+        # Written off the event loop, in order
+        async with self._write_lock:
+            await asyncio.to_thread(self._append_line, record.to_json())
+            self._written += 1
+
+        first = self.first_timestamp
+        if self.loaded and first is not None and first < time.time() - self.retention - COMPACT_SLACK:
+            await self.compact()
+
+    def query(self, start: float, end: float | None = None, districts: Iterable[str] | None = None) -> list[ArchivedAlert]:
+        """
+        Get all archived alerts in a time range, newest first
+        :param start: Range start (epoch seconds, inclusive)
+        :param end: Range end (epoch seconds, inclusive), default is now
+        :param districts: Only get alerts for these district names (all districts if None)
+        :return: Matching alerts. Alerts of a districts filter only contain the matching districts.
+        """
+        end = end if end is not None else time.time()
+
+        if districts is None:
+            lo = bisect.bisect_left(self.timestamps, start)
+            hi = bisect.bisect_right(self.timestamps, end)
+            return self.records[lo:hi][::-1]
+
+        districts = set(districts)
+        positions = []
+        for district in districts:
+            indexed = self.by_district.get(district)
+            if indexed is None:
+                continue
+            lo = bisect.bisect_left(indexed, start, key=self.timestamps.__getitem__)
+            hi = bisect.bisect_right(indexed, end, key=self.timestamps.__getitem__)
+            positions.append(indexed[lo:hi])
+
+        # Each district's positions are sorted, so merging them keeps the time order
+        merged = list(dict.fromkeys(heapq.merge(*positions)))
+        return [
+            self.records[pos]._replace(districts=tuple(d for d in self.records[pos].districts if d in districts))
+            for pos in reversed(merged)
+        ]
+
+
+# Shared by all cogs, and kept across cog reloads
+alert_archive = AlertArchive()
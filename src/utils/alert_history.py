@@ -0,0 +1,176 @@
+import asyncio
+import bisect
+import datetime
+import math
+import time
+from typing import Callable, NamedTuple
+
+from utils.alert_reqs import AsyncAlertReqs
+
+HISTORY_TTL = 30  # seconds
+
+
+class HistoryRecord(NamedTuple):
+    """
+    A single parsed alert history entry
+    """
+    timestamp: float
+    date: str
+    title: str
+    data: str
+
+
+class HistoryStore:
+    """
+    The alert history, parsed once and sorted by time.
+
+    Time windows and pages are found by binary search, in O(log n + page size).
+    Rendered pages are memoized by (window, page, page size) for the store's lifetime,
+    which ends on the next history refresh.
+    """
+
+    def __init__(self, entries: list[dict]):
+        """
+        :param entries: AlertsHistory.json entries
+        """
+        records = []
+        for entry in entries:
+            try:
+                # Local (Israel) time, same as the host's clock
+                timestamp = datetime.datetime.fromisoformat(entry["alertDate"]).timestamp()
+            except (KeyError, ValueError):
+                continue
+            records.append(HistoryRecord(timestamp, entry["alertDate"], entry.get("title", ''), entry.get("data", '')))
+
+        records.sort(key=lambda record: record.timestamp)
+        self.records: list[HistoryRecord] = records
+        self.timestamps: list[float] = [record.timestamp for record in records]
+
+        self._pages: dict[tuple[int, int, int], str] = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def count_since(self, cutoff: float) -> int:
+        """
+        Amount of records at or after the given timestamp
+        """
+        return len(self.records) - bisect.bisect_left(self.timestamps, cutoff)
+
+    def page(self, window: int, page_number: int, page_size: int) -> tuple[list[HistoryRecord], int]:
+        """
+        Get a single page of the records in a time window, newest first
+        :param window: Seconds back from now
+        :param page_number: The page number (starting at 0)
+        :param page_size: Amount of records in a page
+        :return: (the page's records, amount of pages)
+        :raises ValueError: If the window is empty or the page is out of range
+        """
+        if window <= 0:
+            raise ValueError("Time can't be lower than 1.")
+
+        start = bisect.bisect_left(self.timestamps, time.time() - window)
+        count = len(self.records) - start
+        max_page = math.ceil(count / page_size)
+
+        if max_page == 0:
+            raise ValueError("No results found.")
+        if page_number >= max_page:
+            raise ValueError("Page number is too high.")
+        if page_number < 0:
+            raise ValueError("Page number is too low.")
+
+        hi = len(self.records) - page_number * page_size
+        lo = max(start, hi - page_size)
+        return self.records[lo:hi][::-1], max_page
+
+    def render_page(self, window: int, page_number: int, page_size: int,
+                    render: Callable[[list[HistoryRecord], int, int], str]) -> str:
+        """
+        Get a rendered page, rendering it only if it's not memoized yet
+        :param render: Function rendering (records, page number, amount of pages) into a page string
+        """
+        key = (window, page_number, page_size)
+        rendered = self._pages.get(key)
+        if rendered is None:
+            records, max_page = self.page(window, page_number, page_size)
+            rendered = render(records, page_number, max_page)
+            self._pages[key] = rendered
+        return rendered
+
+
+class AlertHistoryCache:
+    """
+    A shared, short-lived cache of HFC's alert history (AlertsHistory.json).
+
+    Every request within the TTL is served from memory. Once it's stale, concurrent requests share a single
+    refresh (single-flight), instead of each downloading the whole history on its own.
+    All refreshes go through one pooled session.
+    """
+
+    def __init__(self, ttl: float = HISTORY_TTL, alert_reqs: AsyncAlertReqs | None = None):
+        """
+        :param ttl: Seconds a fetched history is served for
+        :param alert_reqs: Requests handler to fetch with (a new one by default)
+        """
+        self.ttl = ttl
+        self.alert_reqs = alert_reqs if alert_reqs is not None else AsyncAlertReqs()
+
+        self.hits = 0
+        self.refreshes = 0
+
+        self._history: list[dict] | None = None
+        self._store: HistoryStore | None = None
+        self._fetched_at = 0.0
+        self._refresh_task: asyncio.Task | None = None
+
+    @property
+    def fresh(self) -> bool:
+        return self._history is not None and time.monotonic() - self._fetched_at < self.ttl
+
+    async def get(self) -> list[dict]:
+        """
+        Get the alert history, refreshing it if it's stale
+        :return: History entries, newest first
+        :raises asyncio.TimeoutError: If the refresh request times out
+        :raises aiohttp.ClientConnectionError: If HFC's servers could not be reached
+        """
+        if self.fresh:
+            self.hits += 1
+            return self._history
+
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+
+        # Shielded, so a cancelled caller doesn't cancel the refresh the others are waiting for
+        return await asyncio.shield(self._refresh_task)
+
+    async def get_store(self) -> HistoryStore:
+        """
+        Get the parsed alert history, refreshing it if it's stale
+        :raises asyncio.TimeoutError: If the refresh request times out
+        :raises aiohttp.ClientConnectionError: If HFC's servers could not be reached
+        """
+        await self.get()
+        return self._store
+
+    async def _refresh(self) -> list[dict]:
+        history = await self.alert_reqs.request_history_json()
+        if history is None:
+            raise ValueError('Received an invalid alert history.')
+
+        self.refreshes += 1
+        self._history = history
+        self._store = HistoryStore(history)
+        self._fetched_at = time.monotonic()
+        return history
+
+    async def close(self):
+        """
+        Close the pooled session. The cached history is kept, and the session is reopened by the next refresh.
+        """
+        await self.alert_reqs.close()
+
+
+# Shared by all cogs, and kept across cog reloads
+history_cache = AlertHistoryCache()
@@ -6,6 +6,14 @@ import db_access as db_access
 
 from db_access import AreaDistrict
 
+# Discord's message limits
+EMBED_DESCRIPTION_LIMIT = 4096
+MESSAGE_EMBEDS_LIMIT = 10
+MESSAGE_EMBEDS_CHARS_LIMIT = 6000
+MESSAGE_CONTENT_LIMIT = 2000
+
+DISTRICTS_EMBED_TITLE = 'מקומות ההתראה'
+
 
 class Alert:
     """
@@ -58,6 +66,18 @@ class DistrictsEmbed:
         self.districts = districts
 
 
+class DistrictsMessage:
+    """
+    A single message of an alert, containing up to 10 embeds
+
+    :var embeds: The message's embeds
+    :var districts: Names of all districts listed in the message's embeds
+    """
+    def __init__(self, embeds: list[discord.Embed], districts: list[str]):
+        self.embeds = embeds
+        self.districts = districts
+
+
 class AlertEmbedFactory:
     """
     This is a class representing the new alert embed
@@ -111,10 +131,17 @@ class AlertEmbedFactory:
         embed.description = "\n".join(areas)
         return embed
 
+    @staticmethod
+    def _make_districts_embed(desc: str) -> discord.Embed:
+        embed = discord.Embed(color=discord.Color.from_str("#7F7F7F"))
+        embed.title = DISTRICTS_EMBED_TITLE
+        embed.description = desc
+        return embed
+
     @staticmethod
     def make_districts_embed(alert: Alert | dict, districts: list[AreaDistrict | str]) -> list[DistrictsEmbed]:
         """
-        Create a list of alert_embeds
+        Create a list of alert_embeds, one per message (see make_districts_messages to send multiple embeds per message)
 
         :param alert: Valid alert data
         :param districts: All active districts to be sent in the embed
@@ -131,30 +158,148 @@ class AlertEmbedFactory:
 
         dists, fmt_ls = AlertEmbedFactory.format_districts(alert, districts)
 
+        # construct embeds
         embed_ls = []
-        if len(fmt_ls) == 0:
+        for i, desc in enumerate(fmt_ls):
+            embed_ls.append(DistrictsEmbed(AlertEmbedFactory._make_districts_embed(desc), dists[i]))
+
+        return embed_ls
+
+    @staticmethod
+    def make_districts_messages(alert: Alert | dict,
+                                districts: list[AreaDistrict | str],
+                                start_embed: discord.Embed | None = None,
+                                end_embed: discord.Embed | None = None) -> list[DistrictsMessage]:
+        """
+        Create the messages of an alert, using as few messages as Discord's limits allow
+
+        :param alert: Valid alert data
+        :param districts: All active districts to be sent in the embeds
+        :param start_embed: An embed to open the first message with
+        :param end_embed: An embed to close the last message with, only added if there are 2 districts embeds or more
+
+        :returns: A list of all messages, or an empty list if received no districts
+        """
+
+        # Ensure alert object
+        if isinstance(alert, dict):
+            alert = Alert.from_dict(alert)
+
+        if len(districts) == 0:
             return []
 
-        # construct embeds
-        i = 0
-        for desc in fmt_ls:
-            embed = discord.Embed(color=discord.Color.from_str("#7F7F7F"))
-            embed.title = 'מקומות ההתראה'
-            embed.description = desc
-            dists_emb = DistrictsEmbed(embed, dists[i])
-            i += 1
-            embed_ls.append(dists_emb)
+        reserved_chars = len(start_embed) if start_embed is not None else 0
+        reserved_embeds = 1 if start_embed is not None else 0
+        packed = AlertEmbedFactory.pack_districts(alert, districts, reserved_chars, reserved_embeds)
+
+        messages = []
+        for message in packed:
+            embeds = [AlertEmbedFactory._make_districts_embed(desc) for _, desc in message]
+            dists = [dist for message_dists, _ in message for dist in message_dists]
+            messages.append(DistrictsMessage(embeds, dists))
+
+        if start_embed is not None:
+            messages[0].embeds.insert(0, start_embed)
+
+        embeds_count = sum(len(message) for message in packed)
+        if end_embed is not None and embeds_count >= 2:
+            last = messages[-1]
+            if (len(last.embeds) < MESSAGE_EMBEDS_LIMIT
+                    and sum(len(embed) for embed in last.embeds) + len(end_embed) <= MESSAGE_EMBEDS_CHARS_LIMIT):
+                last.embeds.append(end_embed)
+            else:
+                messages.append(DistrictsMessage([end_embed], []))
 
-        return embed_ls
+        return messages
 
     @staticmethod
-    def format_districts(alert: Alert, districts: list[AreaDistrict | str]) -> (list[list[str]], list[str]):
-        # select district formatter
+    def _select_formatter(alert: Alert):
         match alert.category:
             case 1:
-                formatter = AlertEmbedFactory._format_missiles
+                return AlertEmbedFactory._format_missiles
             case _:
-                formatter = AlertEmbedFactory._format_generic
+                return AlertEmbedFactory._format_generic
+
+    @staticmethod
+    def pack_districts(alert: Alert,
+                       districts: list[AreaDistrict | str],
+                       reserved_chars: int = 0,
+                       reserved_embeds: int = 0) -> list[list[tuple[list[str], str]]]:
+        """
+        Bin-pack the formatted districts into embed descriptions, and the embeds into messages.
+
+        Districts keep their order, and each one is placed in the current embed if it fits, else in a new embed
+        in the current message if the message still fits, else in a new message.
+        Limits checked are the embed description length, the amount of embeds in a message,
+        the total embed characters in a message, and the message's districts content length.
+
+        :param alert: Valid alert data
+        :param districts: All districts to pack
+        :param reserved_chars: Embed characters already taken in the first message
+        :param reserved_embeds: Embeds already taken in the first message
+
+        :returns: A list of messages, each a list of embeds, each a tuple of (district names, description)
+        """
+        formatter = AlertEmbedFactory._select_formatter(alert)
+
+        content_prefix_len = len(f"**{alert.title}** | ")
+        title_len = len(DISTRICTS_EMBED_TITLE)
+
+        messages: list[list[tuple[list[str], str]]] = []
+        cur_message: list[tuple[list[str], str]] = []
+        cur_dists: list[str] = []
+        cur_desc = ''
+        message_chars = reserved_chars + title_len
+        message_embeds = reserved_embeds + 1
+        content_len = content_prefix_len
+
+        for dist in districts:
+            dist_name = dist.name if isinstance(dist, AreaDistrict) else dist
+            line = formatter(dist) + "\n"
+            name_len = len(f", {dist_name}")
+
+            if len(cur_dists) > 0:
+                fits_content = content_len + name_len < MESSAGE_CONTENT_LIMIT
+                fits_embed = len(cur_desc) + len(line) < EMBED_DESCRIPTION_LIMIT
+                fits_message = message_chars + len(line) <= MESSAGE_EMBEDS_CHARS_LIMIT
+
+                if not (fits_content and fits_embed and fits_message):
+                    # close the current embed
+                    cur_message.append((cur_dists, cur_desc))
+                    cur_dists = []
+                    cur_desc = ''
+
+                    new_embed_fits = (fits_content
+                                      and message_embeds < MESSAGE_EMBEDS_LIMIT
+                                      and message_chars + title_len + len(line) <= MESSAGE_EMBEDS_CHARS_LIMIT)
+                    if new_embed_fits:
+                        message_chars += title_len
+                        message_embeds += 1
+                    else:
+                        # close the current message too
+                        messages.append(cur_message)
+                        cur_message = []
+                        message_chars = title_len
+                        message_embeds = 1
+                        content_len = content_prefix_len
+
+            cur_dists.append(dist_name)
+            cur_desc += line
+            message_chars += len(line)
+            content_len += name_len
+
+        # add final ones
+        if len(cur_dists) > 0:
+            cur_message.append((cur_dists, cur_desc))
+        if len(cur_message) > 0:
+            messages.append(cur_message)
+
+        return messages
+
+    @staticmethod
+    def format_districts(alert: Alert, districts: list[AreaDistrict | str]) -> (list[list[str]], list[str]):
+        # select district formatter
+        formatter = AlertEmbedFactory._select_formatter(alert)
         # Current embed description
         fmt_ls: list[str] = []
         dists: list[list[str]] = []  # list of districts by embed index
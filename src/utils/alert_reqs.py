@@ -1,56 +1,201 @@
+import asyncio
+import hashlib
 import json
+import time
 
-import requests
+import aiohttp
 
+from utils.latency import LatencyHistogram
 
-class AlertReqs:
+ALERTS_URL = 'https://www.oref.org.il/WarningMessages/alert/alerts.json'
+HISTORY_URL = 'https://www.oref.org.il/warningMessages/alert/History/AlertsHistory.json'
+
+ALERT_HEADERS = {
+    'Referer': 'https://www.oref.org.il/',
+    'X-Requested-With': 'XMLHttpRequest',
+    'Connection': 'keep-alive',
+    'Accept-Language': 'en-US,en;q=0.6',
+    'Client': 'HFC Notificator bot for Discord',
+    'Nonexistent-Header': 'Yes'
+}
+
+# Exceptions raised by AsyncAlertReqs when HFC's servers can't be reached
+CONNECTION_ERRORS = (asyncio.TimeoutError, aiohttp.ClientConnectionError)
+
+
+def parse_alert_content(content: bytes) -> dict | None:
+    """
+    Parse the raw body of an alerts.json response
+    :param content: Raw response body
+    :return: JSON object as Python dict, an empty dict if there's no alert running, or None if the body is invalid
+    """
+    decoded = content.decode('utf-8-sig')
+
+    if decoded is None or len(decoded) < 3:  # Why does it get a '\r\n' wtf
+        return {}
+
+    try:
+        return json.loads(decoded)
+    except (json.decoder.JSONDecodeError, json.JSONDecodeError):
+        return None
+
+
+def parse_history_content(content: str) -> dict | None:
+    """
+    Parse the body of an AlertsHistory.json response
+    :param content: Response body
+    :return: JSON object as Python dict, or None if the body is invalid
+    """
+    try:
+        return json.loads(content)
+    except (json.JSONDecodeError, json.decoder.JSONDecodeError):
+        return None
+
+
+class PollStats:
     """
-    A class that handles all requests from HFC's website
+    Counters for alerts.json polls
+
+    :var polls: Total amount of successful polls
+    :var not_modified: Polls answered by the server with 304 Not Modified
+    :var unchanged: Polls whose body matched the previous poll's body
+    :var errors: Polls that failed to reach HFC's servers
+    :var latency: Latency of the successful polls
     """
 
     def __init__(self):
-        self.session = requests.Session()
-        self.session.verify = True
+        self.polls = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+
+    @property
+    def short_circuited(self) -> int:
+        """
+        Amount of polls that were skipped without parsing
+        """
+        return self.not_modified + self.unchanged
+
+
+class AsyncAlertReqs:
+    """
+    A class that handles all requests from HFC's website.
+
+    All requests go through a single pooled aiohttp session, so polling HFC never blocks the event loop.
+    The session is created lazily, as aiohttp sessions must be created from within a running loop.
+    """
+
+    def __init__(self, timeout: float = 5, pool_size: int = 4):
+        """
+        :param timeout: Total timeout of a single request, in seconds
+        :param pool_size: Maximum amount of simultaneous connections kept by the session
+        """
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.pool_size = pool_size
+        self._session: aiohttp.ClientSession | None = None
+
+        # Change detection for alerts.json
+        self.poll_stats = PollStats()
+        self._etag: str | None = None
+        self._last_modified: str | None = None
+        self._last_digest: bytes | None = None
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        Get the pooled session, (re)creating it if needed
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
 
-    def request_alert_json(self) -> dict | None:
+    async def close(self):
+        """
+        Close the pooled session
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def request_alert_json(self) -> dict | None:
         """
         Request a json of the current running alert
-        :return: JSON object as Python dict, or None if there's no alert running
-        :raises requests.exceptions.Timeout: If request times out (5 seconds)
+        :return: JSON object as Python dict, an empty dict if there's no alert running, or None if the body is invalid
+        :raises asyncio.TimeoutError: If request times out
+        :raises aiohttp.ClientConnectionError: If HFC's servers could not be reached
+        """
+        session = await self.get_session()
+        async with session.get(ALERTS_URL, headers=ALERT_HEADERS) as resp:
+            content = await resp.read()
+
+        return parse_alert_content(content)
+
+    async def poll_alert_json(self) -> tuple[bool, dict | None]:
         """
-        req = self.session.get('https://www.oref.org.il/WarningMessages/alert/alerts.json', headers={
-            'Referer': 'https://www.oref.org.il/',
-            'X-Requested-With': 'XMLHttpRequest',
-            'Connection': 'keep-alive',
-            'Accept-Language': 'en-US,en;q=0.6',
-            'Client': 'HFC Notificator bot for Discord',
-            'Nonexistent-Header': 'Yes'
-        }, timeout=5)
+        Request a json of the current running alert, skipping the parse if it has not changed since the last poll.
 
-        decoded = req.content.decode('utf-8-sig')
+        Uses a conditional GET (ETag/Last-Modified) when the server supports it,
+        and falls back to comparing a hash of the response body.
 
-        if decoded is None or len(decoded) < 3:  # Why does it get a '\r\n' wtf
-            ret_dict = {}
-        else:
-            try:
-                ret_dict = json.loads(decoded)
-            except (json.decoder.JSONDecodeError, json.JSONDecodeError):
-                ret_dict = None
+        :return: A (changed, alert) tuple. If changed is False, alert is always None and the previous alert still stands.
+        Otherwise, alert is the same as in request_alert_json.
+        :raises asyncio.TimeoutError: If request times out
+        :raises aiohttp.ClientConnectionError: If HFC's servers could not be reached
+        """
+        headers = ALERT_HEADERS.copy()
+        if self._etag is not None:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified is not None:
+            headers['If-Modified-Since'] = self._last_modified
+
+        session = await self.get_session()
+        start = time.perf_counter()
+        try:
+            async with session.get(ALERTS_URL, headers=headers) as resp:
+                self.poll_stats.polls += 1
+
+                if resp.status == 304:
+                    self.poll_stats.not_modified += 1
+                    self.poll_stats.latency.observe(time.perf_counter() - start)
+                    return False, None
+
+                content = await resp.read()
+                self._etag = resp.headers.get('ETag')
+                self._last_modified = resp.headers.get('Last-Modified')
+        except CONNECTION_ERRORS:
+            self.poll_stats.errors += 1
+            raise
+        self.poll_stats.latency.observe(time.perf_counter() - start)
+
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+        if digest == self._last_digest:
+            self.poll_stats.unchanged += 1
+            return False, None
 
-        return ret_dict
+        alert = parse_alert_content(content)
 
-    def request_history_json(self) -> dict | None:
+        # Don't remember invalid bodies, so the next valid one is never mistaken for "unchanged"
+        self._last_digest = digest if alert is not None else None
+        return True, alert
+
+    def reset_change_detection(self):
+        """
+        Forget the last seen alert, so the next poll is always reported as changed
+        """
+        self._etag = None
+        self._last_modified = None
+        self._last_digest = None
+
+    async def request_history_json(self) -> dict | None:
         """
         Request a json of the alert history from last day
         :return: JSON object as Python dict
-        :raises requests.exceptions.Timeout: If request times out (5 seconds)
+        :raises asyncio.TimeoutError: If request times out
+        :raises aiohttp.ClientConnectionError: If HFC's servers could not be reached
         """
-        req = self.session.get("https://www.oref.org.il/warningMessages/alert/History/AlertsHistory.json", timeout=5)
-
-        content = req.text
+        session = await self.get_session()
+        async with session.get(HISTORY_URL) as resp:
+            content = await resp.read()
 
-        try:
-            ret_dict = json.loads(content)
-        except (json.JSONDecodeError, json.decoder.JSONDecodeError):
-            ret_dict = None
-        return ret_dict
+        return parse_history_content(content.decode('utf-8-sig'))
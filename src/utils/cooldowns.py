@@ -0,0 +1,87 @@
+import heapq
+import itertools
+import time
+from typing import Callable, Hashable
+
+
+class DistrictCooldowns:
+    """
+    Tracks which (district, category) pairs are on cooldown.
+
+    Entries are kept by absolute deadline on a monotonic clock, in a dict for O(1) membership checks,
+    and in a min-heap for expiry. Expiring entries costs O(expired * log n), instead of scanning the whole table.
+
+    Refreshing an entry that is already on cooldown only updates its dict deadline.
+    Its heap entry is rescheduled lazily once it reaches the top, so the heap never holds more than one entry per key.
+    """
+
+    def __init__(self, duration: float = 60, clock: Callable[[], float] = time.monotonic):
+        """
+        :param duration: Cooldown duration, in seconds
+        :param clock: Monotonic clock function, returning seconds
+        """
+        self.duration = duration
+        self.clock = clock
+
+        self._deadlines: dict[tuple[str, Hashable], float] = {}
+        # (deadline, tiebreaker, key), so keys with mixed category types never get compared
+        self._heap: list[tuple[float, int, tuple[str, Hashable]]] = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key: tuple[str, Hashable]) -> bool:
+        """
+        Check whether a (district, category) pair is on cooldown
+        """
+        deadline = self._deadlines.get(key)
+        return deadline is not None and deadline > self.clock()
+
+    def touch(self, district: str, cat: Hashable) -> bool:
+        """
+        Put a (district, category) pair on cooldown, or extend its current cooldown
+
+        :param district: District name
+        :param cat: Alert category
+        :return: True if the pair was not already on cooldown
+        """
+        key = (district, cat)
+        now = self.clock()
+        deadline = now + self.duration
+
+        prev = self._deadlines.get(key)
+        self._deadlines[key] = deadline
+
+        if prev is None:
+            heapq.heappush(self._heap, (deadline, next(self._counter), key))
+            return True
+
+        return prev <= now
+
+    def expire(self) -> list[tuple[str, Hashable]]:
+        """
+        Remove all pairs whose cooldown is over
+
+        :return: A list of the removed (district, category) pairs
+        """
+        now = self.clock()
+        expired = []
+
+        while len(self._heap) > 0 and self._heap[0][0] <= now:
+            _, _, key = heapq.heappop(self._heap)
+            deadline = self._deadlines[key]
+
+            if deadline > now:
+                # Was refreshed after being scheduled, push it back with its actual deadline
+                heapq.heappush(self._heap, (deadline, next(self._counter), key))
+                continue
+
+            del self._deadlines[key]
+            expired.append(key)
+
+        return expired
+
+    def clear(self):
+        self._deadlines.clear()
+        self._heap.clear()
@@ -0,0 +1,244 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Hashable
+
+from log_utils import loggers
+
+# Discord allows 50 requests per second globally,
+# and 5 messages per 5 seconds in every channel
+GLOBAL_RATE = 50
+ROUTE_RATE = 1
+ROUTE_CAPACITY = 5
+
+
+class TokenBucket:
+    """
+    A token bucket rate limiter
+
+    :var rate: Tokens added per second
+    :var capacity: Maximum amount of stored tokens
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        """
+        :param rate: Tokens added per second
+        :param capacity: Maximum amount of stored tokens (the bucket starts full)
+        :param clock: Monotonic clock function, returning seconds
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+
+        self.tokens = capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> float:
+        """
+        Try to take a single token
+
+        :return: 0 if a token was taken, otherwise the amount of seconds until one will be available
+        """
+        self._refill()
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """
+        Wait until a single token can be taken, and take it
+        """
+        while (wait := self.try_acquire()) > 0:
+            await asyncio.sleep(wait)
+
+    @property
+    def full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class DispatchStats:
+    """
+    Counters for sent messages
+
+    :var sent: Messages sent
+    :var failed: Messages that failed to send
+    :var rate_limited: Messages that failed with 429 Too Many Requests
+    :var job_errors: Jobs that raised instead of handling their errors
+    """
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.job_errors = 0
+
+
+class DispatchJob:
+    """
+    A single channel's delivery, waiting in the dispatcher's queue
+
+    :var fair_key: The key the job is scheduled fairly by (the guild ID, or the route for DMs)
+    :var route: The rate limit route of the job (the ID of the channel or user that is sent to)
+    :var run: A function returning the coroutine that performs the delivery
+    :var urgency: Sort key used by urgency-first dispatchers, lower is sooner
+    """
+
+    def __init__(self,
+                 fair_key: Hashable,
+                 route: Hashable,
+                 run: Callable[[], Awaitable[Any]],
+                 urgency: tuple = ()):
+        self.fair_key = fair_key
+        self.route = route
+        self.run = run
+        self.urgency = urgency
+
+
+class AlertDispatcher:
+    """
+    Schedules alert deliveries on a bounded pool of workers.
+
+    Jobs are served round-robin across guilds, so one big guild can't starve the others.
+    In urgency-first mode, jobs are served by their urgency first, and round-robin only among equally urgent jobs.
+    Every sent message should first go through throttle(), which waits on the global bucket and on the route's bucket,
+    keeping the bot below Discord's rate limits instead of hitting 429s.
+    """
+
+    def __init__(self,
+                 workers: int = 8,
+                 global_rate: float = GLOBAL_RATE,
+                 route_rate: float = ROUTE_RATE,
+                 route_capacity: float = ROUTE_CAPACITY,
+                 urgency_first: bool = False,
+                 log: logging.Logger | None = None):
+        """
+        :param workers: Amount of deliveries that may run at the same time
+        :param global_rate: Messages per second allowed across the whole bot
+        :param route_rate: Messages per second allowed in a single channel
+        :param route_capacity: Burst size allowed in a single channel
+        :param urgency_first: Whether to serve jobs by their urgency before guild fairness
+        :param log: Logger to report failed jobs to
+        """
+        self.worker_count = workers
+        self.route_rate = route_rate
+        self.route_capacity = route_capacity
+        self.urgency_first = urgency_first
+        self.log = log if log is not None else loggers.get_logger('AlertDispatcher')
+
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.route_buckets: dict[Hashable, TokenBucket] = {}
+        self.stats = DispatchStats()
+
+        self._queue: asyncio.PriorityQueue | None = None
+        self._counter = itertools.count()
+        self._pending_per_key: dict[Hashable, int] = {}
+
+        # Strong references to all running worker tasks
+        self._workers: set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> bool:
+        return len(self._workers) > 0
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Amount of jobs waiting for a worker
+        """
+        return 0 if self._queue is None else self._queue.qsize()
+
+    def start(self):
+        """
+        Start the worker pool. Must be called from within the running event loop.
+        """
+        if self.running:
+            return
+
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+
+        for i in range(self.worker_count):
+            task = asyncio.create_task(self._worker(), name=f'AlertDispatcher-worker-{i}')
+            self._workers.add(task)
+            task.add_done_callback(self._workers.discard)
+
+    async def stop(self):
+        """
+        Stop the worker pool. Queued jobs are kept, and will run if the dispatcher is started again.
+        """
+        workers = list(self._workers)
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def join(self):
+        """
+        Wait until all queued jobs are done
+        """
+        if self._queue is not None:
+            await self._queue.join()
+
+    def submit(self, job: DispatchJob):
+        """
+        Queue a job. Jobs of a guild are ranked behind that guild's already pending jobs,
+        so workers alternate between guilds.
+        """
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+
+        rank = self._pending_per_key.get(job.fair_key, 0)
+        self._pending_per_key[job.fair_key] = rank + 1
+
+        priority = (*job.urgency, rank) if self.urgency_first else (rank,)
+        self._queue.put_nowait((priority, next(self._counter), job))
+
+    async def throttle(self, route: Hashable | None):
+        """
+        Wait until a message may be sent on the given route
+        :param route: The rate limit route (the ID of the channel or user that is sent to), or None for the global limit only
+        """
+        if route is not None:
+            bucket = self.route_buckets.get(route)
+            if bucket is None:
+                bucket = TokenBucket(self.route_rate, self.route_capacity)
+                self.route_buckets[route] = bucket
+            await bucket.acquire()
+
+        await self.global_bucket.acquire()
+
+    def prune_routes(self):
+        """
+        Drop the buckets of idle routes, as a full bucket behaves exactly like a new one
+        """
+        for route in [route for route, bucket in self.route_buckets.items() if bucket.full]:
+            del self.route_buckets[route]
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self._queue.get()
+
+            pending = self._pending_per_key[job.fair_key] - 1
+            if pending > 0:
+                self._pending_per_key[job.fair_key] = pending
+            else:
+                del self._pending_per_key[job.fair_key]
+
+            try:
+                await job.run()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats.job_errors += 1
+                self.log.error('Dispatch job for route %s failed: %s', job.route, e)
+            finally:
+                self._queue.task_done()
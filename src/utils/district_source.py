@@ -0,0 +1,132 @@
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+
+import aiohttp
+
+from log_utils import loggers
+from utils.dir_utils import DirUtils
+
+DISTRICTS_HEB_URL = 'https://www.oref.org.il/districts/districts_heb.json'
+REFRESH_INTERVAL = 6 * 60 * 60  # seconds
+
+
+class DistrictSource:
+    """
+    HFC's districts_heb.json, served from an on-disk snapshot under botdata/.
+
+    The snapshot is only read on first access, and is refreshed from HFC's website in the background,
+    so loading the cogs never waits for the network (and works while HFC's website is unreachable).
+    """
+
+    def __init__(self,
+                 url: str = DISTRICTS_HEB_URL,
+                 snapshot_path: Path | None = None,
+                 refresh_interval: float = REFRESH_INTERVAL,
+                 timeout: float = 10):
+        """
+        :param url: URL of the district list
+        :param snapshot_path: Snapshot file path (default is botdata/districts_heb.json)
+        :param refresh_interval: Seconds between background refreshes
+        :param timeout: Request timeout, in seconds
+        """
+        self.url = url
+        self.snapshot_path = snapshot_path if snapshot_path is not None \
+            else DirUtils().botdata_dir.joinpath('districts_heb.json')
+        self.refresh_interval = refresh_interval
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.log = loggers.get_logger('DistrictSource')
+
+        self._districts: list[dict] | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def districts(self) -> list[dict]:
+        """
+        The district list, as of the latest snapshot (empty if there is none yet)
+        """
+        if self._districts is None:
+            self.load_snapshot()
+        return self._districts
+
+    @property
+    def snapshot_age(self) -> float:
+        """
+        Seconds since the snapshot was last written (infinity if there is no snapshot)
+        """
+        try:
+            return time.time() - self.snapshot_path.stat().st_mtime
+        except FileNotFoundError:
+            return float('inf')
+
+    def load_snapshot(self) -> bool:
+        """
+        Load the district list from the snapshot
+        :return: Whether the snapshot could be loaded
+        """
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                self._districts = json.load(f)
+            return True
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            self.log.warning(f'Could not load the districts snapshot: {e}')
+            if self._districts is None:
+                self._districts = []
+            return False
+
+    def _write_snapshot(self, content: str):
+        # Written to a temporary file first, so a crash never leaves a half-written snapshot behind
+        tmp_path = self.snapshot_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, self.snapshot_path)
+
+    async def refresh(self) -> bool:
+        """
+        Fetch the district list from HFC's website, and update the snapshot
+        :return: Whether the list was refreshed
+        """
+        try:
+            async with aiohttp.ClientSession(timeout=self.timeout) as session:
+                async with session.get(self.url) as res:
+                    res.raise_for_status()
+                    content = (await res.read()).decode('utf-8-sig')
+            districts = json.loads(content)
+        except (asyncio.TimeoutError, aiohttp.ClientError, UnicodeDecodeError, json.JSONDecodeError) as e:
+            self.log.warning(f'Could not refresh the district list: {e}')
+            return False
+
+        self._districts = districts
+        await asyncio.get_running_loop().run_in_executor(None, self._write_snapshot, content)
+        return True
+
+    def start(self):
+        """
+        Start refreshing in the background. Does nothing if already started.
+        Must be called from within the running event loop.
+        """
+        if self._task is not None and not self._task.done():
+            return
+
+        self._task = asyncio.create_task(self._refresh_loop(), name='DistrictSource-refresh')
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _refresh_loop(self):
+        # A fresh enough snapshot is used as-is, until the next refresh is due
+        delay = max(0.0, self.refresh_interval - self.snapshot_age)
+        while True:
+            await asyncio.sleep(delay)
+            delay = self.refresh_interval if await self.refresh() else 60
+
+
+# Shared by all cogs, and kept across cog reloads
+district_source = DistrictSource()
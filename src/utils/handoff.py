@@ -0,0 +1,77 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from log_utils import loggers
+
+HANDOFF_TTL = 30  # seconds
+
+
+class StateHandoff:
+    """
+    Carries runtime state from an unloaded cog instance to the instance that replaces it on reload.
+
+    discord.py's reload_extension() unloads the old cog before loading the new one, so the old cog deposits
+    its warm state in cog_unload(), and the new cog claims it when it's created.
+    This module is not an extension, so it (and the deposited state) survives the reload.
+
+    State that is not claimed in time (the cog was unloaded for good, or failed to load) is released
+    through its on_expire callback.
+    """
+
+    def __init__(self, ttl: float = HANDOFF_TTL):
+        """
+        :param ttl: Seconds a deposited state is kept for, before it's released
+        """
+        self.ttl = ttl
+        self.log = loggers.get_logger('StateHandoff')
+
+        self._states: dict[Hashable, tuple[Any, Callable[[Any], Awaitable[Any]] | None, asyncio.TimerHandle]] = {}
+        # Strong references to running on_expire callbacks
+        self._releasing: set[asyncio.Task] = set()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._states
+
+    def deposit(self, key: Hashable, state: Any, on_expire: Callable[[Any], Awaitable[Any]] | None = None):
+        """
+        Keep a state for the next instance to claim. Must be called from within the running event loop.
+        :param key: Key to deposit under (the cog name)
+        :param state: The state to hand off
+        :param on_expire: Coroutine function releasing the state, if it's not claimed in time
+        """
+        self._release(key)
+
+        handle = asyncio.get_running_loop().call_later(self.ttl, self._release, key)
+        self._states[key] = (state, on_expire, handle)
+
+    def claim(self, key: Hashable) -> Any | None:
+        """
+        Take a deposited state
+        :param key: Key the state was deposited under
+        :return: The state, or None if there is none
+        """
+        entry = self._states.pop(key, None)
+        if entry is None:
+            return None
+
+        state, _, handle = entry
+        handle.cancel()
+        return state
+
+    def _release(self, key: Hashable):
+        entry = self._states.pop(key, None)
+        if entry is None:
+            return
+
+        state, on_expire, handle = entry
+        handle.cancel()
+        self.log.info(f'State of {key} was not claimed, releasing it')
+
+        if on_expire is not None:
+            task = asyncio.create_task(on_expire(state))
+            self._releasing.add(task)
+            task.add_done_callback(self._releasing.discard)
+
+
+# Shared by all cogs
+handoff = StateHandoff()
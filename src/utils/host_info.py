@@ -0,0 +1,171 @@
+import asyncio
+import collections
+import os
+import platform
+import time
+
+from log_utils import loggers
+
+SAMPLE_INTERVAL = 10  # seconds
+SAMPLE_HISTORY = 360  # samples, an hour at the default interval
+
+
+class HostFacts:
+    """
+    Facts about the host that don't change while the bot is running.
+    Gathering them may take seconds (cpuinfo spawns subprocesses), so it's done once, off the event loop.
+    """
+
+    def __init__(self, system_name: str, cpu_name: str, physical_cores: int, logical_cores: int,
+                 boot_time: float, ram_total: int):
+        self.system_name = system_name
+        self.cpu_name = cpu_name
+        self.physical_cores = physical_cores
+        self.logical_cores = logical_cores
+        self.boot_time = boot_time
+        self.ram_total = ram_total
+
+    @classmethod
+    def gather(cls):
+        """
+        Gather all host facts. Blocking.
+        """
+        # Heavy diagnostics modules, imported lazily to keep cog loading fast
+        import cpuinfo
+        import distro
+        import psutil
+
+        uname = platform.uname()
+        if uname.system != "Linux":
+            system_name = f'{uname.system} {uname.release}'
+        else:
+            # Goddamnit Linux too many distros
+            system_name = f'{distro.name()} {distro.version_parts()[0]}.{distro.version_parts()[1]} ({distro.codename()})'
+
+        return cls(
+            system_name=system_name,
+            cpu_name=cpuinfo.get_cpu_info()["brand_raw"],
+            physical_cores=psutil.cpu_count(logical=False),
+            logical_cores=psutil.cpu_count(logical=True),
+            boot_time=psutil.boot_time(),
+            ram_total=psutil.virtual_memory().total
+        )
+
+
+class MetricsSample:
+    """
+    A single sample of the host's dynamic metrics
+
+    :var timestamp: Sample time (epoch seconds)
+    :var cpu_percent: System-wide CPU usage since the previous sample
+    :var ram_used: Used RAM, in bytes
+    :var ram_percent: Used RAM, in percent
+    :var process_rss: The bot process' resident memory, in bytes
+    """
+
+    def __init__(self, timestamp: float, cpu_percent: float, ram_used: int, ram_percent: float, process_rss: int):
+        self.timestamp = timestamp
+        self.cpu_percent = cpu_percent
+        self.ram_used = ram_used
+        self.ram_percent = ram_percent
+        self.process_rss = process_rss
+
+
+class HostInfo:
+    """
+    Serves host information from memory.
+
+    Static facts are gathered once, and dynamic metrics are sampled by a background task into a ring buffer,
+    so reading them never blocks.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, history: int = SAMPLE_HISTORY):
+        """
+        :param interval: Seconds between samples
+        :param history: Amount of samples to keep
+        """
+        self.interval = interval
+        self.samples: collections.deque[MetricsSample] = collections.deque(maxlen=history)
+        self.log = loggers.get_logger('HostInfo')
+
+        self._facts: HostFacts | None = None
+        self._facts_task: asyncio.Task | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def latest(self) -> MetricsSample | None:
+        return self.samples[-1] if len(self.samples) > 0 else None
+
+    async def get_facts(self) -> HostFacts:
+        """
+        Get the static host facts, gathering them on first use
+        """
+        if self._facts is None:
+            if self._facts_task is None:
+                self._facts_task = asyncio.create_task(asyncio.to_thread(HostFacts.gather))
+            try:
+                self._facts = await asyncio.shield(self._facts_task)
+            except Exception:
+                # Try again on the next call
+                self._facts_task = None
+                raise
+        return self._facts
+
+    def trend(self, seconds: float) -> tuple[float, float] | None:
+        """
+        Get the CPU usage trend over the last given seconds
+        :return: (average, peak) CPU usage percentages, or None if there are no samples yet
+        """
+        since = time.time() - seconds
+        recent = [sample.cpu_percent for sample in self.samples if sample.timestamp >= since]
+        if len(recent) == 0:
+            return None
+        return sum(recent) / len(recent), max(recent)
+
+    def start(self):
+        """
+        Start gathering facts and sampling metrics in the background. Does nothing if already started.
+        Must be called from within the running event loop.
+        """
+        if self._task is not None and not self._task.done():
+            return
+
+        self._task = asyncio.create_task(self._sample_loop(), name='HostInfo-sampler')
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _sample_loop(self):
+        import psutil
+
+        try:
+            await self.get_facts()
+        except Exception as e:
+            self.log.warning(f'Could not gather host facts: {e}')
+
+        process = psutil.Process(os.getpid())
+        # The first call only sets the starting point for the next one
+        psutil.cpu_percent(interval=None)
+
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                memory = psutil.virtual_memory()
+                self.samples.append(MetricsSample(
+                    timestamp=time.time(),
+                    cpu_percent=psutil.cpu_percent(interval=None),
+                    ram_used=memory.used,
+                    ram_percent=memory.percent,
+                    process_rss=process.memory_info().rss
+                ))
+            except psutil.Error as e:
+                self.log.warning(f'Could not sample host metrics: {e}')
+
+
+# Shared by all cogs, and kept across cog reloads
+host_info = HostInfo()
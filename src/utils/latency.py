@@ -0,0 +1,281 @@
+import asyncio
+import bisect
+import collections
+import json
+import os
+import time
+from pathlib import Path
+
+from log_utils import loggers
+from utils.dir_utils import DirUtils
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120)
+SAMPLE_HISTORY = 1000  # samples per histogram, for percentiles
+RECENT_TIMELINES = 100
+
+# Alert stages, in order, as offsets from the poll that received the alert
+ALERT_STAGES = ('dedup', 'lookup', 'render', 'enqueue', 'first_send', 'last_send')
+
+
+class LatencyHistogram:
+    """
+    A latency histogram, with cumulative bucket counts over all observations,
+    and percentiles over the last SAMPLE_HISTORY observations
+
+    :var counts: Observations per bucket (the last bucket is for values over the highest bound)
+    :var count: Total amount of observations
+    :var total: Sum of all observations, in seconds
+    """
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS, history: int = SAMPLE_HISTORY):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.samples: collections.deque[float] = collections.deque(maxlen=history)
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> float:
+        """
+        :param p: Percentile (0-100)
+        """
+        if len(self.samples) == 0:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': round(self.total, 6),
+            'p50': round(self.percentile(50), 6),
+            'p95': round(self.percentile(95), 6),
+            'p99': round(self.percentile(99), 6),
+            'buckets': {str(bound): count for bound, count in zip((*self.bounds, '+Inf'), self.counts)}
+        }
+
+
+class ChannelTiming:
+    """
+    A single channel's delivery of an alert, as offsets from the poll that received the alert
+
+    :var kind: 'guild' or 'dm'
+    :var started: When a dispatcher worker picked the delivery up
+    :var first_sent: When the first message was sent
+    :var last_sent: When the last message was sent
+    :var ok: Whether the delivery finished without errors
+    """
+
+    def __init__(self, kind: str, started: float):
+        self.kind = kind
+        self.started = started
+        self.first_sent: float | None = None
+        self.last_sent: float | None = None
+        self.ok = False
+
+
+class AlertTimeline:
+    """
+    The timeline of a single alert, from the poll that received it to the last channel that was sent to.
+    Once every expected channel delivery is done, the timeline is handed over to its tracker.
+
+    :var received_at: Receive time (epoch seconds)
+    :var stages: Alert-wide stages, as offsets from the receive time (see ALERT_STAGES)
+    :var channels: Channel deliveries, by channel ID
+    """
+
+    def __init__(self, tracker, alert_id: int, cat: str, received: float):
+        """
+        :param tracker: The LatencyTracker to report to
+        :param alert_id: HFC's alert ID
+        :param cat: Alert category
+        :param received: Receive time (time.perf_counter())
+        """
+        self.tracker = tracker
+        self.alert_id = alert_id
+        self.cat = cat
+        self.received = received
+        self.received_at = time.time() - (time.perf_counter() - received)
+        self.stages: dict[str, float] = {}
+        self.channels: dict[int, ChannelTiming] = {}
+
+        self.expected: int | None = None
+        self.done = 0
+        self.finished = False
+
+    def offset(self) -> float:
+        return time.perf_counter() - self.received
+
+    def mark(self, stage: str):
+        self.stages.setdefault(stage, self.offset())
+
+    def expect(self, channels: int):
+        """
+        Set the amount of channel deliveries to wait for (marks the enqueue stage)
+        """
+        self.mark('enqueue')
+        self.expected = channels
+        self._check_finished()
+
+    def channel_started(self, channel_id: int, kind: str):
+        self.channels[channel_id] = ChannelTiming(kind, self.offset())
+
+    def sent(self, channel_id: int):
+        """
+        Mark a single message as sent to a channel
+        """
+        timing = self.channels.get(channel_id)
+        if timing is None:
+            return
+
+        now = self.offset()
+        if timing.first_sent is None:
+            timing.first_sent = now
+            self.mark('first_send')
+        timing.last_sent = now
+
+    def channel_done(self, channel_id: int, ok: bool):
+        timing = self.channels.get(channel_id)
+        if timing is not None:
+            timing.ok = ok
+
+        self.done += 1
+        self._check_finished()
+
+    def _check_finished(self):
+        if self.finished or self.expected is None or self.done < self.expected:
+            return
+
+        sent = [timing.last_sent for timing in self.channels.values() if timing.last_sent is not None]
+        if len(sent) > 0:
+            self.stages['last_send'] = max(sent)
+
+        self.finished = True
+        self.tracker.finish(self)
+
+    def to_dict(self) -> dict:
+        kinds = collections.Counter(timing.kind for timing in self.channels.values())
+        return {
+            'id': self.alert_id,
+            'cat': self.cat,
+            'received_at': round(self.received_at, 3),
+            'stages': {stage: round(self.stages[stage], 6) for stage in ALERT_STAGES if stage in self.stages},
+            'channels': dict(kinds),
+            'failed': sum(1 for timing in self.channels.values() if not timing.ok)
+        }
+
+
+class LatencyTracker:
+    """
+    Aggregates alert timelines into latency histograms, split by alert category and channel type.
+
+    Alert-wide stages are kept per category (channel type 'all'),
+    and per-channel latencies per category and channel type ('guild' or 'dm'):
+    'queued' is the time a delivery waited for a dispatcher worker, and 'delivered' is the time from
+    the poll that received the alert until the channel's last message was sent.
+    The histograms and the most recent timelines are written to botdata/alert_latency.json after every alert.
+    """
+
+    def __init__(self, path: Path | None = None):
+        """
+        :param path: Output file path (default is botdata/alert_latency.json)
+        """
+        self.path = path if path is not None else DirUtils().botdata_dir.joinpath('alert_latency.json')
+        self.log = loggers.get_logger('LatencyTracker')
+
+        self.histograms: dict[tuple[str, str, str], LatencyHistogram] = {}
+        self.recent: collections.deque[dict] = collections.deque(maxlen=RECENT_TIMELINES)
+        self.alerts = 0
+
+        self._save_task: asyncio.Task | None = None
+        self._save_pending = False
+
+    def begin(self, alert: dict, received: float | None = None) -> AlertTimeline:
+        """
+        Start an alert's timeline
+        :param alert: Alert data dict, as received from HFC
+        :param received: Receive time (time.perf_counter(), default is now)
+        """
+        return AlertTimeline(self, int(alert.get('id', 0)), str(alert.get('cat', '')),
+                             received if received is not None else time.perf_counter())
+
+    def observe(self, metric: str, cat: str, kind: str, seconds: float):
+        key = (metric, cat, kind)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    def finish(self, timeline: AlertTimeline):
+        """
+        Aggregate a finished timeline
+        """
+        self.alerts += 1
+
+        for stage, offset in timeline.stages.items():
+            self.observe(stage, timeline.cat, 'all', offset)
+
+        enqueued = timeline.stages.get('enqueue', 0.0)
+        for timing in timeline.channels.values():
+            self.observe('queued', timeline.cat, timing.kind, timing.started - enqueued)
+            if timing.last_sent is not None:
+                self.observe('delivered', timeline.cat, timing.kind, timing.last_sent)
+
+        self.recent.append(timeline.to_dict())
+
+        last_send = timeline.stages.get('last_send')
+        if last_send is not None:
+            self.log.info('Alert %s was delivered to %d channels in %.3fs', timeline.alert_id, len(timeline.channels), last_send)
+
+        self._schedule_save()
+
+    def summary(self) -> dict:
+        return {
+            'alerts': self.alerts,
+            'histograms': [
+                {'metric': metric, 'cat': cat, 'kind': kind, **histogram.to_dict()}
+                for (metric, cat, kind), histogram in sorted(self.histograms.items())
+            ],
+            'recent': list(self.recent)
+        }
+
+    def _schedule_save(self):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()
+            return
+
+        # Alerts finishing while a save is running are written by one more save right after it
+        self._save_pending = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._save_loop())
+
+    async def _save_loop(self):
+        while self._save_pending:
+            self._save_pending = False
+            content = json.dumps(self.summary(), ensure_ascii=False, indent=2)
+            try:
+                await asyncio.to_thread(self._write, content)
+            except OSError as e:
+                self.log.warning('Could not save alert latencies: %s', e)
+
+    def save(self):
+        self._write(json.dumps(self.summary(), ensure_ascii=False, indent=2))
+
+    def _write(self, content: str):
+        # Written to a temporary file first, so a crash never leaves a half-written file behind
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, self.path)
+
+
+# Shared by all cogs, and kept across cog reloads
+latency_tracker = LatencyTracker()
@@ -0,0 +1,196 @@
+import asyncio
+import collections
+import sys
+import threading
+import time
+import traceback
+
+from log_utils import loggers
+
+TICK_INTERVAL = 0.05  # seconds
+LAG_THRESHOLD = 0.25  # seconds
+LAG_HISTORY = 12000  # ticks, around 10 minutes at the default interval
+STACK_DEPTH = 12  # frames
+
+
+class StallGroup:
+    """
+    All stalls sampled at the same stack
+
+    :var stack: The blocking stack, outermost frame first
+    :var tasks: Names of the tasks that were running during the stalls
+    :var count: Amount of stalls
+    :var total_lag: Total lag of the stalls, in seconds
+    :var max_lag: Longest stall, in seconds
+    :var last_seen: Time of the last stall (epoch seconds)
+    """
+
+    def __init__(self, stack: traceback.StackSummary):
+        self.stack = stack
+        self.tasks: set[str] = set()
+        self.count = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.last_seen = 0.0
+
+    def add(self, lag: float, task: str | None):
+        self.count += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        self.last_seen = time.time()
+        if task is not None:
+            self.tasks.add(task)
+
+
+class LoopWatchdog:
+    """
+    Measures the event loop's scheduling lag, and finds what blocks it.
+
+    A heartbeat task wakes up every TICK_INTERVAL and records how late it woke up.
+    A watcher thread checks the heartbeat: once it's been missing for longer than the threshold,
+    the loop is blocked right now, so the watcher samples the loop thread's stack (sys._current_frames).
+    When the loop wakes up again, the stall's full lag is added to the sampled stack's group.
+    """
+
+    def __init__(self, interval: float = TICK_INTERVAL, threshold: float = LAG_THRESHOLD, history: int = LAG_HISTORY):
+        """
+        :param interval: Seconds between heartbeats
+        :param threshold: Lag (in seconds) from which the loop is considered stalled
+        :param history: Amount of lag measurements to keep
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.lags: collections.deque[float] = collections.deque(maxlen=history)
+        self.groups: dict[tuple, StallGroup] = {}
+        self.stalls = 0
+        self.unattributed = 0
+        self.log = loggers.get_logger('LoopWatchdog')
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._last_beat = time.perf_counter()
+        self._sample: tuple[traceback.StackSummary, str | None] | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """
+        Start watching the running event loop. Does nothing if already started.
+        Must be called from within the running event loop.
+        """
+        if self.running:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stop.clear()
+
+        self._task = asyncio.create_task(self._heartbeat(), name='LoopWatchdog-heartbeat')
+        self._thread = threading.Thread(target=self._watch, name='LoopWatchdog', daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._stop.set()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        await asyncio.to_thread(self._thread.join)
+        self._task = None
+        self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self._last_beat = now
+
+            lag = max(now - expected, 0.0)
+            self.lags.append(lag)
+            if lag >= self.threshold:
+                self._record_stall(lag)
+            else:
+                # Sampled just under the threshold
+                self._sample = None
+
+    def _record_stall(self, lag: float):
+        self.stalls += 1
+
+        # Taken by the watcher while the loop was blocked
+        sample, self._sample = self._sample, None
+        if sample is None:
+            self.unattributed += 1
+            self.log.warning('Event loop was blocked for %.3fs', lag)
+            return
+
+        stack, task = sample
+        key = tuple((frame.filename, frame.lineno, frame.name) for frame in stack)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = StallGroup(stack)
+        group.add(lag, task)
+
+        frame = stack[-1]
+        self.log.warning('Event loop was blocked for %.3fs at %s:%d (%s)', lag, frame.filename, frame.lineno, frame.name)
+
+    def _watch(self):
+        sampled_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._last_beat
+            # The heartbeat is expected to be an interval late
+            if beat == sampled_beat or time.perf_counter() - beat < self.threshold + self.interval:
+                continue
+
+            # Only the first sample of a stall, it's already stuck where it's going to be stuck
+            sampled_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+
+            task = asyncio.current_task(self._loop)
+            stack = traceback.StackSummary.extract(traceback.walk_stack(frame), limit=STACK_DEPTH, lookup_lines=True)
+            stack.reverse()
+            self._sample = (stack, task.get_name() if task is not None else None)
+
+    def percentile(self, p: float) -> float:
+        """
+        :param p: Percentile (0-100)
+        :return: Lag percentile over the kept measurements, in seconds
+        """
+        if len(self.lags) == 0:
+            return 0.0
+        ordered = sorted(self.lags)
+        return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+    def report(self, limit: int = 5) -> str:
+        """
+        :param limit: Amount of stall groups to show
+        :return: A lag summary, and the stacks that blocked the loop for the longest total time
+        """
+        lines = [
+            f'Event loop lag over the last {len(self.lags)} ticks ({self.interval * 1000:.0f}ms apart): '
+            f'p50 {self.percentile(50) * 1000:.1f}ms, p99 {self.percentile(99) * 1000:.1f}ms, '
+            f'max {max(self.lags, default=0) * 1000:.1f}ms',
+            f'Stalls over {self.threshold * 1000:.0f}ms: {self.stalls} ({self.unattributed} without a stack sample)'
+        ]
+
+        groups = sorted(self.groups.values(), key=lambda group: group.total_lag, reverse=True)[:limit]
+        for i, group in enumerate(groups, 1):
+            tasks = ', '.join(sorted(group.tasks)) or 'no task'
+            lines.append('')
+            lines.append(f'#{i}: {group.count} stalls, {group.total_lag:.3f}s total, {group.max_lag:.3f}s max ({tasks})')
+            lines.extend(line.rstrip('\n') for line in group.stack.format())
+
+        return '\n'.join(lines)
+
+
+# Shared by the whole bot
+loop_watchdog = LoopWatchdog()
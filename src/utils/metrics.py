@@ -0,0 +1,213 @@
+import logging
+import os
+
+from aiohttp import web
+from discord.ext import commands
+
+from cogs import NOTIFICATOR_COG
+from log_utils import errlogging, loggers
+from utils.alert_history import history_cache
+from utils.host_info import host_info
+from utils.latency import LatencyHistogram, latency_tracker
+from utils.loop_watchdog import loop_watchdog
+from utils.subscriptions import channel_index
+
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = os.getenv('METRICS_PORT')  # Disabled if not set
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class RateLimitCounter(logging.Filter):
+    """
+    Counts the rate limits (429s) discord.py hits. discord.py retries them on its own,
+    and only reports them in its logs, so they are counted by filtering discord.http's log records.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING and 'rate limit' in str(record.msg):
+            self.count += 1
+        return True
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsWriter:
+    """
+    Builds a metrics page in Prometheus' text exposition format
+    """
+
+    def __init__(self):
+        self.lines: list[str] = []
+
+    def metric(self, name: str, kind: str, help_text: str, samples: list[tuple[dict, float]] | float | None):
+        """
+        Add a metric
+        :param name: Metric name
+        :param kind: Metric type ('counter', 'gauge', 'summary' or 'histogram')
+        :param help_text: Metric description
+        :param samples: The metric's value, or a list of (labels, value) samples. Nothing is added if None.
+        """
+        if samples is None:
+            return
+        if not isinstance(samples, list):
+            samples = [({}, samples)]
+
+        self.lines.append(f'# HELP {name} {help_text}')
+        self.lines.append(f'# TYPE {name} {kind}')
+        for labels, value in samples:
+            self.sample(name, labels, value)
+
+    def sample(self, name: str, labels: dict, value: float):
+        if len(labels) > 0:
+            label_str = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            self.lines.append(f'{name}{{{label_str}}} {value}')
+        else:
+            self.lines.append(f'{name} {value}')
+
+    def histogram(self, name: str, help_text: str, histograms: list[tuple[dict, LatencyHistogram]]):
+        self.lines.append(f'# HELP {name} {help_text}')
+        self.lines.append(f'# TYPE {name} histogram')
+        for labels, histogram in histograms:
+            cumulative = 0
+            for bound, count in zip((*histogram.bounds, '+Inf'), histogram.counts):
+                cumulative += count
+                self.sample(f'{name}_bucket', {**labels, 'le': bound}, cumulative)
+            self.sample(f'{name}_sum', labels, histogram.total)
+            self.sample(f'{name}_count', labels, histogram.count)
+
+    def render(self) -> str:
+        return '\n'.join(self.lines) + '\n'
+
+
+class MetricsServer:
+    """
+    A local HTTP endpoint serving the bot's metrics (GET /metrics), in Prometheus' text format.
+
+    It runs on the bot's own event loop, and only reads counters that are already kept in memory,
+    so a scrape never blocks on I/O.
+    Metrics of the notificator cog are read from its current instance, so they survive cog reloads.
+    """
+
+    def __init__(self, bot: commands.Bot, host: str = METRICS_HOST, port: int | None = None):
+        """
+        :param bot: The bot to report on
+        :param host: Address to listen on (localhost by default)
+        :param port: Port to listen on (METRICS_PORT by default)
+        """
+        self.bot = bot
+        self.host = host
+        self.port = port if port is not None else int(METRICS_PORT)
+        self.log = loggers.get_logger('MetricsServer')
+
+        self.rate_limits = RateLimitCounter()
+        self._runner: web.AppRunner | None = None
+
+    async def start(self):
+        """
+        Start serving. Does nothing if already started.
+        """
+        if self._runner is not None:
+            return
+
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+        logging.getLogger('discord.http').addFilter(self.rate_limits)
+        self.log.info('Serving metrics on http://%s:%d/metrics', self.host, self.port)
+
+    async def stop(self):
+        if self._runner is None:
+            return
+
+        logging.getLogger('discord.http').removeFilter(self.rate_limits)
+        await self._runner.cleanup()
+        self._runner = None
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.render().encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+
+    def render(self) -> str:
+        writer = MetricsWriter()
+        notificator = self.bot.get_cog(NOTIFICATOR_COG)
+
+        if notificator is not None:
+            poll_stats = notificator.alert_reqs.poll_stats
+            writer.metric('hfc_polls_total', 'counter', 'Successful alerts.json polls', poll_stats.polls)
+            writer.metric('hfc_polls_not_modified_total', 'counter', 'Polls answered with 304 Not Modified',
+                          poll_stats.not_modified)
+            writer.metric('hfc_polls_unchanged_total', 'counter', "Polls whose body matched the previous poll's body",
+                          poll_stats.unchanged)
+            writer.metric('hfc_poll_errors_total', 'counter', "Polls that failed to reach HFC's servers", poll_stats.errors)
+            writer.metric('hfc_poll_short_circuit_ratio', 'gauge', 'Share of polls skipped without parsing',
+                          poll_stats.short_circuited / poll_stats.polls if poll_stats.polls > 0 else 0)
+            writer.histogram('hfc_poll_latency_seconds', 'Latency of successful polls', [({}, poll_stats.latency)])
+
+            writer.metric('hfc_loop_delta_seconds', 'gauge', 'Time between the last two alert polling loop runs',
+                          notificator.last_loop_delta)
+            writer.metric('hfc_district_cooldowns', 'gauge', 'Districts on cooldown', len(notificator.district_cooldowns))
+
+            dispatcher = notificator.dispatcher
+            writer.metric('hfc_dispatch_queue_depth', 'gauge', 'Channel deliveries waiting for a worker',
+                          dispatcher.queue_depth)
+            writer.metric('hfc_messages_sent_total', 'counter', 'Alert messages sent', dispatcher.stats.sent)
+            writer.metric('hfc_messages_failed_total', 'counter', 'Alert messages that failed to send',
+                          dispatcher.stats.failed)
+            writer.metric('hfc_messages_rate_limited_total', 'counter', 'Alert messages that failed with 429',
+                          dispatcher.stats.rate_limited)
+            writer.metric('hfc_dispatch_job_errors_total', 'counter', 'Deliveries that raised', dispatcher.stats.job_errors)
+
+            query_stats = sorted(notificator.db.query_stats.items())
+            writer.metric('hfc_db_queries_total', 'counter', 'DB calls, by method',
+                          [({'method': method}, stats.count) for method, stats in query_stats])
+            writer.metric('hfc_db_query_errors_total', 'counter', 'DB calls that raised, by method',
+                          [({'method': method}, stats.errors) for method, stats in query_stats])
+            writer.metric('hfc_db_query_seconds_total', 'counter', 'Total DB call time, by method',
+                          [({'method': method}, stats.total) for method, stats in query_stats])
+            writer.metric('hfc_district_catalog_districts', 'gauge', 'Districts in the in-memory district catalog',
+                          len(notificator.db.catalog))
+
+        writer.metric('hfc_discord_rate_limits_total', 'counter', 'Rate limits hit by discord.py (retried on its own)',
+                      self.rate_limits.count)
+
+        writer.metric('hfc_alerts_processed_total', 'counter', 'Alerts fully delivered', latency_tracker.alerts)
+        writer.histogram('hfc_alert_latency_seconds', 'Alert delivery latencies, by stage, category and channel type',
+                         [({'stage': metric, 'cat': cat, 'kind': kind}, histogram)
+                          for (metric, cat, kind), histogram in sorted(latency_tracker.histograms.items())])
+
+        requests = history_cache.hits + history_cache.refreshes
+        writer.metric('hfc_history_cache_hits_total', 'counter', 'Alert history requests served from the cache',
+                      history_cache.hits)
+        writer.metric('hfc_history_cache_refreshes_total', 'counter', 'Alert history downloads', history_cache.refreshes)
+        writer.metric('hfc_history_cache_hit_ratio', 'gauge', 'Share of alert history requests served from the cache',
+                      history_cache.hits / requests if requests > 0 else 0)
+
+        writer.metric('hfc_channels', 'gauge', 'Registered channels', len(channel_index))
+
+        if loop_watchdog.running:
+            writer.metric('hfc_event_loop_lag_seconds', 'summary', 'Event loop scheduling lag', [
+                ({'quantile': quantile}, loop_watchdog.percentile(quantile * 100)) for quantile in (0.5, 0.99)
+            ])
+            writer.metric('hfc_event_loop_stalls_total', 'counter', 'Event loop stalls over the lag threshold',
+                          loop_watchdog.stalls)
+
+        err_logger = errlogging.err_logger
+        writer.metric('hfc_errors_total', 'counter', 'Logged errors', err_logger.written + err_logger.suppressed)
+
+        sample = host_info.latest
+        if sample is not None:
+            writer.metric('hfc_host_cpu_percent', 'gauge', 'System-wide CPU usage', sample.cpu_percent)
+            writer.metric('hfc_host_ram_used_bytes', 'gauge', 'Used RAM', sample.ram_used)
+            writer.metric('hfc_process_rss_bytes', 'gauge', "The bot process' resident memory", sample.process_rss)
+
+        return writer.render()
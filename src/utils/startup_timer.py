@@ -0,0 +1,70 @@
+import contextlib
+import time
+from typing import Iterator
+
+
+class StartupTimer:
+    """
+    Measures the bot's startup, from process start until the first alert poll.
+
+    Phases are marked by their time since the timer was created (on import of main.py),
+    and timed steps (like loading a single cog) also keep their own duration,
+    as they may run concurrently.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks: dict[str, float] = {}
+        self.durations: dict[str, float] = {}
+        self.finished = False
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def mark(self, phase: str):
+        """
+        Mark a phase as done. Phases marked after the startup is finished (e.g. on reconnects) are ignored.
+        """
+        if not self.finished:
+            self.marks.setdefault(phase, self.elapsed())
+
+    @contextlib.contextmanager
+    def timed(self, step: str) -> Iterator[None]:
+        """
+        Time a single step, and mark it as done once it's over
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if not self.finished:
+                self.durations.setdefault(step, time.perf_counter() - start)
+            self.mark(step)
+
+    def finish(self, phase: str) -> bool:
+        """
+        Mark the last phase, and end the startup
+        :return: Whether the startup has just finished (False if it was already finished before)
+        """
+        if self.finished:
+            return False
+
+        self.mark(phase)
+        self.finished = True
+        return True
+
+    def report(self) -> str:
+        """
+        :return: A per-phase breakdown of the startup
+        """
+        lines = [f'Startup took {max(self.marks.values(), default=0):.3f}s:']
+        prev = 0.0
+        for phase, at in sorted(self.marks.items(), key=lambda item: item[1]):
+            step = f' (took {self.durations[phase]:.3f}s)' if phase in self.durations else ''
+            lines.append(f'  {phase:<32} +{at:.3f}s, {at - prev:.3f}s after the previous phase{step}')
+            prev = at
+        return '\n'.join(lines)
+
+
+# Created on the first import, which main.py does before anything else
+startup_timer = StartupTimer()
@@ -0,0 +1,138 @@
+from typing import Iterable
+
+from db_access import Channel
+
+
+class SubscriptionIndex:
+    """
+    An in-memory routing index of all registered channels by their subscribed districts.
+
+    Channels without a locations filter receive alerts from all districts, and are kept in a separate set.
+
+    :var channels: All registered channels, by channel ID
+    :var by_district: Sets of IDs of the channels subscribed to each district, by district ID
+    :var all_districts: IDs of channels receiving alerts from all districts
+    """
+
+    def __init__(self):
+        self.channels: dict[int, Channel] = {}
+        self.by_district: dict[int, set[int]] = {}
+        self.all_districts: set[int] = set()
+
+    def __len__(self):
+        return len(self.channels)
+
+    def __contains__(self, channel_id: int) -> bool:
+        return channel_id in self.channels
+
+    def load(self, channel_tups: Iterable[tuple]):
+        """
+        (Re)build the index from DB channel records
+        :param channel_tups: Channel tuples, as returned by DBAccess.get_all_channels()
+        """
+        self.channels.clear()
+        self.by_district.clear()
+        self.all_districts.clear()
+
+        for channel_tup in channel_tups:
+            self.add_channel(Channel.from_tuple(channel_tup))
+
+    def add_channel(self, channel: Channel):
+        """
+        Add a newly registered channel to the index
+        """
+        if channel.id in self.channels:
+            self.remove_channel(channel.id)
+
+        self.channels[channel.id] = channel
+
+        if len(channel.locations) == 0:
+            self.all_districts.add(channel.id)
+            return
+
+        for district_id in channel.locations:
+            self.by_district.setdefault(district_id, set()).add(channel.id)
+
+    def remove_channel(self, channel_id: int):
+        """
+        Remove an unregistered channel from the index
+        """
+        channel = self.channels.pop(channel_id, None)
+        if channel is None:
+            return
+
+        self.all_districts.discard(channel_id)
+        self._unlink(channel_id, channel.locations)
+
+    def add_locations(self, channel_id: int, district_ids: Iterable[int]):
+        """
+        Subscribe a channel to more districts
+        """
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            return
+
+        added = [district_id for district_id in dict.fromkeys(district_ids) if district_id not in channel.locations]
+        if len(added) == 0:
+            return
+
+        channel.locations = channel.locations + tuple(added)
+        self.all_districts.discard(channel_id)
+        for district_id in added:
+            self.by_district.setdefault(district_id, set()).add(channel_id)
+
+    def remove_locations(self, channel_id: int, district_ids: Iterable[int]):
+        """
+        Unsubscribe a channel from some districts.
+        A channel that is left with no districts will receive alerts from all districts.
+        """
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            return
+
+        removed = set(district_ids)
+        channel.locations = tuple(district_id for district_id in channel.locations if district_id not in removed)
+        self._unlink(channel_id, removed)
+
+        if len(channel.locations) == 0:
+            self.all_districts.add(channel_id)
+
+    def clear_locations(self, channel_id: int):
+        """
+        Clear a channel's districts, so it receives alerts from all districts
+        """
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            return
+
+        self.remove_locations(channel_id, channel.locations)
+
+    def match(self, district_ids: Iterable[int]) -> dict[int, list[int] | None]:
+        """
+        Get all channels that should receive an alert for the given districts
+
+        :param district_ids: IDs of the alert's districts
+        :return: A dict of matched channel IDs.
+        Each value is either a list of the matched district IDs (in alert order), or None for channels receiving all districts
+        """
+        matches: dict[int, list[int] | None] = dict.fromkeys(self.all_districts)
+
+        for district_id in district_ids:
+            for channel_id in self.by_district.get(district_id, ()):
+                matches.setdefault(channel_id, []).append(district_id)
+
+        return matches
+
+    def _unlink(self, channel_id: int, district_ids: Iterable[int]):
+        for district_id in district_ids:
+            subscribers = self.by_district.get(district_id)
+            if subscribers is None:
+                continue
+
+            subscribers.discard(channel_id)
+            if len(subscribers) == 0:
+                del self.by_district[district_id]
+
+
+# The index is shared by all cogs, and is kept up to date by COG_Commands
+channel_index = SubscriptionIndex()
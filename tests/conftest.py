@@ -0,0 +1,24 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The bot runs from src, and imports its modules relative to it
+sys.path.insert(0, str(Path(__file__).parent.parent.joinpath('src')))
+
+# Read by the cog modules on import
+os.environ.setdefault('AUTHOR_ID', '0')
+
+from log_utils import loggers
+
+
+@pytest.fixture(scope='session', autouse=True)
+def log_dir(tmp_path_factory) -> Path:
+    """
+    Log through the bot's logging pipeline, to a temporary log directory instead of botdata/logs
+    """
+    path = tmp_path_factory.mktemp('logs')
+    loggers.pipeline.start(log_dir=path)
+    yield path
+    loggers.pipeline.stop()
@@ -0,0 +1,159 @@
+import asyncio
+import time
+
+import pytest
+
+from cogs import cog_commands
+from cogs.cog_commands import COG_Commands
+from utils import alert_archive
+from utils.alert_archive import COMPACT_SLACK, AlertArchive, ArchivedAlert
+from utils.alert_maker import MESSAGE_CONTENT_LIMIT
+
+# A day ago, well within the retention period
+T = time.time() - 86400
+
+
+def make_alert(alert_id: int) -> dict:
+    return {'id': alert_id, 'cat': 1, 'title': 'ירי רקטות וטילים'}
+
+
+def test_query_by_time_and_district(tmp_path):
+    archive = AlertArchive(tmp_path.joinpath('alert_archive.jsonl'))
+
+    async def fill():
+        await archive.record(make_alert(1), ['תל אביב', 'חולון'], received=T + 1000)
+        await archive.record(make_alert(2), ['חיפה'], received=T + 2000)
+        await archive.record(make_alert(3), ['חולון', 'חיפה'], received=T + 3000)
+
+    asyncio.run(fill())
+
+    assert [record.alert_id for record in archive.query(T + 1500, T + 3000)] == [3, 2]
+    assert [(record.alert_id, record.districts) for record in archive.query(T, T + 3000, ['חולון', 'אילת'])] == [
+        (3, ('חולון',)), (1, ('חולון',))]
+
+
+def test_load_keeps_recorded_alerts_after_archived_ones(tmp_path):
+    path = tmp_path.joinpath('alert_archive.jsonl')
+    path.write_text(ArchivedAlert(T + 1000, 1, 1, 'a', ('חיפה',)).to_json() + '\nnot json\n', encoding='utf-8')
+    archive = AlertArchive(path)
+
+    async def record_then_load():
+        await archive.record(make_alert(2), ['חיפה'], received=T + 2000)
+        await archive.load()
+
+    asyncio.run(record_then_load())
+
+    assert archive.loaded
+    assert [record.alert_id for record in archive.records] == [1, 2]
+    assert archive.by_district == {'חיפה': [0, 1]}
+
+
+def test_alerts_recorded_while_loading_are_kept_once(tmp_path):
+    path = tmp_path.joinpath('alert_archive.jsonl')
+    path.write_text(ArchivedAlert(T + 1000, 1, 1, 'a', ('חיפה',)).to_json() + '\n', encoding='utf-8')
+    archive = AlertArchive(path)
+
+    async def record_while_loading():
+        await asyncio.gather(archive.load(), *(archive.record(make_alert(i), ['חיפה'], received=T + 2000 + i)
+                                               for i in range(2, 5)))
+
+    asyncio.run(record_while_loading())
+
+    assert [record.alert_id for record in archive.records] == [1, 2, 3, 4]
+    assert len(path.read_text(encoding='utf-8').splitlines()) == 4
+
+
+def test_failed_load_is_retried(tmp_path, monkeypatch):
+    archive = AlertArchive(tmp_path.joinpath('alert_archive.jsonl'))
+    read_file = archive._read_file
+    calls = []
+
+    def failing_read_file(cutoff: float):
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError('disk on fire')
+        return read_file(cutoff)
+
+    monkeypatch.setattr(archive, '_read_file', failing_read_file)
+
+    async def load_twice():
+        with pytest.raises(OSError):
+            await archive.load()
+        assert not archive.loaded
+        await archive.load()
+        # Loaded only once it succeeded
+        await archive.load()
+
+    asyncio.run(load_twice())
+
+    assert archive.loaded
+    assert len(calls) == 2
+
+
+def test_load_drops_expired_alerts(tmp_path):
+    path = tmp_path.joinpath('alert_archive.jsonl')
+    now = time.time()
+    path.write_text(''.join(ArchivedAlert(timestamp, i, 1, 'a', ('חיפה',)).to_json() + '\n'
+                            for i, timestamp in enumerate((now - 3 * 86400, now - 2 * 86400, now - 3600))), encoding='utf-8')
+    archive = AlertArchive(path, retention_days=1)
+
+    asyncio.run(archive.load())
+
+    assert [record.alert_id for record in archive.records] == [2]
+    assert archive.by_district == {'חיפה': [0]}
+    # The file is rewritten without them
+    assert [ArchivedAlert.from_json(line).alert_id for line in path.read_text(encoding='utf-8').splitlines()] == [2]
+
+
+def test_record_compacts_expired_alerts(tmp_path, monkeypatch):
+    path = tmp_path.joinpath('alert_archive.jsonl')
+    archive = AlertArchive(path, retention_days=1)
+    now = time.time()
+
+    async def record_until_expired():
+        await archive.load()
+        # Past the retention period, but not past the slack yet
+        await archive.record(make_alert(1), ['חיפה'], received=now - 86400 - COMPACT_SLACK / 2)
+        await archive.record(make_alert(2), ['עכו'], received=now - 3600)
+        assert len(archive) == 2
+
+        monkeypatch.setattr(alert_archive.time, 'time', lambda: now + COMPACT_SLACK / 2 + 60)
+        await archive.record(make_alert(3), ['חיפה', 'עכו'])
+
+    asyncio.run(record_until_expired())
+
+    assert [record.alert_id for record in archive.records] == [2, 3]
+    assert archive.by_district == {'עכו': [0, 1], 'חיפה': [1]}
+    assert [ArchivedAlert.from_json(line).alert_id for line in path.read_text(encoding='utf-8').splitlines()] == [2, 3]
+
+
+def test_paginate_entries():
+    entries = ['a' * 10, 'b' * 10, 'c' * 30, 'd' * 5, 'e' * 5, 'f' * 5]
+
+    assert COG_Commands.paginate_entries(entries, 3, 25) == [
+        ['a' * 10, 'b' * 10], ['c' * 30], ['d' * 5, 'e' * 5, 'f' * 5]]
+    assert COG_Commands.paginate_entries([], 3, 25) == []
+
+
+def test_archive_pages_fit_in_a_message(tmp_path, monkeypatch):
+    archive = AlertArchive(tmp_path.joinpath('alert_archive.jsonl'))
+    monkeypatch.setattr(cog_commands, 'alert_archive', archive)
+    cog = COG_Commands.__new__(COG_Commands)
+    now = time.time()
+    districts = [f'יישוב עם שם ארוך במיוחד {i}' for i in range(30)]
+
+    async def pages() -> list[str]:
+        await archive.load()
+        for i in range(60):
+            await archive.record(make_alert(i), districts[:i % 30 + 1], received=now - 3600 + i)
+
+        first = await cog.get_archive_page(7200, 0, 10, None, None)
+        max_page = int(first.split('\n', 2)[1].split('/')[1])
+        return [await cog.get_archive_page(7200, page_number, 10, None, None) for page_number in range(max_page)]
+
+    rendered = asyncio.run(pages())
+
+    assert len(rendered) > 6
+    assert all(len(page) < MESSAGE_CONTENT_LIMIT for page in rendered)
+    # Every alert is on exactly one page, newest first
+    assert sum(page.count('התראה ב') for page in rendered) == 60
@@ -0,0 +1,104 @@
+import asyncio
+import datetime
+
+import pytest
+
+from cogs.cog_commands import COG_Commands
+from utils.alert_history import AlertHistoryCache, HistoryStore
+
+
+def make_entries(ages: list[int]) -> list[dict]:
+    """
+    :param ages: Entry ages, in seconds back from now
+    """
+    now = datetime.datetime.now().replace(microsecond=0)
+    return [{'alertDate': (now - datetime.timedelta(seconds=age)).isoformat(),
+             'title': f'התראה {age}',
+             'data': f'מקום {age}'} for age in ages]
+
+
+def ages_of(records) -> list[int]:
+    return [int(record.title.split()[-1]) for record in records]
+
+
+def test_records_are_parsed_and_sorted():
+    entries = make_entries([30, 10, 20])
+    entries.append({'title': 'no date'})
+    entries.append({'alertDate': 'not a date'})
+
+    store = HistoryStore(entries)
+
+    assert len(store) == 3
+    assert ages_of(store.records) == [30, 20, 10]
+    assert store.timestamps == sorted(store.timestamps)
+
+
+def test_count_since():
+    store = HistoryStore(make_entries([100, 200, 300, 400]))
+    cutoff = store.records[2].timestamp
+
+    assert store.count_since(cutoff) == 2
+    assert store.count_since(0) == 4
+    assert store.count_since(store.timestamps[-1] + 1) == 0
+
+
+def test_page_is_newest_first_within_window():
+    # Each entry 100 seconds older than the previous one
+    store = HistoryStore(make_entries([i * 100 for i in range(1, 26)]))
+
+    records, max_page = store.page(1050, 0, 4)
+    assert ages_of(records) == [100, 200, 300, 400]
+    assert max_page == 3
+
+    records, _ = store.page(1050, 2, 4)
+    assert ages_of(records) == [900, 1000]
+
+
+def test_page_covers_window_exactly_once():
+    store = HistoryStore(make_entries(list(range(60, 6000, 60))))
+
+    _, max_page = store.page(2970, 0, 7)
+    pages = [store.page(2970, page_number, 7)[0] for page_number in range(max_page)]
+
+    ages = [age for page in pages for age in ages_of(page)]
+    assert ages == list(range(60, 3000, 60))
+
+
+@pytest.mark.parametrize('window, page_number, message', [
+    (0, 0, "Time can't be lower than 1."),
+    (10, 0, 'No results found.'),
+    (1000, 5, 'Page number is too high.'),
+    (1000, -1, 'Page number is too low.'),
+])
+def test_page_errors(window: int, page_number: int, message: str):
+    store = HistoryStore(make_entries([100, 200, 300]))
+
+    with pytest.raises(ValueError, match=message):
+        store.page(window, page_number, 2)
+
+
+def test_render_page_is_memoized():
+    store = HistoryStore(make_entries([100, 200, 300]))
+    calls = []
+
+    def render(records, page_number, max_page) -> str:
+        calls.append(page_number)
+        return f'{page_number + 1}/{max_page}: {ages_of(records)}'
+
+    assert store.render_page(1000, 0, 2, render) == '1/2: [100, 200]'
+    assert store.render_page(1000, 0, 2, render) == '1/2: [100, 200]'
+    assert store.render_page(1000, 1, 2, render) == '2/2: [300]'
+    assert calls == [0, 1]
+
+
+def test_commands_cog_unload_closes_history_session():
+    cog = COG_Commands.__new__(COG_Commands)
+    cog.history_cache = AlertHistoryCache()
+
+    async def open_then_unload():
+        session = await cog.history_cache.alert_reqs.get_session()
+        await cog.cog_unload()
+        return session
+
+    assert asyncio.run(open_then_unload()).closed
+    assert cog.history_cache.alert_reqs._session is None
@@ -0,0 +1,115 @@
+import discord
+
+from db_access import Area, AreaDistrict
+from utils.alert_maker import (Alert, AlertEmbedFactory, DISTRICTS_EMBED_TITLE, EMBED_DESCRIPTION_LIMIT,
+                               MESSAGE_CONTENT_LIMIT, MESSAGE_EMBEDS_CHARS_LIMIT, MESSAGE_EMBEDS_LIMIT)
+
+AREA = Area(1, 'גוש דן')
+
+
+def make_alert(cat: int = 1) -> Alert:
+    return Alert(1, cat, 'ירי רקטות וטילים', [], 'היכנסו למרחב המוגן')
+
+
+def make_districts(count: int, name_len: int = 12) -> list[AreaDistrict]:
+    return [AreaDistrict(i, f'{i:05d}'.ljust(name_len, 'א'), 1, 90, AREA) for i in range(count)]
+
+
+def make_embed(desc: str) -> discord.Embed:
+    return discord.Embed(title='כותרת', description=desc)
+
+
+def check_limits(alert: Alert, messages):
+    for message in messages:
+        assert len(message.embeds) <= MESSAGE_EMBEDS_LIMIT
+        assert sum(len(embed) for embed in message.embeds) <= MESSAGE_EMBEDS_CHARS_LIMIT
+        assert all(len(embed.description or '') < EMBED_DESCRIPTION_LIMIT for embed in message.embeds)
+        assert len(f'**{alert.title}** | ' + ', '.join(message.districts)) < MESSAGE_CONTENT_LIMIT
+
+
+def test_pack_districts_keeps_every_district_in_order():
+    alert = make_alert()
+    districts = make_districts(2000)
+
+    packed = AlertEmbedFactory.pack_districts(alert, districts)
+
+    assert len(packed) > 1
+    names = [name for message in packed for dists, _ in message for name in dists]
+    assert names == [district.name for district in districts]
+    for message in packed:
+        for dists, desc in message:
+            assert desc == ''.join(AlertEmbedFactory._format_missiles(d) + '\n' for d in districts
+                                   if d.name in set(dists))
+
+
+def test_pack_districts_small_alert_is_a_single_embed():
+    alert = make_alert()
+    packed = AlertEmbedFactory.pack_districts(alert, make_districts(5))
+
+    assert len(packed) == 1
+    assert len(packed[0]) == 1
+    assert len(packed[0][0][0]) == 5
+
+
+def test_pack_districts_formats_by_category():
+    district = make_districts(1)[0]
+
+    (((_, missiles_desc),),) = AlertEmbedFactory.pack_districts(make_alert(1), [district])
+    (((_, generic_desc),),) = AlertEmbedFactory.pack_districts(make_alert(13), [district])
+
+    assert 'זמן מיגון: 90 שניות' in missiles_desc
+    assert generic_desc == f'**{district.name}**\n'
+
+
+def test_pack_districts_respects_reserved_space():
+    alert = make_alert()
+    districts = make_districts(300, name_len=40)
+
+    packed = AlertEmbedFactory.pack_districts(alert, districts, reserved_chars=5000, reserved_embeds=9)
+
+    first_message = packed[0]
+    assert len(first_message) == 1
+    first_chars = sum(len(desc) + len(DISTRICTS_EMBED_TITLE) for _, desc in first_message)
+    assert 5000 + first_chars <= MESSAGE_EMBEDS_CHARS_LIMIT
+
+
+def test_make_districts_messages_within_discord_limits():
+    alert = make_alert()
+    start_embed = make_embed('התחלה' * 200)
+    end_embed = make_embed('סוף' * 100)
+
+    for count, name_len in ((1, 12), (40, 12), (400, 12), (2000, 12), (1500, 60)):
+        districts = make_districts(count, name_len)
+        messages = AlertEmbedFactory.make_districts_messages(alert, districts, start_embed, end_embed)
+
+        check_limits(alert, messages)
+        assert messages[0].embeds[0] is start_embed
+        assert [name for message in messages for name in message.districts] == [d.name for d in districts]
+
+
+def test_make_districts_messages_content_limit_splits_messages():
+    alert = make_alert(13)
+    # Short lines, so the districts content hits its limit long before the embed limits do
+    districts = make_districts(1000, name_len=30)
+
+    messages = AlertEmbedFactory.make_districts_messages(alert, districts)
+
+    assert len(messages) > 1
+    check_limits(alert, messages)
+
+
+def test_make_districts_messages_end_embed_only_with_multiple_embeds():
+    alert = make_alert()
+    end_embed = make_embed('סוף')
+
+    single = AlertEmbedFactory.make_districts_messages(alert, make_districts(3), end_embed=end_embed)
+    assert len(single) == 1
+    assert end_embed not in single[0].embeds
+
+    many = AlertEmbedFactory.make_districts_messages(alert, make_districts(1500, 60), end_embed=end_embed)
+    assert many[-1].embeds[-1] is end_embed
+    check_limits(alert, many)
+
+
+def test_make_districts_messages_no_districts():
+    assert AlertEmbedFactory.make_districts_messages(make_alert(), []) == []
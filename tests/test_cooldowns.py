@@ -0,0 +1,97 @@
+from utils.cooldowns import DistrictCooldowns
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_cooldowns(duration: float = 60) -> tuple[DistrictCooldowns, FakeClock]:
+    clock = FakeClock()
+    return DistrictCooldowns(duration, clock), clock
+
+
+def test_touch_starts_cooldown():
+    cooldowns, clock = make_cooldowns()
+
+    assert cooldowns.touch('תל אביב', 1) is True
+    assert ('תל אביב', 1) in cooldowns
+    assert ('תל אביב', 2) not in cooldowns
+    assert len(cooldowns) == 1
+
+
+def test_touch_during_cooldown_extends_it():
+    cooldowns, clock = make_cooldowns()
+    cooldowns.touch('חיפה', 1)
+
+    clock.now += 30
+    assert cooldowns.touch('חיפה', 1) is False
+
+    # Past the first deadline, but not the extended one
+    clock.now += 40
+    assert ('חיפה', 1) in cooldowns
+    assert cooldowns.expire() == []
+
+    clock.now += 20
+    assert ('חיפה', 1) not in cooldowns
+    assert cooldowns.expire() == [('חיפה', 1)]
+    assert len(cooldowns) == 0
+
+
+def test_touch_after_cooldown_is_new():
+    cooldowns, clock = make_cooldowns()
+    cooldowns.touch('אשדוד', 1)
+
+    clock.now += 60
+    assert ('אשדוד', 1) not in cooldowns
+    assert cooldowns.touch('אשדוד', 1) is True
+
+
+def test_expire_removes_only_expired_in_deadline_order():
+    cooldowns, clock = make_cooldowns()
+    cooldowns.touch('a', 1)
+    clock.now += 10
+    cooldowns.touch('b', 1)
+    clock.now += 10
+    cooldowns.touch('c', 1)
+
+    clock.now += 55
+    assert cooldowns.expire() == [('a', 1), ('b', 1)]
+    assert len(cooldowns) == 1
+    assert ('c', 1) in cooldowns
+
+
+def test_refreshed_entries_keep_one_heap_entry():
+    cooldowns, clock = make_cooldowns()
+    for _ in range(100):
+        cooldowns.touch('a', 1)
+        clock.now += 1
+
+    assert len(cooldowns._heap) == 1
+
+    clock.now += 60
+    assert cooldowns.expire() == [('a', 1)]
+    assert len(cooldowns._heap) == 0
+
+
+def test_mixed_category_types():
+    cooldowns, clock = make_cooldowns()
+    # Same deadline, so the heap must never compare the keys themselves
+    cooldowns.touch('a', 1)
+    cooldowns.touch('a', '1')
+
+    clock.now += 60
+    assert sorted(cooldowns.expire(), key=str) == [('a', '1'), ('a', 1)]
+
+
+def test_clear():
+    cooldowns, clock = make_cooldowns()
+    cooldowns.touch('a', 1)
+    cooldowns.clear()
+
+    assert len(cooldowns) == 0
+    assert ('a', 1) not in cooldowns
+    assert cooldowns.expire() == []
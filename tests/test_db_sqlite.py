@@ -0,0 +1,68 @@
+import pytest
+
+import db_sqlite
+from db_access import Channel
+from db_sqlite import SQLiteDBAccess
+
+
+@pytest.fixture
+def db(tmp_path) -> SQLiteDBAccess:
+    connection = db_sqlite.connect(tmp_path.joinpath('hfc_db.sqlite3'))
+    db_sqlite.create_schema(connection)
+    connection.executescript("INSERT INTO areas VALUES (1, 'גוש דן');"
+                             "INSERT INTO districts VALUES (1, 'א', 1, 90), (2, 'ב', 1, 90), (3, 'ג', 1, 90),"
+                             "                             (5, 'ה', 1, 90), (7, 'ז', 1, 90);"
+                             "INSERT INTO channels VALUES (10, NULL, 'he'), (20, NULL, 'he');")
+    connection.commit()
+    yield SQLiteDBAccess(connection)
+    connection.close()
+
+
+def test_channel_districts_keep_insertion_order(db):
+    db.add_channel_districts(10, [5, 2, 3])
+    db.add_channel_districts(10, [7, 3, 1])
+
+    assert db.get_channel_district_ids(10) == [5, 2, 3, 7, 1]
+
+    db.remove_channel_districts(10, [2])
+    db.add_channel_districts(10, [2])
+    assert db.get_channel_district_ids(10) == [5, 3, 7, 1, 2]
+
+
+def test_add_channel_districts_rejects_invalid_ids_without_writing(db):
+    db.add_channel_districts(10, [5])
+
+    with pytest.raises(ValueError, match='Received invalid district IDs'):
+        db.add_channel_districts(10, [1, 99])
+    with pytest.raises(ValueError, match='Invalid District ID 98'):
+        db.add_channel_districts(10, [98])
+
+    assert db.get_channel_district_ids(10) == [5]
+
+
+def test_add_channel_districts_accepts_registered_and_duplicate_ids(db):
+    db.add_channel_districts(10, [1, 2])
+    db.add_channel_districts(10, [2, 3, 3, 1])
+
+    assert db.get_channel_district_ids(10) == [1, 2, 3]
+
+
+def test_channel_records_aggregate_locations_in_insertion_order(db):
+    db.add_channel_districts(10, [5, 2, 3])
+    db.add_channel_districts(20, [7, 1])
+    db.remove_channel_districts(20, [7])
+    db.add_channel_districts(20, [7])
+
+    assert db.get_channel(10).locations == (5, 2, 3)
+    assert [Channel.from_tuple(tup).locations for tup in db.get_all_channels()] == [(5, 2, 3), (1, 7)]
+
+    db.remove_channel_districts(20, [1, 7])
+    assert db.get_channel(20).locations == ()
+
+
+def test_match_channels(db):
+    db.add_channel_districts(10, [1, 2])
+
+    assert db.match_channels([2, 3, 1]) == {10: [2, 1], 20: None}
+    assert db.match_channels([]) == {20: None}
+
@@ -0,0 +1,158 @@
+import asyncio
+import time
+
+from utils.dispatcher import AlertDispatcher, DispatchJob, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket_bursts_then_refills():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+
+    assert bucket.full
+    assert [bucket.try_acquire() for _ in range(3)] == [0, 0, 0]
+    # Empty, a token is added every half a second
+    assert bucket.try_acquire() == 0.5
+
+    clock.now += 0.25
+    assert bucket.try_acquire() == 0.25
+    clock.now += 0.25
+    assert bucket.try_acquire() == 0
+
+    # Never refilled past its capacity
+    clock.now += 60
+    assert bucket.full
+    assert bucket.tokens == 3
+
+
+def test_throttle_takes_from_route_and_global_buckets():
+    dispatcher = AlertDispatcher(global_rate=10, route_rate=1, route_capacity=2)
+
+    async def throttle():
+        await dispatcher.throttle('a')
+        await dispatcher.throttle('a')
+        await dispatcher.throttle('b')
+        await dispatcher.throttle(None)
+
+    asyncio.run(throttle())
+
+    assert set(dispatcher.route_buckets) == {'a', 'b'}
+    assert dispatcher.route_buckets['a'].tokens < 1
+    assert 1 <= dispatcher.route_buckets['b'].tokens < 2
+    assert dispatcher.global_bucket.tokens < 7
+
+    # Only the idle route's bucket is dropped once it's full again
+    dispatcher.route_buckets['b'].tokens = 2
+    dispatcher.prune_routes()
+    assert set(dispatcher.route_buckets) == {'a'}
+
+
+def test_throttle_waits_for_an_empty_route():
+    dispatcher = AlertDispatcher(global_rate=1000, route_rate=20, route_capacity=1)
+
+    async def throttle_twice() -> float:
+        await dispatcher.throttle('a')
+        start = time.perf_counter()
+        await dispatcher.throttle('a')
+        return time.perf_counter() - start
+
+    # A token is added every 0.05 seconds
+    assert asyncio.run(throttle_twice()) >= 0.04
+
+
+def run_jobs(dispatcher: AlertDispatcher, jobs: list[tuple]) -> list:
+    """
+    Queue (fair_key, name, urgency) jobs, then start the dispatcher and wait for all of them
+    :return: Job names, in the order they ran
+    """
+    ran = []
+
+    def job(fair_key, name, urgency=()) -> DispatchJob:
+        async def run():
+            ran.append(name)
+        return DispatchJob(fair_key, name, run, urgency)
+
+    async def dispatch():
+        for args in jobs:
+            dispatcher.submit(job(*args))
+        dispatcher.start()
+        await dispatcher.join()
+        await dispatcher.stop()
+
+    asyncio.run(dispatch())
+    return ran
+
+
+def test_guilds_take_turns():
+    dispatcher = AlertDispatcher(workers=1)
+
+    ran = run_jobs(dispatcher, [('big', 'big 1'), ('big', 'big 2'), ('big', 'big 3'), ('small', 'small 1'),
+                                ('other', 'other 1'), ('small', 'small 2')])
+
+    assert ran == ['big 1', 'small 1', 'other 1', 'big 2', 'small 2', 'big 3']
+    assert dispatcher._pending_per_key == {}
+
+
+def test_urgency_first_then_guild_turns():
+    dispatcher = AlertDispatcher(workers=1, urgency_first=True)
+
+    ran = run_jobs(dispatcher, [('big', 'big 90', (90,)), ('big', 'big 15 a', (15,)), ('big', 'big 15 b', (15,)),
+                                ('small', 'small 90', (90,)), ('small', 'small 15', (15,))])
+
+    # Equally urgent jobs still take turns between guilds
+    assert ran == ['big 15 a', 'small 15', 'big 15 b', 'big 90', 'small 90']
+
+
+def test_failed_job_does_not_stop_its_worker():
+    dispatcher = AlertDispatcher(workers=1)
+    ran = []
+
+    async def fail():
+        raise ValueError('boom')
+
+    async def succeed():
+        ran.append('ok')
+
+    async def dispatch() -> bool:
+        dispatcher.start()
+        dispatcher.submit(DispatchJob('guild', 1, fail))
+        dispatcher.submit(DispatchJob('guild', 2, succeed))
+        await dispatcher.join()
+        running = dispatcher.running
+        await dispatcher.stop()
+        return running
+
+    assert asyncio.run(dispatch())
+    assert ran == ['ok']
+    assert dispatcher.stats.job_errors == 1
+    assert not dispatcher.running
+
+
+def test_stopped_dispatcher_keeps_queued_jobs():
+    dispatcher = AlertDispatcher(workers=1)
+    ran = []
+
+    async def run():
+        ran.append(1)
+
+    async def stop_then_restart() -> int:
+        dispatcher.start()
+        await dispatcher.stop()
+        dispatcher.submit(DispatchJob('guild', 1, run))
+        await asyncio.sleep(0)
+        depth = dispatcher.queue_depth
+
+        dispatcher.start()
+        await dispatcher.join()
+        await dispatcher.stop()
+        return depth
+
+    assert asyncio.run(stop_then_restart()) == 1
+    assert ran == [1]
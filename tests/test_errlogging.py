@@ -0,0 +1,147 @@
+import pytest
+
+from log_utils import errlogging
+from log_utils.errlogging import ErrLogger, fingerprint
+
+
+def raise_value_error(message: str):
+    raise ValueError(message)
+
+
+def raise_key_error(message: str):
+    raise KeyError(message)
+
+
+def catch(func, *args) -> BaseException:
+    try:
+        func(*args)
+    except Exception as e:
+        return e
+
+
+def catch_with_context(message: str) -> BaseException:
+    try:
+        try:
+            raise_key_error('inner')
+        except KeyError:
+            raise_value_error(message)
+    except ValueError as e:
+        return e
+
+
+def test_fingerprint_ignores_message():
+    assert fingerprint(catch(raise_value_error, 'channel 1')) == fingerprint(catch(raise_value_error, 'channel 2'))
+
+
+def test_fingerprint_depends_on_type_and_location():
+    value_error = fingerprint(catch(raise_value_error, 'x'))
+
+    assert value_error != fingerprint(catch(raise_key_error, 'x'))
+    # Same raising function, but a different traceback (and a context)
+    assert value_error != fingerprint(catch_with_context('x'))
+
+
+def test_fingerprint_includes_context():
+    assert fingerprint(catch_with_context('a')) == fingerprint(catch_with_context('b'))
+    assert fingerprint(catch_with_context('a')) != fingerprint(catch_with_context('a').__context__)
+
+
+@pytest.fixture
+def err_logger(monkeypatch) -> tuple[ErrLogger, list[str]]:
+    """
+    An ErrLogger whose entries are collected instead of written
+    """
+    logger = ErrLogger(rate_window=60)
+    written = []
+    monkeypatch.setattr(logger, '_write', written.append)
+    return logger, written
+
+
+def test_first_occurrence_is_written_in_full(err_logger):
+    logger, written = err_logger
+    err = catch(raise_value_error, 'boom')
+
+    logger._handle(err, 1000.0)
+
+    assert len(written) == 1
+    assert 'ValueError: boom' in written[0]
+    assert f'Fingerprint: {fingerprint(err)} (occurrence 1' in written[0]
+    assert logger.written == 1 and logger.suppressed == 0
+
+
+def test_repeats_within_window_are_only_counted(err_logger, monkeypatch):
+    logger, written = err_logger
+
+    for i in range(5):
+        logger._handle(catch(raise_value_error, f'boom {i}'), 1000.0 + i)
+
+    assert len(written) == 1
+    assert logger.suppressed == 4
+    (group,) = logger.groups.values()
+    assert group.count == 5 and group.suppressed == 4
+
+    # Window isn't over yet
+    monkeypatch.setattr(errlogging.time, 'time', lambda: 1030.0)
+    logger._flush_suppressed()
+    assert len(written) == 1
+
+    monkeypatch.setattr(errlogging.time, 'time', lambda: 1061.0)
+    logger._flush_suppressed()
+    assert len(written) == 2
+    assert 'Occurred 4 more times' in written[1]
+    assert '5 times in total' in written[1]
+    assert group.suppressed == 0
+
+    # Nothing left to flush
+    logger._flush_suppressed(force=True)
+    assert len(written) == 2
+
+
+def test_written_again_after_window(err_logger):
+    logger, written = err_logger
+
+    logger._handle(catch(raise_value_error, 'a'), 1000.0)
+    logger._handle(catch(raise_value_error, 'b'), 1061.0)
+
+    assert len(written) == 2
+    assert 'occurrence 2' in written[1]
+    assert logger.written == 2 and logger.suppressed == 0
+
+
+def test_different_errors_are_not_rate_limited_together(err_logger):
+    logger, written = err_logger
+
+    logger._handle(catch(raise_value_error, 'a'), 1000.0)
+    logger._handle(catch(raise_key_error, 'b'), 1001.0)
+
+    assert len(written) == 2
+    assert len(logger.groups) == 2
+
+
+def test_force_flush_writes_pending_counts(err_logger, monkeypatch):
+    logger, written = err_logger
+    logger._handle(catch(raise_value_error, 'a'), 1000.0)
+    logger._handle(catch(raise_value_error, 'b'), 1001.0)
+
+    monkeypatch.setattr(errlogging.time, 'time', lambda: 1002.0)
+    logger._flush_suppressed(force=True)
+
+    assert len(written) == 2
+    assert 'Occurred 1 more times' in written[1]
+
+
+def test_writer_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(errlogging, 'errlog_dir', tmp_path)
+    logger = ErrLogger(rate_window=60)
+
+    logger.new_errlog(None)
+    for i in range(3):
+        logger.new_errlog(catch(raise_value_error, f'boom {i}'))
+    # Writes everything that's queued, including the suppressed count
+    logger.stop()
+
+    content = tmp_path.joinpath(errlogging.ERRLOG_FILE).read_text(encoding='utf_8')
+    assert content.count('Error Info:') == 1
+    assert 'ValueError: boom 0' in content
+    assert 'Occurred 2 more times' in content
+    assert logger.written == 1 and logger.suppressed == 2
@@ -0,0 +1,78 @@
+import asyncio
+from typing import Callable
+
+from utils.handoff import StateHandoff
+
+
+def collect_released() -> tuple[list, Callable]:
+    """
+    :return: (the list released states are collected in, an on_expire callback collecting them)
+    """
+    released = []
+
+    async def on_expire(state):
+        released.append(state)
+
+    return released, on_expire
+
+
+def test_claimed_state_is_not_released():
+    handoff = StateHandoff(ttl=0.01)
+    released, on_expire = collect_released()
+
+    async def deposit_then_claim():
+        handoff.deposit('cog', {'session': 1}, on_expire=on_expire)
+        state = handoff.claim('cog')
+        # Past the TTL
+        await asyncio.sleep(0.05)
+        return state
+
+    assert asyncio.run(deposit_then_claim()) == {'session': 1}
+    assert 'cog' not in handoff
+    assert handoff.claim('cog') is None
+    assert released == []
+
+
+def test_unclaimed_state_is_released_after_ttl():
+    handoff = StateHandoff(ttl=0.01)
+    released, on_expire = collect_released()
+
+    async def deposit_and_wait():
+        handoff.deposit('cog', {'session': 1}, on_expire=on_expire)
+        assert 'cog' in handoff
+        await asyncio.sleep(0.05)
+
+    asyncio.run(deposit_and_wait())
+
+    assert released == [{'session': 1}]
+    assert 'cog' not in handoff
+    # Too late to claim it
+    assert handoff.claim('cog') is None
+
+
+def test_deposit_releases_the_previous_state():
+    handoff = StateHandoff(ttl=60)
+    released, on_expire = collect_released()
+
+    async def deposit_twice():
+        handoff.deposit('cog', 'old', on_expire=on_expire)
+        handoff.deposit('other', 'other', on_expire=on_expire)
+        handoff.deposit('cog', 'new', on_expire=on_expire)
+        # Let the release run
+        await asyncio.sleep(0)
+        return handoff.claim('cog'), handoff.claim('other')
+
+    assert asyncio.run(deposit_twice()) == ('new', 'other')
+    assert released == ['old']
+
+
+def test_state_without_on_expire_is_dropped():
+    handoff = StateHandoff(ttl=0.01)
+
+    async def deposit_and_wait():
+        handoff.deposit('cog', 'state')
+        await asyncio.sleep(0.05)
+
+    asyncio.run(deposit_and_wait())
+
+    assert 'cog' not in handoff
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import time
+
+from utils.latency import LatencyHistogram, LatencyTracker
+
+
+def test_histogram_buckets_and_percentiles():
+    histogram = LatencyHistogram(bounds=(0.1, 1), history=4)
+    for seconds in (5, 0.05, 0.1, 0.5, 0.5):
+        histogram.observe(seconds)
+
+    summary = histogram.to_dict()
+    # Bounds are inclusive, and the buckets count every observation
+    assert summary['buckets'] == {'0.1': 2, '1': 2, '+Inf': 1}
+    assert summary['count'] == 5
+    assert summary['sum'] == 6.15
+    # Percentiles only cover the last 4 observations
+    assert summary['p50'] == 0.5
+    assert summary['p99'] == 0.5
+    assert LatencyHistogram().percentile(50) == 0.0
+
+
+def test_timeline_is_aggregated_once_every_channel_is_done(tmp_path):
+    tracker = LatencyTracker(tmp_path.joinpath('alert_latency.json'))
+    # Received a second ago
+    timeline = tracker.begin({'id': 7, 'cat': 1}, time.perf_counter() - 1)
+
+    timeline.mark('dedup')
+    timeline.expect(2)
+    timeline.channel_started(10, 'guild')
+    timeline.sent(10)
+    timeline.sent(10)
+    timeline.channel_done(10, True)
+    timeline.channel_started(20, 'dm')
+    # Sent to a channel that was never started
+    timeline.sent(30)
+    assert not timeline.finished
+
+    timeline.channel_done(20, False)
+
+    assert timeline.finished and tracker.alerts == 1
+    assert timeline.stages['dedup'] >= 1
+    assert timeline.stages['first_send'] <= timeline.stages['last_send'] == timeline.channels[10].last_sent
+    assert set(tracker.histograms) == {
+        ('dedup', '1', 'all'), ('enqueue', '1', 'all'), ('first_send', '1', 'all'), ('last_send', '1', 'all'),
+        ('queued', '1', 'guild'), ('queued', '1', 'dm'), ('delivered', '1', 'guild')
+    }
+
+    # Saved right away, as there's no running loop
+    saved = json.loads(tmp_path.joinpath('alert_latency.json').read_text(encoding='utf-8'))
+    assert saved['alerts'] == 1
+    (recent,) = saved['recent']
+    assert recent['id'] == 7
+    assert recent['channels'] == {'guild': 1, 'dm': 1}
+    assert recent['failed'] == 1
+    assert list(recent['stages']) == ['dedup', 'enqueue', 'first_send', 'last_send']
+
+
+def test_timeline_without_channels_finishes_on_expect(tmp_path):
+    tracker = LatencyTracker(tmp_path.joinpath('alert_latency.json'))
+    timeline = tracker.begin({'id': 1, 'cat': 1})
+
+    timeline.expect(0)
+
+    assert timeline.finished
+    assert 'last_send' not in timeline.stages
+    assert tracker.alerts == 1
+
+
+def test_saves_in_the_loop_are_coalesced(tmp_path, monkeypatch):
+    tracker = LatencyTracker(tmp_path.joinpath('alert_latency.json'))
+    writes = []
+    write = tracker._write
+
+    def counting_write(content: str):
+        writes.append(json.loads(content)['alerts'])
+        write(content)
+
+    monkeypatch.setattr(tracker, '_write', counting_write)
+
+    async def finish_alerts():
+        for i in range(5):
+            tracker.begin({'id': i, 'cat': 1}).expect(0)
+        await tracker._save_task
+
+    asyncio.run(finish_alerts())
+
+    # A single save, written off the loop after all of them finished
+    assert writes == [5]
+    assert json.loads(tmp_path.joinpath('alert_latency.json').read_text(encoding='utf-8'))['alerts'] == 5
@@ -0,0 +1,18 @@
+import logging
+
+from log_utils import loggers
+
+
+def test_records_are_written_by_the_listener(log_dir):
+    loggers.get_logger('test_loggers').info('Logged %s', 'through the queue')
+    loggers.get_logger('test_loggers').debug('Below the file level')
+    # Stopping flushes whatever is still queued
+    loggers.pipeline.stop()
+    try:
+        content = log_dir.joinpath('LOG_ALL.log').read_text(encoding='utf-8')
+    finally:
+        loggers.pipeline.start(log_dir=log_dir)
+
+    assert 'INFO] test_loggers: Logged through the queue' in content
+    assert 'Below the file level' not in content
+    assert logging.getLogger().handlers.count(loggers.pipeline.queue_handler) == 1
@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+from utils.loop_watchdog import LoopWatchdog
+
+
+def block_loop(seconds: float):
+    time.sleep(seconds)
+
+
+def test_stall_is_grouped_by_blocking_stack():
+    watchdog = LoopWatchdog(interval=0.01, threshold=0.1)
+
+    async def blocking_task():
+        block_loop(0.3)
+
+    async def watch():
+        watchdog.start()
+        await asyncio.sleep(0.05)
+        await asyncio.create_task(blocking_task(), name='blocker')
+        await asyncio.sleep(0.05)
+        await watchdog.stop()
+
+    asyncio.run(watch())
+
+    assert not watchdog.running
+    (group,) = [group for group in watchdog.groups.values() if group.stack[-1].name == 'block_loop']
+    assert group.count == 1
+    assert group.tasks == {'blocker'}
+    assert group.max_lag >= 0.2
+    assert watchdog.percentile(100) == max(watchdog.lags) >= 0.2
+
+    # The longest stall is reported first
+    report = watchdog.report()
+    assert report.split('\n\n')[1].startswith('#1: 1 stalls')
+    assert 'in block_loop' in report
+
+
+def test_stall_without_sample_is_unattributed():
+    watchdog = LoopWatchdog()
+
+    watchdog._record_stall(0.5)
+
+    assert watchdog.stalls == 1 and watchdog.unattributed == 1
+    assert watchdog.groups == {}
+    assert 'Stalls over 250ms: 1 (1 without a stack sample)' in watchdog.report()
+
+
+def test_percentile():
+    watchdog = LoopWatchdog(history=100)
+
+    assert watchdog.percentile(99) == 0.0
+
+    # Only the last 100 lags are kept
+    watchdog.lags.extend(i / 1000 for i in range(200))
+    assert watchdog.percentile(0) == 0.1
+    assert watchdog.percentile(50) == 0.15
+    assert watchdog.percentile(99) == 0.199
+    assert watchdog.percentile(100) == 0.199
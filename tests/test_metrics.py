@@ -0,0 +1,113 @@
+import asyncio
+
+import discord
+from discord.ext import commands
+
+import db_access
+from cogs import COMMANDS_COG, NOTIFICATOR_COG
+from db_sqlite import SQLiteProvider
+from utils.district_source import district_source
+from utils.handoff import handoff
+from utils.host_info import host_info
+from utils.latency import LatencyHistogram
+from utils.metrics import MetricsServer, MetricsWriter
+
+
+def parse_samples(text: str) -> dict[str, float]:
+    """
+    :return: Samples of a metrics page, by their name and labels (as written)
+    """
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith('#') or line == '':
+            continue
+        name, value = line.rsplit(' ', 1)
+        samples[name] = float(value)
+    return samples
+
+
+def test_writer_metrics():
+    writer = MetricsWriter()
+    writer.metric('a_total', 'counter', 'A counter', 3)
+    writer.metric('b', 'gauge', 'A labeled gauge', [({'method': 'get "x"\n'}, 1.5)])
+    writer.metric('c', 'gauge', 'Not reported', None)
+
+    assert writer.render() == ('# HELP a_total A counter\n'
+                               '# TYPE a_total counter\n'
+                               'a_total 3\n'
+                               '# HELP b A labeled gauge\n'
+                               '# TYPE b gauge\n'
+                               'b{method="get \\"x\\"\\n"} 1.5\n')
+
+
+def test_writer_histogram_buckets_are_cumulative():
+    histogram = LatencyHistogram(bounds=(0.1, 1))
+    for seconds in (0.05, 0.5, 0.5, 5):
+        histogram.observe(seconds)
+
+    writer = MetricsWriter()
+    writer.histogram('lat_seconds', 'Latency', [({'stage': 'x'}, histogram)])
+    samples = parse_samples(writer.render())
+
+    assert samples['lat_seconds_bucket{stage="x",le="0.1"}'] == 1
+    assert samples['lat_seconds_bucket{stage="x",le="1"}'] == 3
+    assert samples['lat_seconds_bucket{stage="x",le="+Inf"}'] == 4
+    assert samples['lat_seconds_sum{stage="x"}'] == 6.05
+    assert samples['lat_seconds_count{stage="x"}'] == 4
+
+
+def test_render_without_cogs():
+    bot = commands.Bot('hfc/', intents=discord.Intents.none())
+    samples = parse_samples(MetricsServer(bot, port=0).render())
+
+    assert 'hfc_polls_total' not in samples
+    assert 'hfc_channels' in samples
+    assert 'hfc_errors_total' in samples
+
+
+async def render_with_cogs(db: db_access.AsyncDBAccess) -> tuple[str, list[str]]:
+    bot = commands.Bot('hfc/', intents=discord.Intents.none())
+    await bot.load_extension('cogs.cog_notificator')
+    await bot.load_extension('cogs.cog_commands')
+    try:
+        cog_names = list(bot.cogs)
+        await db.get_channel(10)
+        response = await MetricsServer(bot, port=0).handle_metrics(None)
+        return response.body.decode('utf-8'), cog_names
+    finally:
+        for name in list(bot.extensions):
+            await bot.unload_extension(name)
+        # Release what the notificator handed off for a reload that isn't coming
+        state = handoff.claim(NOTIFICATOR_COG)
+        if state is not None:
+            await state['dispatcher'].stop()
+            await state['alert_reqs'].close()
+        await district_source.stop()
+        await host_info.stop()
+
+
+def test_render_with_cogs(tmp_path, monkeypatch):
+    db = db_access.AsyncDBAccess(pool_size=1, backend='sqlite')
+    db.provider = SQLiteProvider(tmp_path.joinpath('hfc_db.sqlite3'), db.log)
+    with db.provider.borrow() as sqlite_db:
+        sqlite_db.connection.executescript("INSERT INTO areas VALUES (1, 'גוש דן');"
+                                           "INSERT INTO districts VALUES (10, 'תל אביב', 1, 90);"
+                                           "INSERT INTO channels VALUES (10, NULL, 'he');"
+                                           "INSERT INTO channel_districts (channel_id, district_id) VALUES (10, 10);")
+    monkeypatch.setattr(db_access, '_shared_db', db)
+
+    try:
+        text, cog_names = asyncio.run(render_with_cogs(db))
+    finally:
+        db.close()
+
+    assert NOTIFICATOR_COG in cog_names and COMMANDS_COG in cog_names
+
+    samples = parse_samples(text)
+    for name in ('hfc_polls_total', 'hfc_poll_errors_total', 'hfc_poll_latency_seconds_count', 'hfc_loop_delta_seconds',
+                 'hfc_district_cooldowns', 'hfc_dispatch_queue_depth', 'hfc_messages_sent_total'):
+        assert name in samples
+    assert samples['hfc_district_catalog_districts'] == 1
+    assert samples['hfc_channels'] == 1
+    assert samples['hfc_db_queries_total{method="get_all_channels"}'] == 1
+    assert samples['hfc_db_queries_total{method="get_channel"}'] == 1
@@ -0,0 +1,60 @@
+import asyncio
+import logging
+
+from cogs import cog_notificator
+from cogs.cog_notificator import COG_Notificator
+from utils.alert_archive import AlertArchive
+from utils.alert_reqs import AsyncAlertReqs
+from utils.cooldowns import DistrictCooldowns
+
+
+def make_cog(sent: list) -> COG_Notificator:
+    """
+    A notificator with only what handle_alert_data needs, sending nothing
+    """
+    cog = COG_Notificator.__new__(COG_Notificator)
+    cog.log = logging.getLogger('test_notificator')
+    cog.district_cooldowns = DistrictCooldowns(60)
+
+    async def send_new_alert(alert_data, new_districts, timeline=None):
+        sent.append(new_districts)
+
+    cog.send_new_alert = send_new_alert
+    return cog
+
+
+def test_every_alert_is_archived_with_all_districts(tmp_path, monkeypatch):
+    archive = AlertArchive(tmp_path.joinpath('alert_archive.jsonl'))
+    monkeypatch.setattr(cog_notificator, 'alert_archive', archive)
+    sent = []
+    cog = make_cog(sent)
+
+    async def handle():
+        await cog.handle_alert_data({'id': 1, 'cat': 1, 'title': 'a', 'data': ['חיפה', 'עכו']}, received_at=1000.0)
+        # Partly on cooldown
+        await cog.handle_alert_data({'id': 2, 'cat': 1, 'title': 'a', 'data': ['עכו', 'צפת']}, received_at=1001.0)
+        # All on cooldown
+        await cog.handle_alert_data({'id': 3, 'cat': 1, 'title': 'a', 'data': ['חיפה']}, received_at=1002.0)
+
+    asyncio.run(handle())
+
+    assert sent == [('חיפה', 'עכו'), ('צפת',)]
+    assert [(record.alert_id, record.timestamp, record.districts) for record in archive.records] == [
+        (1, 1000.0, ('חיפה', 'עכו')),
+        (2, 1001.0, ('עכו', 'צפת')),
+        (3, 1002.0, ('חיפה',)),
+    ]
+    assert len(tmp_path.joinpath('alert_archive.jsonl').read_text(encoding='utf-8').splitlines()) == 3
+
+
+def test_loop_error_handles_the_running_alert_again(monkeypatch):
+    monkeypatch.setattr(cog_notificator.errlogging, 'new_errlog', lambda err: None)
+    cog = make_cog([])
+    cog.alert_reqs = AsyncAlertReqs()
+    cog.alert_reqs._etag = '"abc"'
+    cog.alert_reqs._last_digest = b'digest'
+
+    asyncio.run(cog.update_loop_error(ValueError('boom')))
+
+    # The next poll is reported as changed
+    assert cog.alert_reqs._etag is None and cog.alert_reqs._last_digest is None
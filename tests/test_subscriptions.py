@@ -0,0 +1,101 @@
+from db_access import Channel
+from utils.subscriptions import SubscriptionIndex
+
+
+def make_index() -> SubscriptionIndex:
+    index = SubscriptionIndex()
+    index.load([
+        (1, 100, 'he', '[10, 20]'),
+        (2, 100, 'he', '[20, 30]'),
+        (3, None, 'he', '[]'),
+    ])
+    return index
+
+
+def test_load():
+    index = make_index()
+
+    assert len(index) == 3
+    assert 1 in index and 3 in index and 4 not in index
+    assert index.by_district == {10: {1}, 20: {1, 2}, 30: {2}}
+    assert index.all_districts == {3}
+
+
+def test_match_keeps_alert_order():
+    matches = make_index().match([30, 20, 10, 40])
+
+    assert matches == {1: [20, 10], 2: [30, 20], 3: None}
+
+
+def test_match_unknown_districts_only_matches_all_districts_channels():
+    assert make_index().match([40]) == {3: None}
+
+
+def test_load_replaces_previous_contents():
+    index = make_index()
+    index.load([(5, None, 'he', '[10]')])
+
+    assert len(index) == 1
+    assert index.match([10, 20]) == {5: [10]}
+
+
+def test_add_channel_replaces_existing():
+    index = make_index()
+    index.add_channel(Channel(1, 100, 'he', (30,)))
+
+    assert index.channels[1].locations == (30,)
+    assert index.by_district == {20: {2}, 30: {1, 2}}
+
+
+def test_remove_channel():
+    index = make_index()
+    index.remove_channel(2)
+    index.remove_channel(3)
+    index.remove_channel(404)
+
+    assert len(index) == 1
+    assert index.by_district == {10: {1}, 20: {1}}
+    assert index.all_districts == set()
+
+
+def test_add_locations():
+    index = make_index()
+    index.add_locations(1, [30, 10, 30])
+    index.add_locations(3, [40])
+
+    assert index.channels[1].locations == (10, 20, 30)
+    assert index.channels[3].locations == (40,)
+    assert index.all_districts == set()
+    assert index.match([40, 30]) == {1: [30], 2: [30], 3: [40]}
+
+
+def test_remove_locations_down_to_all_districts():
+    index = make_index()
+    index.remove_locations(1, [10])
+
+    assert index.channels[1].locations == (20,)
+    assert 10 not in index.by_district
+
+    index.remove_locations(1, [20])
+    assert index.channels[1].locations == ()
+    assert 1 in index.all_districts
+    assert index.match([30]) == {1: None, 2: [30], 3: None}
+
+
+def test_clear_locations():
+    index = make_index()
+    index.clear_locations(2)
+
+    assert index.channels[2].locations == ()
+    assert index.all_districts == {2, 3}
+    assert index.by_district == {10: {1}, 20: {1}}
+
+
+def test_unknown_channel_updates_are_ignored():
+    index = make_index()
+    index.add_locations(404, [10])
+    index.remove_locations(404, [10])
+    index.clear_locations(404)
+
+    assert 404 not in index
+    assert index.by_district[10] == {1}